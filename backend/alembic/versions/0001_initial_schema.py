@@ -0,0 +1,64 @@
+"""Initial schema, as created by Base.metadata.create_all before migrations
+
+Databases created by earlier versions of the app already have these tables;
+mark them with ``alembic stamp 0001`` and then ``alembic upgrade head``.
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-06-03 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'products',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String()),
+        sa.Column('url', sa.String()),
+        sa.Column('current_price', sa.Float()),
+        sa.Column('target_price', sa.Float(), nullable=True),
+        sa.Column('image_url', sa.String(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('platform', sa.String()),
+        sa.Column('is_active', sa.Boolean()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True)),
+    )
+    op.create_index('ix_products_id', 'products', ['id'])
+    op.create_index('ix_products_name', 'products', ['name'])
+    op.create_index('ix_products_url', 'products', ['url'], unique=True)
+
+    op.create_table(
+        'price_history',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('product_id', sa.Integer()),
+        sa.Column('price', sa.Float()),
+        sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_price_history_id', 'price_history', ['id'])
+    op.create_index('ix_price_history_product_id', 'price_history', ['product_id'])
+
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('email', sa.String()),
+        sa.Column('is_active', sa.Boolean()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+
+def downgrade():
+    op.drop_table('users')
+    op.drop_table('price_history')
+    op.drop_table('products')
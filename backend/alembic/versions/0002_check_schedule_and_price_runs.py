@@ -0,0 +1,33 @@
+"""Per-product check schedule and run-length price history
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-06-10 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('last_checked_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('products', sa.Column('next_check_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_products_next_check_at', 'products', ['next_check_at'])
+
+    op.add_column('price_history', sa.Column(
+        'last_seen_at', sa.DateTime(timezone=True), server_default=sa.func.now()
+    ))
+    op.execute('UPDATE price_history SET last_seen_at = timestamp')
+
+
+def downgrade():
+    op.drop_column('price_history', 'last_seen_at')
+    op.drop_index('ix_products_next_check_at', table_name='products')
+    op.drop_column('products', 'next_check_at')
+    op.drop_column('products', 'last_checked_at')
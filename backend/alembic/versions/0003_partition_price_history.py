@@ -0,0 +1,98 @@
+"""Partition price_history by month and index (product_id, timestamp DESC)
+
+Existing rows are copied into the partitioned table compacted into runs:
+consecutive identical prices for a product become one row spanning from the
+first to the last time the price was seen.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-06-17 00:00:00
+
+"""
+from datetime import datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def month_start(moment, offset=0):
+    month_index = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def upgrade():
+    op.rename_table('price_history', 'price_history_legacy')
+    op.drop_index('ix_price_history_id', table_name='price_history_legacy')
+    op.drop_index('ix_price_history_product_id', table_name='price_history_legacy')
+    op.execute('ALTER SEQUENCE price_history_id_seq RENAME TO price_history_legacy_id_seq')
+
+    op.execute(
+        'CREATE TABLE price_history ('
+        ' id SERIAL,'
+        ' product_id INTEGER,'
+        ' price FLOAT,'
+        ' timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),'
+        ' last_seen_at TIMESTAMP WITH TIME ZONE DEFAULT now(),'
+        ' PRIMARY KEY (id, timestamp)'
+        ') PARTITION BY RANGE (timestamp)'
+    )
+    op.execute(
+        'CREATE INDEX ix_price_history_product_id_timestamp '
+        'ON price_history (product_id, timestamp DESC)'
+    )
+
+    now = datetime.now(timezone.utc)
+    oldest = op.get_bind().execute(sa.text('SELECT min(timestamp) FROM price_history_legacy')).scalar()
+    start = month_start(oldest.astimezone(timezone.utc) if oldest else now)
+    last = month_start(now, MONTHS_AHEAD)
+    while start <= last:
+        end = month_start(start, 1)
+        op.execute(
+            f"CREATE TABLE price_history_y{start.year}m{start.month:02d} PARTITION OF price_history "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        start = end
+
+    op.execute(
+        'INSERT INTO price_history (product_id, price, timestamp, last_seen_at) '
+        'SELECT product_id, price, min(timestamp), max(coalesce(last_seen_at, timestamp)) '
+        'FROM ('
+        '  SELECT *, sum(is_change) OVER (PARTITION BY product_id ORDER BY timestamp, id) AS run'
+        '  FROM ('
+        '    SELECT id, product_id, price, timestamp, last_seen_at,'
+        '      CASE WHEN price IS NOT DISTINCT FROM'
+        '        lag(price) OVER (PARTITION BY product_id ORDER BY timestamp, id)'
+        '      THEN 0 ELSE 1 END AS is_change'
+        '    FROM price_history_legacy'
+        '  ) marked'
+        ') runs '
+        'GROUP BY product_id, run, price'
+    )
+    op.drop_table('price_history_legacy')
+
+
+def downgrade():
+    op.rename_table('price_history', 'price_history_partitioned')
+    op.execute('ALTER SEQUENCE price_history_id_seq RENAME TO price_history_partitioned_id_seq')
+    op.create_table(
+        'price_history',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('product_id', sa.Integer()),
+        sa.Column('price', sa.Float()),
+        sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('last_seen_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_price_history_id', 'price_history', ['id'])
+    op.create_index('ix_price_history_product_id', 'price_history', ['product_id'])
+    op.execute(
+        'INSERT INTO price_history (product_id, price, timestamp, last_seen_at) '
+        'SELECT product_id, price, timestamp, last_seen_at FROM price_history_partitioned'
+    )
+    op.drop_table('price_history_partitioned')
@@ -0,0 +1,39 @@
+"""Durable outbox for price alert emails
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-06-24 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'alert_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('recipient_email', sa.String(), nullable=False),
+        sa.Column('product_id', sa.Integer()),
+        sa.Column('product_name', sa.String()),
+        sa.Column('product_url', sa.String()),
+        sa.Column('old_price', sa.Float()),
+        sa.Column('new_price', sa.Float()),
+        sa.Column('status', sa.String(), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_alert_outbox_status_next_attempt_at', 'alert_outbox', ['status', 'next_attempt_at'])
+
+
+def downgrade():
+    op.drop_table('alert_outbox')
@@ -0,0 +1,39 @@
+"""User product subscriptions with an indexed trigger price
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-07-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'subscriptions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('threshold_price', sa.Float(), nullable=True),
+        sa.Column('percent_drop', sa.Float(), nullable=True),
+        sa.Column('baseline_price', sa.Float(), nullable=True),
+        sa.Column('trigger_price', sa.Float(), nullable=False),
+        sa.Column('is_active', sa.Boolean()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('user_id', 'product_id', name='uq_subscriptions_user_product'),
+    )
+    op.create_index('ix_subscriptions_user_id', 'subscriptions', ['user_id'])
+    op.create_index(
+        'ix_subscriptions_product_id_trigger_price', 'subscriptions', ['product_id', 'trigger_price']
+    )
+
+
+def downgrade():
+    op.drop_table('subscriptions')
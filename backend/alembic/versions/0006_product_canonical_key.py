@@ -0,0 +1,101 @@
+"""Canonical item key per product URL
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-07-08 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of app.services.url_canonical as of this revision, so the
+# backfill stays the same whatever later changes are made to the app.
+
+# The marketplace domain, without subdomains such as "smile." or "cgi."
+AMAZON_HOST = re.compile(r'(?:^|\.)(amazon\.[a-z.]+)$')
+EBAY_HOST = re.compile(r'(?:^|\.)(ebay\.[a-z.]+)$')
+AMAZON_ASIN = re.compile(r'/(?:dp|gp/product|gp/aw/d|exec/obidos/ASIN|o/ASIN)/([A-Z0-9]{10})(?:[/?]|$)', re.IGNORECASE)
+EBAY_ITEM = re.compile(r'/itm/(?:[^/]+/)?(\d{9,15})(?:[/?]|$)')
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = {
+    'ref', 'ref_', 'tag', 'linkcode', 'linkid', 'camp', 'creative', 'creativeasin', 'ascsubtag',
+    'mkcid', 'mkrid', 'mkevt', 'campid', 'customid', 'toolid', 'siteid',
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid', 'igshid', 'srsltid',
+}
+TRACKING_PREFIXES = ('utm_', 'pf_rd_', 'pd_rd_', '_trk')
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def canonical_key(url: str) -> str:
+    """Key identifying the item a product URL points at.
+
+    Amazon URLs map to their marketplace and ASIN, eBay URLs to their item
+    ID, so links that differ only in slugs or referral parameters share a
+    key. Other URLs are normalized: lowercase host without "www.", no
+    fragment, trailing slash or tracking parameters, and the remaining query
+    parameters sorted.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    amazon, ebay = AMAZON_HOST.search(host), EBAY_HOST.search(host)
+    if amazon:
+        match = AMAZON_ASIN.search(parts.path)
+        if match:
+            return f"{amazon.group(1)}/dp/{match.group(1).upper()}"
+    elif ebay:
+        match = EBAY_ITEM.search(parts.path)
+        if match:
+            return f"{ebay.group(1)}/itm/{match.group(1)}"
+        item = dict(parse_qsl(parts.query)).get('item')
+        if item and item.isdigit():
+            return f"{ebay.group(1)}/itm/{item}"
+
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name)
+    )
+    key = host
+    if parts.port and parts.port not in (80, 443):
+        key += f":{parts.port}"
+    key += parts.path.rstrip('/') or ''
+    if query:
+        key += '?' + urlencode(query)
+    return key
+
+
+
+def upgrade():
+    op.add_column('products', sa.Column('canonical_key', sa.String(), nullable=True))
+
+    # Existing URL variants of one item keep their rows and become aliases
+    # sharing a key
+    products = sa.table('products', sa.column('id', sa.Integer), sa.column('url', sa.String),
+                        sa.column('canonical_key', sa.String))
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(products.c.id, products.c.url)).all()
+    if rows:
+        bind.execute(
+            products.update().where(products.c.id == sa.bindparam('product_id')),
+            [{'product_id': id, 'canonical_key': canonical_key(url)} for id, url in rows if url]
+        )
+
+    op.create_index('ix_products_canonical_key', 'products', ['canonical_key'])
+
+
+def downgrade():
+    op.drop_index('ix_products_canonical_key', table_name='products')
+    op.drop_column('products', 'canonical_key')
@@ -0,0 +1,25 @@
+"""Row leases for distributed price sweeps
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-07-15 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('lease_owner', sa.String(), nullable=True))
+    op.add_column('products', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column('products', 'lease_expires_at')
+    op.drop_column('products', 'lease_owner')
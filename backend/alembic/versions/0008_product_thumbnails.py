@@ -0,0 +1,32 @@
+"""Product image thumbnails
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-07-22 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('image_hash', sa.String(length=64), nullable=True))
+    op.add_column('products', sa.Column('image_fetched_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_products_image_hash', 'products', ['image_hash'])
+    op.create_index(
+        'ix_products_thumbnails_pending', 'products', ['image_fetched_at'],
+        postgresql_where=sa.text('image_hash IS NULL AND image_url IS NOT NULL'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_products_thumbnails_pending', table_name='products')
+    op.drop_index('ix_products_image_hash', table_name='products')
+    op.drop_column('products', 'image_fetched_at')
+    op.drop_column('products', 'image_hash')
@@ -0,0 +1,42 @@
+"""Per-product price statistics rollups
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-07-29 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'price_stats',
+        sa.Column('product_id', sa.Integer(), primary_key=True),
+        sa.Column('last_price', sa.Float(), nullable=False),
+        sa.Column('min_price', sa.Float(), nullable=False),
+        sa.Column('max_price', sa.Float(), nullable=False),
+        sa.Column('mean_price', sa.Float(), nullable=False),
+        sa.Column('observed_seconds', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('change_count', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('volatility', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('discount_pct', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('first_seen_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_change_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('observed_until', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_price_stats_discount_pct', 'price_stats', [sa.text('discount_pct DESC'), 'product_id'])
+    op.create_index('ix_price_stats_volatility', 'price_stats', [sa.text('volatility DESC'), 'product_id'])
+    op.create_index('ix_price_stats_last_change_at', 'price_stats', [sa.text('last_change_at DESC'), 'product_id'])
+    # Existing history is rolled up by the nightly job, or right away with
+    # `python -m app.services.price_stats`
+
+
+def downgrade():
+    op.drop_table('price_stats')
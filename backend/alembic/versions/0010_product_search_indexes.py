@@ -0,0 +1,32 @@
+"""Indexes for searching, filtering and sorting the product list
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2025-08-05 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Substring name search (ILIKE '%...%') through a trigram index
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_products_name_trgm', 'products', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+    )
+    op.create_index('ix_products_platform_current_price', 'products', ['platform', 'current_price', 'id'])
+    op.create_index('ix_products_current_price', 'products', ['current_price', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_products_current_price', table_name='products')
+    op.drop_index('ix_products_platform_current_price', table_name='products')
+    op.drop_index('ix_products_name_trgm', table_name='products')
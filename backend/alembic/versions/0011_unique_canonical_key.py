@@ -0,0 +1,33 @@
+"""Unique canonical item key per product
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2025-08-12 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # URL variants tracked before 0006 share a key. The oldest keeps it and
+    # the others are checked under their own URL, as they were before
+    op.execute(
+        'UPDATE products SET canonical_key = NULL '
+        'WHERE canonical_key IS NOT NULL AND id > ('
+        '  SELECT min(keyed.id) FROM products keyed WHERE keyed.canonical_key = products.canonical_key'
+        ')'
+    )
+    op.drop_index('ix_products_canonical_key', table_name='products')
+    op.create_index('ix_products_canonical_key', 'products', ['canonical_key'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_products_canonical_key', table_name='products')
+    op.create_index('ix_products_canonical_key', 'products', ['canonical_key'])
@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import logging
+import zlib
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+@contextmanager
+def advisory_lock(engine: Engine, name: str) -> Iterator[bool]:
+    """Try to take a cluster-wide lock for a job that must run on one
+    process at a time; yields whether it was acquired.
+
+    Uses a Postgres session advisory lock on a dedicated connection, so the
+    job may commit as often as it likes while holding it. Other databases
+    have no competing processes and always acquire it.
+    """
+    if engine.dialect.name != 'postgresql':
+        yield True
+        return
+
+    key = zlib.crc32(name.encode())
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': key}).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': key})
+
+class HeldAdvisoryLock:
+    """A cluster-wide lock kept for as long as the process runs, electing
+    one of several workers for a duty.
+
+    ``held`` takes the lock if it is free and reports whether this process
+    has it, so a worker that stopped or lost its connection is replaced on
+    the next call of another. Other databases have no competing processes
+    and always hold it.
+    """
+
+    def __init__(self, engine: Engine, name: str):
+        self.engine = engine
+        self.key = zlib.crc32(name.encode())
+        self._conn: Optional[Connection] = None
+
+    def held(self) -> bool:
+        if self.engine.dialect.name != 'postgresql':
+            return True
+        if self._conn is not None:
+            try:
+                # The lock lasts as long as the connection
+                self._conn.execute(text("SELECT 1"))
+                self._conn.commit()
+                return True
+            except Exception as e:
+                logging.warning(f"Lost advisory lock {self.key}: {e}")
+                self.release()
+
+        conn = None
+        try:
+            conn = self.engine.connect()
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': self.key}).scalar()
+            conn.commit()
+        except Exception as e:
+            logging.warning(f"Could not take advisory lock {self.key}: {e}")
+            acquired = False
+        if acquired:
+            # Kept checked out of the pool while the lock is held
+            self._conn = conn
+        elif conn is not None:
+            conn.close()
+        return bool(acquired)
+
+    def release(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': self.key})
+            self._conn.commit()
+        except Exception:
+            # A dropped connection has released it already
+            self._conn.invalidate()
+        finally:
+            self._conn.close()
+            self._conn = None
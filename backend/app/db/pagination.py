@@ -0,0 +1,20 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque keyset cursor for the sort key of the last row on a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Sort key values from a cursor made by encode_cursor.
+
+    Raises ValueError for cursors that were not produced by encode_cursor.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+import logging
+
+PARENT_TABLE = "price_history"
+
+def month_start(moment: datetime, offset: int = 0) -> datetime:
+    """First instant (UTC) of the month ``offset`` months from ``moment``"""
+    month_index = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
+
+def partition_name(start: datetime) -> str:
+    return f"{PARENT_TABLE}_y{start.year}m{start.month:02d}"
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != 'postgresql':
+        return False
+    return bool(db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table"
+    ), {'table': PARENT_TABLE}).scalar())
+
+def ensure_price_history_partitions(db: Session, months_ahead: int = 3) -> None:
+    """Create the monthly partitions for the current month and the next few"""
+    if not is_partitioned(db):
+        return
+
+    now = datetime.now(timezone.utc)
+    for offset in range(months_ahead + 1):
+        start, end = month_start(now, offset), month_start(now, offset + 1)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+    db.commit()
+
+def list_partitions(db: Session) -> List[Tuple[str, datetime]]:
+    """Monthly partitions as (name, exclusive upper bound), oldest first"""
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table ORDER BY c.relname"
+    ), {'table': PARENT_TABLE}).scalars()
+
+    partitions = []
+    for name in names:
+        suffix = name[len(PARENT_TABLE) + 1:]  # yYYYYmMM
+        start = datetime(int(suffix[1:5]), int(suffix[6:8]), 1, tzinfo=timezone.utc)
+        partitions.append((name, month_start(start, 1)))
+    return partitions
+
+def drop_expired_partitions(db: Session, cutoff: datetime) -> int:
+    """Drop every monthly partition that ends before ``cutoff``.
+
+    Runs in a dropped partition that were still confirmed after it ended are
+    carried forward, starting at the partition boundary, so current prices of
+    long-stable products are not lost. Returns the number of partitions dropped.
+    """
+    dropped = 0
+    for name, upper_bound in list_partitions(db):
+        if upper_bound > cutoff:
+            break
+
+        db.execute(text(
+            f"INSERT INTO {PARENT_TABLE} (product_id, price, timestamp, last_seen_at) "
+            f"SELECT product_id, price, :boundary, last_seen_at FROM {name} "
+            f"WHERE last_seen_at >= :boundary"
+        ), {'boundary': upper_bound})
+        db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+
+        logging.info(f"Dropped price history partition {name}")
+        dropped += 1
+    return dropped
@@ -1,10 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from .db.database import engine, Base
 from .routes.tracker import router as tracker_router
-from .services.scheduler import price_scheduler
+from .services.metrics import HTTP_SECONDS, render
+from .services.price_events import price_events
+from .services.registry import start_roles, stop_services
+from config import REDIS_URL, RESPONSE_CACHE_TTL_SECONDS, ROLES
 import logging
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,20 +16,32 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
-    # Startup
-    logger.info("Starting up...")
+    # Startup. The schema is created and upgraded by `alembic upgrade head`,
+    # not here, so workers start without touching it.
+    logger.info(f"Starting up with roles: {', '.join(sorted(ROLES))}")
     
-    # Create database tables
-    Base.metadata.create_all(bind=engine)
+    # Crawl engine and alert delivery for the scraper role, price sweeps for
+    # the scheduler role; an API-only process starts the crawl engine when a
+    # request first needs it
+    start_roles(ROLES)
     
-    # Start the price scheduler
-    price_scheduler.start()
+    # Ingest invalidates cached responses in its own process, which without
+    # Redis is not this one
+    if 'scraper' not in ROLES and not REDIS_URL:
+        logger.warning(
+            "Running without the scraper role and without REDIS_URL: product responses cached here "
+            f"pick up prices scraped by other processes only after {RESPONSE_CACHE_TTL_SECONDS:g}s"
+        )
+    
+    # Relay price events published by other processes
+    await price_events.start()
     
     yield
     
     # Shutdown
     logger.info("Shutting down...")
-    price_scheduler.stop()
+    stop_services()
+    await price_events.stop()
 
 app = FastAPI(
     title="Price Tracker API",
@@ -42,8 +57,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Labelled by route template so path parameters do not multiply series
+    route = request.scope.get('route')
+    HTTP_SECONDS.labels(
+        request.method, route.path if route else 'unmatched', str(response.status_code)
+    ).observe(time.perf_counter() - start)
+    return response
+
 # Include routers
 app.include_router(tracker_router)
 
@@ -55,6 +82,11 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    content, content_type = render()
+    return Response(content=content, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..db.database import Base
 
@@ -8,22 +9,95 @@ class Product(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     url = Column(String, unique=True, index=True)
+    # Identifies the item whatever URL variant was added (see
+    # services/url_canonical.py), so each item is tracked once
+    canonical_key = Column(String, nullable=True, unique=True, index=True)
     current_price = Column(Float)
     target_price = Column(Float, nullable=True)
     image_url = Column(String, nullable=True)
+    # SHA-256 of the downloaded image, naming its thumbnails (see
+    # services/thumbnails.py); image_fetched_at is the last download attempt
+    image_hash = Column(String(64), nullable=True, index=True)
+    image_fetched_at = Column(DateTime(timezone=True), nullable=True)
     description = Column(Text, nullable=True)
     platform = Column(String)  # e.g., "amazon", "ebay"
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    last_checked_at = Column(DateTime(timezone=True), nullable=True)
+    next_check_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    # Held by the scraper worker checking the product; expired leases are
+    # claimed again
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    # Only loaded when a query asks for it, e.g. with joinedload()
+    stats = relationship(
+        'PriceStats', primaryjoin='Product.id == foreign(PriceStats.product_id)',
+        uselist=False, viewonly=True, lazy='noload',
+    )
+    
+    __table_args__ = (
+        # Products whose image still needs thumbnails
+        Index('ix_products_thumbnails_pending', image_fetched_at,
+              postgresql_where=(image_hash == None) & (image_url != None)),
+        # Filters and sorts of the product list, which pages by
+        # (sort key, id). Name search uses a pg_trgm index on name that the
+        # migrations create, as the extension has to be installed first
+        Index('ix_products_platform_current_price', platform, current_price, id),
+        Index('ix_products_current_price', current_price, id),
+    )
 
 class PriceHistory(Base):
+    """A run of identical prices: ``price`` was first seen at ``timestamp``
+    and last confirmed at ``last_seen_at``. A new row is only written when
+    the price changes.
+    
+    On PostgreSQL the migrations range-partition the table by month on
+    ``timestamp`` (see alembic/versions and app/db/partitions.py), with
+    (id, timestamp) as the primary key; ids stay unique through their
+    sequence, so the model maps ``id`` alone."""
     __tablename__ = "price_history"
     
-    id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, index=True)
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer)
     price = Column(Float)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_seen_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('ix_price_history_product_id_timestamp', product_id, timestamp.desc()),
+    )
+
+class PriceStats(Base):
+    """Rollup of a product's price history, so deal questions ("all-time
+    low?", "how far below average?") do not scan ``price_history``.
+    
+    Ingest rolls each row forward as prices are checked and a nightly job
+    rebuilds them from the retained history (see services/price_stats.py).
+    ``mean_price`` is weighted by how long each price held, ``volatility``
+    is the relative spread of the last VOLATILITY_WINDOW prices, and
+    ``discount_pct`` is how far ``last_price`` is below the mean."""
+    __tablename__ = "price_stats"
+    
+    product_id = Column(Integer, primary_key=True)
+    last_price = Column(Float, nullable=False)
+    min_price = Column(Float, nullable=False)
+    max_price = Column(Float, nullable=False)
+    mean_price = Column(Float, nullable=False)
+    observed_seconds = Column(Float, nullable=False, default=0, server_default='0')
+    change_count = Column(Integer, nullable=False, default=1, server_default='1')
+    volatility = Column(Float, nullable=False, default=0, server_default='0')
+    discount_pct = Column(Float, nullable=False, default=0, server_default='0')
+    first_seen_at = Column(DateTime(timezone=True), nullable=False)
+    last_change_at = Column(DateTime(timezone=True), nullable=False)
+    observed_until = Column(DateTime(timezone=True), nullable=False)
+    
+    __table_args__ = (
+        # Sort keys of GET /products/, read in index order
+        Index('ix_price_stats_discount_pct', discount_pct.desc(), product_id),
+        Index('ix_price_stats_volatility', volatility.desc(), product_id),
+        Index('ix_price_stats_last_change_at', last_change_at.desc(), product_id),
+    )
 
 class User(Base):
     __tablename__ = "users"
@@ -32,3 +106,48 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class Subscription(Base):
+    """A user watching a product. Either rule, a fixed ``threshold_price`` or
+    a ``percent_drop`` from the price when subscribing, is stored as a
+    ``trigger_price`` so matching a new price is an index range lookup."""
+    __tablename__ = "subscriptions"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    product_id = Column(Integer, nullable=False)
+    threshold_price = Column(Float, nullable=True)
+    percent_drop = Column(Float, nullable=True)
+    baseline_price = Column(Float, nullable=True)
+    trigger_price = Column(Float, nullable=False)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'product_id', name='uq_subscriptions_user_product'),
+        Index('ix_subscriptions_product_id_trigger_price', product_id, trigger_price),
+    )
+
+class AlertOutbox(Base):
+    """A price alert waiting to be emailed. Rows are written in the same
+    transaction as the price that triggered them and delivered by
+    AlertDeliveryWorker."""
+    __tablename__ = "alert_outbox"
+    
+    id = Column(Integer, primary_key=True)
+    recipient_email = Column(String, nullable=False)
+    product_id = Column(Integer)
+    product_name = Column(String)
+    product_url = Column(String)
+    old_price = Column(Float)
+    new_price = Column(Float)
+    status = Column(String, nullable=False, default='pending', server_default='pending')  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index('ix_alert_outbox_status_next_attempt_at', status, next_attempt_at),
+    )
@@ -1,23 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from ..db.database import get_db
-from ..models.product import Product, PriceHistory, User
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, delete, insert, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload, load_only
+from pydantic import TypeAdapter, ValidationError
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Literal, Optional
+from urllib.parse import urljoin
+import asyncio
+import json
+import threading
+from ..db.database import get_async_db
+from ..db.pagination import decode_cursor, encode_cursor
+from ..models.product import Product, PriceHistory, PriceStats, Subscription, User
 from ..schemas.product import (
-    ProductCreate, ProductUpdate, Product as ProductSchema,
-    PriceHistory as PriceHistorySchema, UserCreate, User as UserSchema
+    ProductCreate, ProductUpdate, Product as ProductSchema, ProductSummary as ProductSummarySchema,
+    PriceHistory as PriceHistorySchema, PriceBucket as PriceBucketSchema,
+    UserCreate, User as UserSchema,
+    SubscriptionCreate, Subscription as SubscriptionSchema,
+    BulkProductImport, BulkImportJob as BulkImportJobSchema
+)
+from ..services.price_ingest import price_ingestor
+from ..services.price_stats import summarize_runs
+from ..services.price_history import EXPAND_STEPS, aggregate_runs, as_utc, expand_runs
+from ..services.history_export import MEDIA_TYPES, export_history, parquet_available
+from ..services.registry import get_scraper_service
+from ..services.check_priority import check_metrics
+from ..services.alert_matcher import trigger_price
+from ..services.cache import CachedResponse, etag_matches, response_cache
+from ..scrapy_spiders.extraction import extraction_rules
+from ..services.bulk_import import bulk_import_service, is_product_url, parse_csv
+from ..services.url_canonical import canonical_key
+from ..services.price_events import price_events
+from ..services.thumbnails import thumbnail_cache, thumbnail_worker
+from config import (
+    BULK_IMPORT_MAX_URLS, EVENTS_KEEPALIVE_SECONDS, EXPORT_MAX_CONCURRENT, MIN_CHECK_INTERVAL_MINUTES,
+    THUMBNAIL_SIZES,
 )
-from ..services.scraper_runner import scraper_service
-from ..services.scheduler import price_scheduler
 
 router = APIRouter(prefix="/api/v1", tags=["tracker"])
 
+product_list_adapter = TypeAdapter(List[ProductSchema])
+product_summary_adapter = TypeAdapter(List[ProductSummarySchema])
+
+export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+class ExportResponse(StreamingResponse):
+    """Streamed export holding one of the export slots until the response
+    is over, however it ends: finished, failed or abandoned by the client
+    before the first chunk was read"""
+
+    def __init__(self, content: Iterator[bytes], **kwargs):
+        super().__init__(content, **kwargs)
+        self.chunks = content
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                # A client gone mid-export leaves the generator suspended with
+                # its session and server-side cursor open; closing it returns
+                # the connection now rather than whenever it is collected.
+                # The chunk being read has finished by now, as reads in the
+                # threadpool are waited for when the response is cancelled.
+                self.chunks.close()
+            finally:
+                export_slots.release()
+
+def cached_json_response(request: Request, cached: CachedResponse) -> Response:
+    """A cached body, or 304 Not Modified when the client already has it"""
+    headers = {'ETag': cached.etag, 'Cache-Control': 'no-cache'}
+    if cached.next_cursor:
+        headers['X-Next-Cursor'] = cached.next_cursor
+    if etag_matches(request.headers.get('if-none-match'), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type='application/json', headers=headers)
+
 # Product endpoints
 @router.post("/products/", response_model=ProductSchema)
-async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new product to track"""
-    # Check if product already exists
-    existing_product = db.query(Product).filter(Product.url == str(product.url)).first()
+    # Check if product already exists, under this or any other URL for the
+    # same item
+    key = canonical_key(str(product.url))
+    existing_product = await db.scalar(select(Product).where(
+        or_(Product.canonical_key == key, Product.url == str(product.url))
+    ).limit(1))
     if existing_product:
         raise HTTPException(
             status_code=400,
@@ -25,12 +96,14 @@ async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
         )
     
     # Scrape initial product data
-    scraped_data = await scraper_service.scrape_product(str(product.url))
+    scraper = await run_in_threadpool(get_scraper_service)
+    scraped_data = await scraper.scrape_product(str(product.url), force_refresh=True)
     
     # Create product with scraped data
     db_product = Product(
         name=scraped_data.get('name', product.name),
         url=str(product.url),
+        canonical_key=key,
         current_price=scraped_data.get('price'),
         target_price=product.target_price,
         image_url=scraped_data.get('image_url'),
@@ -38,39 +111,234 @@ async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
         platform=scraped_data.get('platform', product.platform)
     )
     
-    db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
-    
-    # Add initial price history
-    if db_product.current_price:
-        price_history = PriceHistory(
-            product_id=db_product.id,
-            price=db_product.current_price
+    try:
+        db.add(db_product)
+        await db.flush()
+        
+        # Add initial price history, and the statistics it makes, so the
+        # product sorts by discount, volatility and last change right away
+        if db_product.current_price:
+            now = datetime.now(timezone.utc)
+            price_history = PriceHistory(
+                product_id=db_product.id,
+                price=db_product.current_price,
+                timestamp=now,
+                last_seen_at=now
+            )
+            db.add(price_history)
+            db.add(PriceStats(**summarize_runs(db_product.id, [(db_product.current_price, now)], now)))
+        
+        await db.commit()
+    except IntegrityError:
+        # Added by a concurrent request while this one was scraping
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="Product with this URL already exists"
         )
-        db.add(price_history)
-        db.commit()
-    
+    await db.refresh(db_product)
+    response_cache.invalidate_products([db_product.id])
+    if db_product.image_url:
+        thumbnail_worker.notify()
     return db_product
 
+@router.post("/products/bulk", response_model=BulkImportJobSchema, status_code=status.HTTP_202_ACCEPTED)
+async def bulk_import_products(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Import many products at once.
+    
+    Accepts JSON (``{"products": [{"url": ..., "target_price": ...}]}``) or
+    CSV with a header row naming a ``url`` column and optionally
+    ``target_price``, ``name`` and ``platform``. New URLs are inserted in one
+    batch and scraped concurrently; poll ``/products/bulk/{job_id}`` for
+    progress.
+    """
+    body = await request.body()
+    try:
+        if 'csv' in request.headers.get('content-type', ''):
+            rows = parse_csv(body.decode('utf-8-sig'))
+        else:
+            rows = [item.model_dump() for item in BulkProductImport.model_validate_json(body).products]
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import: {e}")
+    if len(rows) > BULK_IMPORT_MAX_URLS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_IMPORT_MAX_URLS} products per import")
+    
+    # URL variants of the same item are one product; later rows win
+    valid = {canonical_key(row['url']): row for row in rows if is_product_url(row['url'])}
+    invalid = sum(1 for row in rows if not is_product_url(row['url']))
+    urls = [row['url'] for row in valid.values()]
+    
+    existing = (await db.execute(select(Product.canonical_key, Product.url).where(
+        or_(Product.canonical_key.in_(valid), Product.url.in_(urls))
+    ))).all()
+    existing_keys = {key for key, _ in existing} | {canonical_key(url) for _, url in existing}
+    new_rows = [dict(row, canonical_key=key) for key, row in valid.items() if key not in existing_keys]
+    
+    # Imported products are claimed for their first check like the
+    # scheduler claims due products, so the next tick does not scrape them
+    # again while the import is in flight
+    first_check_at = datetime.now(timezone.utc) + timedelta(minutes=MIN_CHECK_INTERVAL_MINUTES)
+    created = []
+    if new_rows:
+        statement = insert(Product)
+        if db.get_bind().dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+            # Rows another import or request added meanwhile are skipped
+            statement = pg_insert(Product).on_conflict_do_nothing()
+        inserted = await db.execute(statement.returning(Product.id, Product.url), [
+            {
+                'name': row['name'] or row['url'],
+                'url': row['url'],
+                'canonical_key': row['canonical_key'],
+                'target_price': row['target_price'],
+                'platform': row['platform'] or extraction_rules.platform(row['url']),
+                'is_active': True,
+                'next_check_at': first_check_at,
+            }
+            for row in new_rows
+        ])
+        created = inserted.all()
+        await db.commit()
+        response_cache.invalidate_products([product.id for product in created])
+    
+    job = bulk_import_service.create_job(len(rows), len(rows) - invalid - len(created), invalid)
+    await run_in_threadpool(bulk_import_service.start_scrapes, job, [product.url for product in created])
+    return job.snapshot()
+
+@router.get("/products/bulk/{job_id}", response_model=BulkImportJobSchema)
+def get_bulk_import(job_id: str):
+    """Progress of a bulk import"""
+    job = bulk_import_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.snapshot()
+
+# Orders of GET /products/ as (sort key, descending), each read in order from
+# an index. Pages are keyed on (sort key, id), ids ascending among ties, and
+# products without a sort key value are left out
+PRODUCT_SORTS = {
+    'price': (Product.current_price, False),
+    'price_desc': (Product.current_price, True),
+    'discount': (PriceStats.discount_pct, True),
+    'volatility': (PriceStats.volatility, True),
+    'last_change': (PriceStats.last_change_at, True),
+}
+
+# Columns loaded for the summary projection
+SUMMARY_COLUMNS = (
+    Product.name, Product.url, Product.platform, Product.current_price, Product.target_price,
+    Product.image_url, Product.image_hash, Product.is_active,
+)
+
+def like_pattern(text: str) -> str:
+    """ILIKE pattern matching ``text`` anywhere, wildcards in it escaped"""
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
 @router.get("/products/", response_model=List[ProductSchema])
-def get_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all tracked products"""
-    products = db.query(Product).offset(skip).limit(limit).all()
-    return products
+async def get_products(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: Optional[Literal['price', 'price_desc', 'discount', 'volatility', 'last_change']] = None,
+    q: Optional[str] = Query(None, min_length=1, max_length=200),
+    platform: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    is_active: Optional[bool] = None,
+    fields: Literal['full', 'summary'] = 'full',
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get tracked products, filtered and sorted in the database.
+    
+    ``q`` matches anywhere in the name. Products are ordered by id unless
+    ``sort`` is given: by price, or by price statistics (how far the price
+    is below its time-weighted average, how volatile it is, how recently it
+    changed), largest first. When more products match, the
+    ``X-Next-Cursor`` response header holds the cursor for the next page.
+    ``fields=summary`` returns only what a product card shows.
+    """
+    key = response_cache.list_key(
+        skip, limit, cursor, sort, q, platform, min_price, max_price, is_active, fields
+    )
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached_json_response(request, cached)
+    
+    query = select(Product)
+    if q:
+        # Served by the trigram index on products.name
+        query = query.where(Product.name.ilike(like_pattern(q), escape='\\'))
+    if platform:
+        query = query.where(Product.platform == platform)
+    if min_price is not None:
+        query = query.where(Product.current_price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.current_price <= max_price)
+    if is_active is not None:
+        query = query.where(Product.is_active == is_active)
+    
+    column, descending = PRODUCT_SORTS.get(sort, (None, False))
+    on_stats = column is not None and column.class_ is PriceStats
+    if on_stats:
+        query = query.join(Product.stats).options(contains_eager(Product.stats))
+    elif fields == 'full':
+        query = query.options(joinedload(Product.stats))
+    if fields == 'summary':
+        query = query.options(load_only(*SUMMARY_COLUMNS))
+    
+    tiebreak = PriceStats.product_id if on_stats else Product.id
+    if column is not None:
+        query = query.where(column != None)
+    if cursor:
+        try:
+            cursor_sort, cursor_key, cursor_id = decode_cursor(cursor)
+            if cursor_sort != (sort or 'id'):
+                raise ValueError(f"Cursor is for sort {cursor_sort}")
+            cursor_id = int(cursor_id)
+            if sort == 'last_change':
+                cursor_key = datetime.fromisoformat(cursor_key)
+            elif column is not None:
+                cursor_key = float(cursor_key)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if column is None:
+            query = query.where(tiebreak > cursor_id)
+        else:
+            beyond = column < cursor_key if descending else column > cursor_key
+            query = query.where(or_(beyond, and_(column == cursor_key, tiebreak > cursor_id)))
+    if column is not None:
+        query = query.order_by(column.desc() if descending else column)
+    query = query.order_by(tiebreak)
+    
+    products = (await db.scalars(query.offset(skip).limit(limit + 1))).all()
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        last_key = None if column is None else getattr(last.stats if on_stats else last, column.key)
+        next_cursor = encode_cursor(sort or 'id', last_key, last.id)
+    
+    adapter = product_summary_adapter if fields == 'summary' else product_list_adapter
+    body = adapter.dump_json(adapter.validate_python(products, from_attributes=True))
+    return cached_json_response(request, response_cache.set(key, body, next_cursor))
 
 @router.get("/products/{product_id}", response_model=ProductSchema)
-def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(request: Request, product_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific product"""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    key = response_cache.product_key(product_id)
+    cached = response_cache.get(key)
+    if cached is None:
+        product = await db.get(Product, product_id, options=[joinedload(Product.stats)])
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        cached = response_cache.set(key, ProductSchema.model_validate(product).model_dump_json().encode())
+    return cached_json_response(request, cached)
 
 @router.put("/products/{product_id}", response_model=ProductSchema)
-def update_product(product_id: int, product_update: ProductUpdate, db: Session = Depends(get_db)):
+async def update_product(product_id: int, product_update: ProductUpdate, db: AsyncSession = Depends(get_async_db)):
     """Update a product"""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -78,58 +346,304 @@ def update_product(product_id: int, product_update: ProductUpdate, db: Session =
     for key, value in update_data.items():
         setattr(product, key, value)
     
-    db.commit()
-    db.refresh(product)
+    await db.commit()
+    await db.refresh(product)
+    response_cache.invalidate_products([product_id])
     return product
 
 @router.delete("/products/{product_id}")
-def delete_product(product_id: int, db: Session = Depends(get_db)):
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a product"""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    db.delete(product)
-    db.commit()
+    await db.execute(delete(Subscription).where(Subscription.product_id == product_id))
+    await db.execute(delete(PriceStats).where(PriceStats.product_id == product_id))
+    await db.delete(product)
+    await db.commit()
+    response_cache.invalidate_products([product_id])
     return {"message": "Product deleted successfully"}
 
 @router.get("/products/{product_id}/price-history", response_model=List[PriceHistorySchema])
-def get_price_history(product_id: int, db: Session = Depends(get_db)):
-    """Get price history for a product"""
-    price_history = db.query(PriceHistory).filter(
-        PriceHistory.product_id == product_id
-    ).order_by(PriceHistory.timestamp.desc()).all()
+async def get_price_history(
+    product_id: int,
+    response: Response,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    cursor: Optional[str] = None,
+    expand: Optional[Literal['hour', 'day']] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get price history for a product, newest first.
+    
+    History is stored as one row per price change; pass ``expand`` to get a
+    dense series with one point per hour or day instead, ``limit`` points at
+    a time. With ``since``, the run whose price was in force at that moment
+    is included too, as the oldest row. Pages are keyed on (timestamp, id):
+    when more rows exist the ``X-Next-Cursor`` response header holds the
+    cursor for the next page.
+    """
+    query = select(PriceHistory).where(PriceHistory.product_id == product_id)
+    if until:
+        query = query.where(PriceHistory.timestamp < until)
+    cursor_timestamp = None
+    if cursor:
+        try:
+            cursor_timestamp, cursor_id = decode_cursor(cursor)
+            cursor_timestamp = datetime.fromisoformat(cursor_timestamp)
+            cursor_id = int(cursor_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(PriceHistory.timestamp, PriceHistory.id) < (cursor_timestamp, cursor_id))
+    
+    # Each run gives at least one point, so limit + 1 runs tell whether an
+    # expanded series has more points too
+    newest_first = (PriceHistory.timestamp.desc(), PriceHistory.id.desc())
+    price_history = (await db.scalars(
+        (query.where(PriceHistory.timestamp >= since) if since else query)
+        .order_by(*newest_first).limit(limit + 1)
+    )).all()
+    
+    # The run in force at since started before it; it is the oldest row, so
+    # it only belongs on the page that runs out of rows from since on
+    if since and len(price_history) <= limit:
+        opening_run = await db.scalar(query.where(PriceHistory.timestamp < since)
+                                      .order_by(*newest_first).limit(1))
+        if opening_run:
+            price_history.append(opening_run)
+    
+    if expand:
+        # A page of points ends inside a run as often as not; its cursor is
+        # that point, and the next page carries on with the rest of the run
+        ends = [moment for moment in (until, cursor_timestamp) if moment]
+        points = expand_runs(price_history, EXPAND_STEPS[expand],
+                             until=min(map(as_utc, ends)) if ends else None, limit=limit + 1)
+        if since:
+            points = [point for point in points if as_utc(point['timestamp']) >= as_utc(since)]
+        if len(points) > limit:
+            points = points[:limit]
+            response.headers['X-Next-Cursor'] = encode_cursor(points[-1]['timestamp'], points[-1]['id'])
+        return points
+    
+    if len(price_history) > limit:
+        price_history = price_history[:limit]
+        last = price_history[-1]
+        response.headers['X-Next-Cursor'] = encode_cursor(last.timestamp, last.id)
     return price_history
 
+@router.get("/products/{product_id}/price-history/aggregate", response_model=List[PriceBucketSchema])
+async def get_price_history_aggregate(
+    product_id: int,
+    bucket: Optional[Literal['hour', 'day', 'week']] = None,
+    points: Optional[int] = Query(None, ge=1, le=2000),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Downsampled price history for charts, oldest first.
+    
+    Returns open/high/low/close and time-weighted average price per
+    ``bucket`` (hour, day or week; day by default), or ``points`` equal
+    buckets spanning the requested range.
+    """
+    if bucket and points:
+        raise HTTPException(status_code=400, detail="Pass either bucket or points, not both")
+    
+    query = select(PriceHistory).where(PriceHistory.product_id == product_id)
+    if until:
+        query = query.where(PriceHistory.timestamp < until)
+    runs = (await db.scalars(query.where(PriceHistory.timestamp >= since) if since else query)).all()
+    
+    # The run in force when the range starts sets the first bucket's open
+    if since:
+        opening_run = await db.scalar(query.where(PriceHistory.timestamp < since).order_by(
+            PriceHistory.timestamp.desc()
+        ).limit(1))
+        if opening_run:
+            runs.append(opening_run)
+    
+    if not runs:
+        return []
+    
+    end = until or max(run.last_seen_at or run.timestamp for run in runs)
+    return aggregate_runs(runs, since, end, bucket=bucket, points=points)
+
+@router.get("/price-history/export")
+async def export_price_history(
+    product_id: List[int] = Query(default=[]),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    export_format: Literal['csv', 'ndjson', 'parquet'] = Query('csv', alias='format'),
+):
+    """Download price history of the given products, or all of them, as
+    CSV, NDJSON or Parquet.
+    
+    Rows are price runs (price, first seen, last seen), newest first per
+    product. The export is streamed as it is read from the database, in a
+    worker thread, so it never sits in memory whole.
+    """
+    if export_format == 'parquet' and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed")
+    if not export_slots.acquire(blocking=False):
+        raise HTTPException(status_code=429, detail="Too many exports running, try again later",
+                            headers={'Retry-After': '30'})
+    
+    content = export_history(export_format, product_id, since, until)
+    return ExportResponse(content, media_type=MEDIA_TYPES[export_format], headers={
+        'Content-Disposition': f'attachment; filename="price-history.{export_format}"',
+    })
+
 @router.post("/products/{product_id}/check-price")
-async def check_price_now(product_id: int, db: Session = Depends(get_db)):
+async def check_price_now(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """Manually trigger price check for a product"""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Check price using scheduler service
-    price_scheduler.check_single_product_price(product, db)
+    # Scrape on the crawl engine without blocking the event loop
+    scraper = await run_in_threadpool(get_scraper_service)
+    # A manual check always fetches the full page, and goes through the
+    # ingest buffer so the fetch cache is only updated once the price is
+    # stored; flushing writes it before answering
+    await scraper.scrape_product(product.url, force_refresh=True, ingest=True)
+    await run_in_threadpool(price_ingestor.flush)
     
-    db.refresh(product)
+    await db.refresh(product)
     return {"message": "Price check completed", "current_price": product.current_price}
 
+@router.get("/events")
+async def stream_events(request: Request, product_id: List[int] = Query(default=[])):
+    """Server-sent events for price changes and price drop alerts, for the
+    given products or all of them.
+    
+    A "resync" event means events were dropped because the client fell
+    behind, and it should reload what it shows.
+    """
+    async def event_stream():
+        async with price_events.subscribe(product_id) as stream:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(stream.queue.get(), EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                if stream.dropped:
+                    stream.dropped = False
+                    yield "event: resync\ndata: {}\n\n"
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@router.get("/thumbnails/{image_hash}/{size}.webp")
+async def get_thumbnail(size: int, image_hash: str = Path(pattern='^[0-9a-f]{64}$'),
+                        db: AsyncSession = Depends(get_async_db)):
+    """A product image thumbnail in WebP, fitted within size x size pixels.
+    
+    Thumbnails are named by the hash of the image they were made from, so
+    they never change and clients may cache them for a year. One evicted
+    from the cache is made again from the image of a product showing it.
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    path = thumbnail_cache.get(image_hash, size)
+    if path is None:
+        product = (await db.execute(
+            select(Product.url, Product.image_url).where(Product.image_hash == image_hash).limit(1)
+        )).first()
+        if product and product.image_url:
+            try:
+                digest = await run_in_threadpool(thumbnail_worker.render, urljoin(product.url, product.image_url))
+            except Exception:
+                digest = None
+            # The retailer may have replaced the image since
+            if digest == image_hash:
+                path = thumbnail_cache.get(image_hash, size)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return FileResponse(path, media_type='image/webp', headers={'Cache-Control': 'public, max-age=31536000, immutable'})
+
+@router.get("/scheduler/metrics")
+def get_scheduler_metrics():
+    """Scrapes performed by the priority scheduler versus a flat hourly sweep"""
+    return check_metrics.snapshot()
+
 # User endpoints
 @router.post("/users/", response_model=UserSchema)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new user"""
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user.email))
     if existing_user:
         raise HTTPException(status_code=400, detail="User already exists")
     
     db_user = User(email=user.email)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.get("/users/", response_model=List[UserSchema])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_users(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """Get all users"""
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    users = await db.scalars(select(User).offset(skip).limit(limit))
+    return users.all()
+
+@router.post("/users/{user_id}/subscriptions", response_model=SubscriptionSchema)
+async def create_subscription(user_id: int, subscription: SubscriptionCreate, db: AsyncSession = Depends(get_async_db)):
+    """Subscribe a user to price drop alerts for a product"""
+    if not await db.get(User, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    product = await db.get(Product, subscription.product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if subscription.threshold_price is not None and subscription.percent_drop is not None:
+        raise HTTPException(status_code=400, detail="Pass either threshold_price or percent_drop, not both")
+    
+    threshold_price = subscription.threshold_price
+    if threshold_price is None and subscription.percent_drop is None:
+        threshold_price = product.target_price
+    trigger = trigger_price(threshold_price, subscription.percent_drop, product.current_price)
+    if trigger is None:
+        raise HTTPException(status_code=400, detail="No threshold set and no price to measure a drop from")
+    
+    db_subscription = await db.scalar(select(Subscription).where(
+        Subscription.user_id == user_id, Subscription.product_id == product.id
+    ))
+    if not db_subscription:
+        db_subscription = Subscription(user_id=user_id, product_id=product.id)
+        db.add(db_subscription)
+    
+    db_subscription.threshold_price = threshold_price
+    db_subscription.percent_drop = subscription.percent_drop
+    db_subscription.baseline_price = product.current_price
+    db_subscription.trigger_price = trigger
+    db_subscription.is_active = True
+    await db.commit()
+    await db.refresh(db_subscription)
+    return db_subscription
+
+@router.get("/users/{user_id}/subscriptions", response_model=List[SubscriptionSchema])
+async def get_subscriptions(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get a user's subscriptions"""
+    subscriptions = await db.scalars(select(Subscription).where(Subscription.user_id == user_id))
+    return subscriptions.all()
+
+@router.delete("/users/{user_id}/subscriptions/{subscription_id}")
+async def delete_subscription(user_id: int, subscription_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Unsubscribe a user from a product"""
+    subscription = await db.scalar(select(Subscription).where(
+        Subscription.id == subscription_id, Subscription.user_id == user_id
+    ))
+    if not subscription:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    
+    await db.delete(subscription)
+    await db.commit()
+    return {"message": "Subscription deleted successfully"}
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from pydantic import BaseModel, Field, HttpUrl, computed_field
+from typing import List, Optional
 from datetime import datetime
 
 class ProductBase(BaseModel):
@@ -16,14 +16,52 @@ class ProductUpdate(BaseModel):
     target_price: Optional[float] = None
     is_active: Optional[bool] = None
 
+class PriceStats(BaseModel):
+    """Rollup of a product's price history"""
+    last_price: float
+    min_price: float
+    max_price: float
+    mean_price: float
+    volatility: float
+    discount_pct: float
+    change_count: int
+    first_seen_at: datetime
+    last_change_at: datetime
+    
+    @computed_field
+    @property
+    def is_all_time_low(self) -> bool:
+        return self.last_price <= self.min_price
+    
+    class Config:
+        from_attributes = True
+
 class Product(ProductBase):
     id: int
     current_price: Optional[float] = None
     image_url: Optional[str] = None
+    # Names the product's thumbnails at /api/v1/thumbnails/{image_hash}/{size}.webp
+    image_hash: Optional[str] = None
     description: Optional[str] = None
     is_active: bool
     created_at: datetime
     updated_at: Optional[datetime] = None
+    stats: Optional[PriceStats] = None
+    
+    class Config:
+        from_attributes = True
+
+class ProductSummary(BaseModel):
+    """The fields a product list view shows"""
+    id: int
+    name: str
+    url: HttpUrl
+    platform: str
+    current_price: Optional[float] = None
+    target_price: Optional[float] = None
+    image_url: Optional[str] = None
+    image_hash: Optional[str] = None
+    is_active: bool
     
     class Config:
         from_attributes = True
@@ -35,10 +73,20 @@ class PriceHistoryCreate(BaseModel):
 class PriceHistory(PriceHistoryCreate):
     id: int
     timestamp: datetime
+    last_seen_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
+class PriceBucket(BaseModel):
+    """Downsampled price history for one time bucket"""
+    timestamp: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    avg: float
+
 class UserCreate(BaseModel):
     email: str
 
@@ -49,3 +97,45 @@ class User(UserCreate):
     
     class Config:
         from_attributes = True
+
+class SubscriptionCreate(BaseModel):
+    """Either a fixed threshold or a percent drop from the current price;
+    defaults to the product's target price"""
+    product_id: int
+    threshold_price: Optional[float] = Field(None, gt=0)
+    percent_drop: Optional[float] = Field(None, gt=0, lt=100)
+
+class Subscription(BaseModel):
+    id: int
+    user_id: int
+    product_id: int
+    threshold_price: Optional[float] = None
+    percent_drop: Optional[float] = None
+    baseline_price: Optional[float] = None
+    trigger_price: float
+    is_active: bool
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class BulkProductItem(BaseModel):
+    url: str
+    target_price: Optional[float] = None
+    name: Optional[str] = None
+    platform: Optional[str] = None
+
+class BulkProductImport(BaseModel):
+    products: List[BulkProductItem]
+
+class BulkImportJob(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    duplicates: int
+    invalid: int
+    queued: int
+    scraped: int
+    failed: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,162 @@
+import json
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from lxml import etree
+from parsel.csstranslator import css2xpath
+from config import EXTRACTION_RULES, EXTRACTION_RULES_PATH
+from .throttle import domain_slot
+
+PRICE_PATTERN = re.compile(r'\d+\.?\d*')
+
+# Fields joined from every match instead of taking the first one
+JOINED_FIELDS = {'description'}
+
+JSON_LD_XPATH = etree.XPath('//script[@type="application/ld+json"]/text()')
+META_PRICE_XPATH = etree.XPath(
+    '/html/head/meta[@property="product:price:amount" or @property="og:price:amount"'
+    ' or @itemprop="price"]/@content'
+)
+
+def parse_price(price_text: Optional[str]) -> Optional[float]:
+    """Numeric price from text such as "$1,299.00" """
+    if not price_text:
+        return None
+    price_match = PRICE_PATTERN.search(price_text.replace(',', ''))
+    return float(price_match.group()) if price_match else None
+
+def offer_price(data) -> Optional[str]:
+    """First offer price in a JSON-LD document"""
+    if isinstance(data, list):
+        for node in data:
+            price = offer_price(node)
+            if price is not None:
+                return price
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    for key in ('price', 'lowPrice'):
+        if key in data and data.get('@type') in ('Offer', 'AggregateOffer'):
+            return str(data[key])
+    for key in ('offers', '@graph', 'priceSpecification'):
+        if key in data:
+            price = offer_price(data[key])
+            if price is not None:
+                return price
+    return None
+
+class Selector:
+    """A CSS selector translated to XPath and compiled once"""
+
+    def __init__(self, css: str):
+        self.css = css
+        xpath = css2xpath(css)
+        # Selectors always run from the document root, where "//" is the
+        # same search and libxml2 evaluates it faster
+        if xpath.startswith('descendant-or-self::'):
+            xpath = '//' + xpath[len('descendant-or-self::'):]
+        self.xpath = etree.XPath(xpath)
+
+    def __call__(self, root) -> List[str]:
+        return [str(value) for value in self.xpath(root)]
+
+def json_ld_price(root) -> List[str]:
+    prices = []
+    for blob in JSON_LD_XPATH(root):
+        try:
+            price = offer_price(json.loads(blob))
+        except ValueError:
+            continue
+        if price is not None:
+            prices.append(price)
+    return prices
+
+def meta_price(root) -> List[str]:
+    return [str(value) for value in META_PRICE_XPATH(root)]
+
+class PlatformRules:
+    """Compiled extraction rules for one platform.
+
+    Price sources are tried structured data first, then the platform's
+    selectors. The source that last found a price on a domain is tried first
+    on its next page, so long-tail sites stop paying for the broad scans that
+    fail on them.
+    """
+
+    def __init__(self, platform: str, rules: dict):
+        self.platform = platform
+        self.domains = [domain.lower() for domain in rules.get('domains', [])]
+        self.price_sources = [('json-ld', json_ld_price), ('meta', meta_price)] + [
+            (css, Selector(css)) for css in rules.get('price', [])
+        ]
+        self.fields = {
+            field: [Selector(css) for css in selectors]
+            for field, selectors in rules.items() if field not in ('domains', 'price')
+        }
+        self._preferred: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def matches(self, host: str) -> bool:
+        return any(host == domain or host.endswith('.' + domain) for domain in self.domains)
+
+    def price_text(self, root, domain: str) -> Optional[str]:
+        """Raw text of the page's price"""
+        preferred = self._preferred.get(domain)
+        order = range(len(self.price_sources))
+        if preferred is not None:
+            order = [preferred] + [index for index in order if index != preferred]
+
+        for index in order:
+            for price_text in self.price_sources[index][1](root):
+                if parse_price(price_text):
+                    if index != preferred:
+                        with self._lock:
+                            self._preferred[domain] = index
+                    return price_text.strip()
+        return None
+
+    def extract(self, root, price_text: Optional[str]) -> dict:
+        """Product details and price from a parsed page"""
+        item = {'price': parse_price(price_text), 'platform': self.platform}
+        for field, selectors in self.fields.items():
+            item[field] = None
+            for selector in selectors:
+                values = [value.strip() for value in selector(root) if value.strip()]
+                if values:
+                    item[field] = ' '.join(values) if field in JOINED_FIELDS else values[0]
+                    break
+        return item
+
+class ExtractionRegistry:
+    """Extraction rules for every configured platform, keyed by domain"""
+
+    def __init__(self, rules: Dict[str, dict]):
+        self.platforms = {platform: PlatformRules(platform, platform_rules) for platform, platform_rules in rules.items()}
+        self.generic = self.platforms['generic']
+
+    def for_url(self, url: str) -> PlatformRules:
+        host = (urlparse(url).hostname or '').lower()
+        for rules in self.platforms.values():
+            if rules.matches(host):
+                return rules
+        return self.generic
+
+    def platform(self, url: str) -> str:
+        return self.for_url(url).platform
+
+    def extract(self, url: str, root) -> Tuple[Optional[str], dict]:
+        """Price text and item for a page, given its lxml root"""
+        rules = self.for_url(url)
+        price_text = rules.price_text(root, domain_slot(url))
+        return price_text, rules.extract(root, price_text)
+
+def load_rules() -> Dict[str, dict]:
+    rules = dict(EXTRACTION_RULES)
+    if EXTRACTION_RULES_PATH:
+        with open(EXTRACTION_RULES_PATH) as f:
+            rules.update(json.load(f))
+    return rules
+
+extraction_rules = ExtractionRegistry(load_rules())
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+from typing import Optional, Tuple
+from config import FETCH_CACHE_PATH
+
+class FetchCache:
+    """URL-keyed store of HTTP validators and price region fingerprints"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS fetch_cache ('
+                'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, fingerprint TEXT)'
+            )
+        return self._conn
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT etag, last_modified, fingerprint FROM fetch_cache WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'fingerprint': row[2]}
+
+    def set_validators(self, url: str, etag: Optional[str], last_modified: Optional[str]):
+        with self._lock:
+            self.conn.execute(
+                'INSERT INTO fetch_cache (url, etag, last_modified) VALUES (?, ?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified',
+                (url, etag, last_modified)
+            )
+
+    def set_fingerprint(self, url: str, fingerprint: str):
+        with self._lock:
+            self.conn.execute(
+                'INSERT INTO fetch_cache (url, fingerprint) VALUES (?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET fingerprint = excluded.fingerprint',
+                (url, fingerprint)
+            )
+
+    def fingerprint(self, url: str) -> Optional[str]:
+        entry = self.get(url)
+        return entry['fingerprint'] if entry else None
+
+    def save(self, url: str, validators: Optional[Tuple[Optional[str], Optional[str]]] = None,
+             fingerprint: Optional[str] = None):
+        if validators:
+            self.set_validators(url, *validators)
+        if fingerprint:
+            self.set_fingerprint(url, fingerprint)
+
+    def record(self, item: dict, **fields):
+        """Remember the validators and/or fingerprint of the page an item
+        came from.
+
+        Items bound for the price ingestor carry them instead until their
+        batch is committed (see ``commit``): a batch that is rolled back must
+        not leave its pages looking unchanged to the next fetch.
+        """
+        if item.get('ingest'):
+            item.setdefault('fetch_cache', {}).update(fields)
+        else:
+            self.save(item['url'], **fields)
+
+    def commit(self, item: dict):
+        """Save what ``record`` held back on an item once it was stored"""
+        pending = item.get('fetch_cache')
+        if pending:
+            self.save(item['url'], **pending)
+
+class ConditionalRequestMiddleware:
+    """Downloader middleware sending If-None-Match/If-Modified-Since for
+    pages fetched before. The validators servers return are left in
+    ``response.meta['validators']`` for the spider to record once the page
+    has been parsed."""
+
+    def process_request(self, request, spider):
+        if request.meta.get('force_refresh'):
+            return None
+
+        entry = fetch_cache.get(request.url)
+        if entry:
+            if entry['etag']:
+                request.headers.setdefault('If-None-Match', entry['etag'])
+            if entry['last_modified']:
+                request.headers.setdefault('If-Modified-Since', entry['last_modified'])
+        return None
+
+    def process_response(self, request, response, spider):
+        if response.status == 200:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                request.meta['validators'] = (
+                    etag.decode() if etag else None,
+                    last_modified.decode() if last_modified else None
+                )
+        return response
+
+fetch_cache = FetchCache(FETCH_CACHE_PATH)
@@ -0,0 +1,36 @@
+from twisted.internet import task, threads
+from ..services.price_ingest import price_ingestor
+
+class PriceIngestPipeline:
+    """Hands scraped prices to the batched ingestor.
+
+    Batches are flushed on a worker thread when the size threshold is reached
+    and on a timer, so DB writes never run on the reactor thread.
+    """
+
+    def __init__(self, ingestor=price_ingestor):
+        self.ingestor = ingestor
+        self.flush_loop = None
+
+    def open_spider(self, spider):
+        self.flush_loop = task.LoopingCall(self._flush)
+        self.flush_loop.start(self.ingestor.flush_interval, now=False)
+
+    def close_spider(self, spider):
+        if self.flush_loop and self.flush_loop.running:
+            self.flush_loop.stop()
+        return self._flush()
+
+    def process_item(self, item, spider):
+        # Items scraped for product creation are stored by the caller
+        if not item.get('ingest'):
+            return item
+
+        if self.ingestor.add(dict(item)):
+            d = self._flush()
+            d.addCallback(lambda _: item)
+            return d
+        return item
+
+    def _flush(self):
+        return threads.deferToThread(self.ingestor.flush)
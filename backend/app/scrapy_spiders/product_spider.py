@@ -1,83 +1,75 @@
 import scrapy
-from scrapy.crawler import CrawlerRunner, CrawlerProcess
-from scrapy.utils.project import get_project_settings
-from twisted.internet import reactor, defer
-from twisted.internet.asyncioreactor import install
-import re
-import asyncio
-from urllib.parse import urljoin
+import hashlib
+from .extraction import extraction_rules
+from .fetch_cache import fetch_cache
+from .throttle import domain_slot
+from ..services.metrics import timed
+
+@timed('parse')
+def parse_product_page(product_url: str, page_url: str, root, force_refresh: bool = False,
+                       ingest: bool = False) -> dict:
+    """Item for a fetched product page, given its lxml root.
+    
+    Shared by the spider and the lightweight fetcher so both fingerprint and
+    extract pages the same way.
+    """
+    # Rules are picked by domain and compiled once; parsing works on the
+    # lxml tree directly
+    rules = extraction_rules.for_url(page_url)
+    
+    # Only the price region is fingerprinted, so page noise such as ads or
+    # recommendations does not defeat the cache. When it matches the last
+    # fetch the rest of the page is not parsed at all.
+    price_text = rules.price_text(root, domain_slot(page_url))
+    fingerprint = hashlib.sha1(price_text.encode()).hexdigest() if price_text else None
+    if fingerprint and not force_refresh and fetch_cache.fingerprint(product_url) == fingerprint:
+        return {'url': product_url, 'unchanged': True, 'ingest': ingest}
+    
+    product_data = rules.extract(root, price_text)
+    product_data['url'] = product_url
+    product_data['ingest'] = ingest
+    
+    if fingerprint:
+        fetch_cache.record(product_data, fingerprint=fingerprint)
+    return product_data
 
 class ProductSpider(scrapy.Spider):
     name = 'product_spider'
     
-    def __init__(self, url=None, *args, **kwargs):
+    def __init__(self, url=None, urls=None, *args, **kwargs):
         super(ProductSpider, self).__init__(*args, **kwargs)
-        self.start_urls = [url] if url else []
+        self.start_urls = list(urls or [])
+        if url:
+            self.start_urls.append(url)
         self.scraped_data = {}
     
+    def start_requests(self):
+        for url in self.start_urls:
+            # Remember the tracked URL so items can be matched back to their
+            # product even when the site redirects, and queue the request
+            # under its domain's downloader slot
+            yield scrapy.Request(url, callback=self.parse, meta={
+                'product_url': url,
+                'download_slot': domain_slot(url),
+            })
+    
     def parse(self, response):
-        # Generic product scraping logic
-        product_data = {}
+        product_url = response.meta.get('product_url', response.url)
         
-        # Try different selectors for different platforms
-        if 'amazon' in response.url:
-            product_data = self.parse_amazon(response)
-        elif 'ebay' in response.url:
-            product_data = self.parse_ebay(response)
-        else:
-            product_data = self.parse_generic(response)
+        ingest = response.meta.get('ingest', False)
         
-        self.scraped_data = product_data
-        yield product_data
-    
-    def parse_amazon(self, response):
-        return {
-            'name': response.css('#productTitle::text').get(),
-            'price': self.extract_price(response.css('.a-price-whole::text').get()),
-            'image_url': response.css('#landingImage::attr(src)').get(),
-            'description': response.css('#feature-bullets ul::text').getall(),
-            'platform': 'amazon'
-        }
-    
-    def parse_ebay(self, response):
-        return {
-            'name': response.css('h1#x-title-label-lbl::text').get(),
-            'price': self.extract_price(response.css('.notranslate::text').get()),
-            'image_url': response.css('#icImg::attr(src)').get(),
-            'description': response.css('.u-flL.condText::text').get(),
-            'platform': 'ebay'
-        }
-    
-    def parse_generic(self, response):
-        # Fallback parsing for unknown sites
-        return {
-            'name': response.css('h1::text').get() or response.css('title::text').get(),
-            'price': self.extract_price_from_page(response),
-            'image_url': response.css('img::attr(src)').get(),
-            'description': response.css('meta[name="description"]::attr(content)').get(),
-            'platform': 'generic'
-        }
-    
-    def extract_price(self, price_text):
-        if not price_text:
-            return None
-        # Extract numeric price from text
-        price_match = re.search(r'[\d,]+\.?\d*', price_text.replace(',', ''))
-        return float(price_match.group()) if price_match else None
-    
-    def extract_price_from_page(self, response):
-        # Try to find price using common patterns
-        price_selectors = [
-            'span[class*="price"]::text',
-            'div[class*="price"]::text',
-            '*[class*="cost"]::text',
-            '*[data-price]::attr(data-price)'
-        ]
+        # The server confirmed the page is unchanged since the last fetch
+        if response.status == 304:
+            yield {'url': product_url, 'unchanged': True, 'ingest': ingest}
+            return
         
-        for selector in price_selectors:
-            price_text = response.css(selector).get()
-            if price_text:
-                price = self.extract_price(price_text)
-                if price:
-                    return price
-        return None
+        self.scraped_data = parse_product_page(
+            product_url, response.url, response.selector.root,
+            force_refresh=response.meta.get('force_refresh', False), ingest=ingest
+        )
+        # Validators are kept only for pages a price was read from, so a
+        # broken page is fetched in full next time rather than answered 304
+        validators = response.meta.get('validators')
+        if validators and (self.scraped_data.get('unchanged') or self.scraped_data.get('price') is not None):
+            fetch_cache.record(self.scraped_data, validators=validators)
+        yield self.scraped_data
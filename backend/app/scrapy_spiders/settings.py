@@ -1,9 +1,39 @@
+from config import DEFAULT_DOMAIN_POLITENESS, DOMAIN_POLITENESS
+
 # Use a real browser User-Agent to reduce blocking
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
 
-# Add a delay between requests to avoid hitting servers too fast
-DOWNLOAD_DELAY = 3
+# Politeness is enforced per domain rather than globally: every domain has its
+# own downloader slot with its own concurrency and delay, starting from the
+# limits in config.py and adapted at runtime by AdaptiveDomainThrottle
+DOWNLOAD_DELAY = DEFAULT_DOMAIN_POLITENESS['delay']
 RANDOMIZE_DOWNLOAD_DELAY = True
+CONCURRENT_REQUESTS_PER_DOMAIN = DEFAULT_DOMAIN_POLITENESS['concurrency']
+DOWNLOAD_SLOTS = {
+    domain: {
+        'concurrency': limits.get('concurrency', DEFAULT_DOMAIN_POLITENESS['concurrency']),
+        'delay': limits.get('delay', DEFAULT_DOMAIN_POLITENESS['delay']),
+        'randomize_delay': True,
+    }
+    for domain, limits in DOMAIN_POLITENESS.items()
+}
+
+# Upper bound on requests in flight across all domains
+CONCURRENT_REQUESTS = 128
+
+# Keep a separate queue per domain and always dequeue from the least busy one,
+# so a slow site cannot hold back the rest of a sweep
+SCHEDULER_PRIORITY_QUEUE = 'scrapy.pqueues.DownloaderAwarePriorityQueue'
+
+DOWNLOADER_MIDDLEWARES = {
+    'app.scrapy_spiders.fetch_cache.ConditionalRequestMiddleware': 590,
+    'app.scrapy_spiders.throttle.AdaptiveDomainThrottle': 600,
+}
+
+# Scraped prices are written to the DB in batches
+ITEM_PIPELINES = {
+    'app.scrapy_spiders.pipelines.PriceIngestPipeline': 300,
+}
 
 # Obey robots.txt rules (set to False for testing)
 ROBOTSTXT_OBEY = False
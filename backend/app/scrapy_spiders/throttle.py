@@ -0,0 +1,94 @@
+import time
+from urllib.parse import urlparse
+from config import DEFAULT_DOMAIN_POLITENESS, DOMAIN_POLITENESS
+from ..services.metrics import record_fetch
+import logging
+
+THROTTLE_STATUSES = {429, 503}
+
+def domain_slot(url: str) -> str:
+    """Downloader slot key for a URL: the configured domain it belongs to,
+    or its hostname without the "www." prefix"""
+    host = (urlparse(url).hostname or '').lower()
+    for domain in DOMAIN_POLITENESS:
+        if host == domain or host.endswith('.' + domain):
+            return domain
+    return host[4:] if host.startswith('www.') else host
+
+def domain_limits(domain: str) -> dict:
+    """Politeness limits for a domain, merged over the defaults"""
+    return {**DEFAULT_DOMAIN_POLITENESS, **DOMAIN_POLITENESS.get(domain, {})}
+
+class AdaptiveDomainThrottle:
+    """Downloader middleware tuning each domain's slot from its responses.
+
+    Throttling responses (429/503) halve the slot's concurrency and double its
+    delay. A full window of healthy responses under the target latency adds
+    one concurrent request and shortens the delay; slow windows give one back.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def process_request(self, request, spider):
+        request.meta.setdefault('download_slot', domain_slot(request.url))
+
+    def process_response(self, request, response, spider):
+        self._record(request, response.status)
+        self._observe(request, response.status, response.headers.get('Retry-After'))
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._record(request, None)
+        self._observe(request, None)
+
+    def _record(self, request, status):
+        latency = request.meta.get('download_latency')
+        queued_at = request.meta.get('queued_at')
+        # Time in the scheduler and the slot queue, before the download began
+        queue_wait = time.monotonic() - queued_at - (latency or 0.0) if queued_at else None
+        record_fetch(request.meta.get('download_slot'), 'scrapy', status, latency, queue_wait)
+
+    def _slot(self, key):
+        engine = self.crawler.engine
+        return engine.downloader.slots.get(key) if engine else None
+
+    def _observe(self, request, status, retry_after=None):
+        key = request.meta.get('download_slot')
+        slot = self._slot(key)
+        if slot is None:
+            return
+
+        limits = domain_limits(key)
+        stats = self.stats.setdefault(key, {'responses': 0, 'latency': 0.0})
+
+        if status in THROTTLE_STATUSES or status is None:
+            slot.concurrency = max(1, slot.concurrency // 2)
+            slot.delay = min(limits['max_delay'], max(slot.delay * 2, limits['min_delay']))
+            if retry_after and retry_after.isdigit():
+                slot.delay = min(limits['max_delay'], max(slot.delay, float(retry_after)))
+            stats.update(responses=0, latency=0.0)
+            logging.info(f"Backing off {key}: concurrency={slot.concurrency} delay={slot.delay:.2f}s")
+            return
+
+        latency = request.meta.get('download_latency', 0.0)
+        stats['responses'] += 1
+        stats['latency'] += latency
+
+        # Re-evaluate once per window of as many responses as the slot allows
+        if stats['responses'] < slot.concurrency:
+            return
+
+        mean_latency = stats['latency'] / stats['responses']
+        stats.update(responses=0, latency=0.0)
+
+        if mean_latency <= limits['target_latency']:
+            slot.concurrency = min(limits['max_concurrency'], slot.concurrency + 1)
+            slot.delay = max(limits['min_delay'], slot.delay * 0.75)
+        elif slot.concurrency > 1:
+            slot.concurrency -= 1
@@ -0,0 +1,53 @@
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from ..models.product import Subscription, User
+
+def trigger_price(threshold_price: Optional[float], percent_drop: Optional[float],
+                  baseline_price: Optional[float]) -> Optional[float]:
+    """The price at or below which a subscription fires"""
+    if threshold_price is not None:
+        return threshold_price
+    if percent_drop is not None and baseline_price:
+        return round(baseline_price * (1 - percent_drop / 100), 2)
+    return None
+
+def match_price_drops(db: Session, drops: List[dict]) -> List[dict]:
+    """Alerts for every subscription whose trigger price a drop crossed.
+
+    ``drops`` are dicts with product_id, product_name, product_url, old_price
+    and new_price. A subscription fires once per crossing, when the price
+    moves from above its trigger to at or below it, so each drop is a range
+    lookup on the (product_id, trigger_price) index. All drops are matched in
+    one query and the alerts come back ready for enqueue_alerts.
+    """
+    if not drops:
+        return []
+
+    by_product: Dict[int, dict] = {drop['product_id']: drop for drop in drops}
+    crossed = or_(*(
+        and_(
+            Subscription.product_id == drop['product_id'],
+            Subscription.trigger_price >= drop['new_price'],
+            Subscription.trigger_price < drop['old_price'],
+        )
+        for drop in by_product.values()
+    ))
+
+    rows = db.execute(
+        select(Subscription.product_id, User.email)
+        .join(User, User.id == Subscription.user_id)
+        .where(crossed, Subscription.is_active == True, User.is_active == True)
+    )
+
+    return [
+        {
+            'recipient_email': email,
+            'product_id': product_id,
+            'product_name': by_product[product_id]['product_name'],
+            'product_url': by_product[product_id]['product_url'],
+            'old_price': by_product[product_id]['old_price'],
+            'new_price': by_product[product_id]['new_price'],
+        }
+        for product_id, email in rows
+    ]
@@ -0,0 +1,126 @@
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import List
+import threading
+from ..db.database import SessionLocal
+from ..models.product import AlertOutbox
+from .email_alert import email_service
+from .metrics import ALERTS, timed
+from config import ALERT_BATCH_SIZE, ALERT_MAX_ATTEMPTS, ALERT_POLL_SECONDS, ALERT_RETRY_BASE_SECONDS
+import logging
+
+def enqueue_alerts(db: Session, alerts: List[dict]) -> None:
+    """Queue alerts in the caller's transaction.
+
+    Each alert is a dict with recipient_email, product_id, product_name,
+    product_url, old_price and new_price.
+    """
+    if alerts:
+        db.execute(insert(AlertOutbox).values(alerts))
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff after a failed delivery, capped at six hours"""
+    return timedelta(seconds=min(6 * 3600, ALERT_RETRY_BASE_SECONDS * 2 ** (attempts - 1)))
+
+class AlertDeliveryWorker:
+    """Background thread draining the alert outbox in batches.
+
+    Due alerts are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    workers can share the outbox, and sent over one pooled mail connection.
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = ALERT_BATCH_SIZE,
+                 poll_interval: float = ALERT_POLL_SECONDS):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self):
+        """Start the delivery thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='alert-delivery', daemon=True)
+        self._thread.start()
+        logging.info("Alert delivery worker started")
+
+    def stop(self):
+        """Stop the delivery thread and close the mail connection"""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=30)
+        email_service.close()
+        logging.info("Alert delivery worker stopped")
+
+    def notify(self):
+        """Deliver newly queued alerts without waiting for the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # Keep draining while full batches are coming back
+                while self.deliver_batch() == self.batch_size and not self._stop.is_set():
+                    pass
+            except Exception as e:
+                logging.error(f"Error delivering alerts: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def deliver_batch(self) -> int:
+        """Send one batch of due alerts, returning how many were attempted"""
+        db = self.session_factory()
+        try:
+            now = datetime.now(timezone.utc)
+            alerts = db.execute(
+                select(AlertOutbox)
+                .where(AlertOutbox.status == 'pending', AlertOutbox.next_attempt_at <= now)
+                .order_by(AlertOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not alerts:
+                return 0
+
+            messages = []
+            for alert in alerts:
+                subject, html_content = email_service.build_price_alert(
+                    alert.product_name, alert.old_price, alert.new_price, alert.product_url
+                )
+                messages.append((alert.recipient_email, subject, html_content))
+
+            with timed('alert_send'):
+                results = email_service.send_batch(messages)
+
+            delivered = 0
+            for alert, sent in zip(alerts, results):
+                alert.attempts += 1
+                if sent:
+                    alert.status = 'sent'
+                    alert.sent_at = now
+                    delivered += 1
+                elif alert.attempts >= ALERT_MAX_ATTEMPTS:
+                    alert.status = 'failed'
+                    alert.last_error = "Delivery failed"
+                else:
+                    alert.last_error = "Delivery failed"
+                    alert.next_attempt_at = now + retry_delay(alert.attempts)
+
+            db.commit()
+            ALERTS.labels('sent').inc(delivered)
+            ALERTS.labels('failed').inc(len(alerts) - delivered)
+            logging.info(f"Delivered {delivered} of {len(alerts)} price alerts")
+            return len(alerts)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+alert_worker = AlertDeliveryWorker()
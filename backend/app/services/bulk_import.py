@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit
+import csv
+import io
+import threading
+import uuid
+from .registry import get_scraper_service
+from config import BULK_IMPORT_JOB_HISTORY
+import logging
+
+def is_product_url(url: str) -> bool:
+    parts = urlsplit(url)
+    return parts.scheme in ('http', 'https') and bool(parts.hostname)
+
+def parse_csv(text: str) -> List[dict]:
+    """Rows of a CSV upload with a header naming at least a ``url`` column,
+    plus optional ``target_price``, ``name`` and ``platform`` columns"""
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or 'url' not in [name.strip().lower() for name in reader.fieldnames]:
+        raise ValueError("CSV needs a header row with a url column")
+
+    rows = []
+    for row in reader:
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        target_price = row.get('target_price')
+        rows.append({
+            'url': row.get('url', ''),
+            'target_price': float(target_price) if target_price else None,
+            'name': row.get('name') or None,
+            'platform': row.get('platform') or None,
+        })
+    return rows
+
+class ImportJob:
+    """Progress of one bulk import and its initial scrapes"""
+
+    def __init__(self, total: int, duplicates: int, invalid: int):
+        self.id = uuid.uuid4().hex
+        self.total = total
+        self.duplicates = duplicates
+        self.invalid = invalid
+        self.queued = 0
+        self.scraped = 0
+        self.failed = 0
+        self.status = 'pending'
+        self.created_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def record_item(self, item: dict):
+        # Called on the reactor thread for every scraped page
+        with self._lock:
+            if item.get('price') is not None:
+                self.scraped += 1
+            else:
+                self.failed += 1
+
+    def finish(self, future):
+        with self._lock:
+            if future.cancelled():
+                self.status = 'cancelled'
+            elif future.exception() is not None:
+                logging.error(f"Bulk import {self.id} failed: {future.exception()}")
+                self.status = 'failed'
+            else:
+                self.status = 'completed'
+            # URLs that never produced an item failed as well
+            self.failed = self.queued - self.scraped
+            self.finished_at = datetime.now(timezone.utc)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'total': self.total,
+                'duplicates': self.duplicates,
+                'invalid': self.invalid,
+                'queued': self.queued,
+                'scraped': self.scraped,
+                'failed': self.failed,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+            }
+
+class BulkImportService:
+    """In-process registry of bulk import jobs.
+
+    Jobs live in the API process that accepted them; only the most recent
+    BULK_IMPORT_JOB_HISTORY are kept for polling.
+    """
+
+    def __init__(self, history: int = BULK_IMPORT_JOB_HISTORY):
+        self.history = history
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create_job(self, total: int, duplicates: int, invalid: int) -> ImportJob:
+        job = ImportJob(total, duplicates, invalid)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def start_scrapes(self, job: ImportJob, urls: Iterable[str]):
+        """Queue the initial scrape of every imported product on the crawl
+        engine; the ingest pipeline stores prices and page details"""
+        urls = set(urls)
+        job.queued = len(urls)
+        if not urls:
+            job.status = 'completed'
+            job.finished_at = datetime.now(timezone.utc)
+            return
+
+        job.status = 'running'
+        try:
+            future = get_scraper_service().submit(urls, on_item=job.record_item, force_refresh=True, ingest=True)
+        except RuntimeError as e:
+            # The products are stored; the scheduler scrapes them once their
+            # first check falls due
+            logging.error(f"Bulk import {job.id} could not queue scrapes: {e}")
+            job.status = 'failed'
+            job.failed = job.queued
+            job.finished_at = datetime.now(timezone.utc)
+            return
+        future.add_done_callback(job.finish)
+
+bulk_import_service = BulkImportService()
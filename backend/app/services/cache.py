@@ -0,0 +1,157 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+import hashlib
+import threading
+import time
+from config import REDIS_URL, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+import logging
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+    # Keyset cursor of the page after a cached list page, if there is one
+    next_cursor: Optional[str] = None
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers ``etag`` (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+class MemoryBackend:
+    """Per-process LRU with a TTL on every entry"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+        # Version counters are kept apart so they never expire or get evicted
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: CachedResponse):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return self._versions[key]
+
+    def version(self, key: str) -> int:
+        return self._versions.get(key, 0)
+
+class RedisBackend:
+    """Shared cache for several API workers in any Redis-compatible server"""
+
+    def __init__(self, url: str, ttl: float):
+        import redis
+
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        value = self._client.get(key)
+        if value is None:
+            return None
+        etag, _, rest = value.partition(b'\n')
+        next_cursor, found, body = rest.partition(b'\n')
+        if not found:
+            # Written by an older version without the cursor line
+            return None
+        return CachedResponse(etag.decode(), body, next_cursor.decode() or None)
+
+    def set(self, key: str, value: CachedResponse):
+        stored = b'\n'.join([value.etag.encode(), (value.next_cursor or '').encode(), value.body])
+        self._client.set(key, stored, ex=max(1, int(self.ttl)))
+
+    def delete(self, *keys: str):
+        if keys:
+            self._client.delete(*keys)
+
+    def incr(self, key: str) -> int:
+        return self._client.incr(key)
+
+    def version(self, key: str) -> int:
+        return int(self._client.get(key) or 0)
+
+class ResponseCache:
+    """Read-through cache of serialized product responses.
+
+    Detail responses are keyed by product id. List pages are keyed by a
+    version number as well, so one increment invalidates every page
+    whenever any product changes. Cache errors are logged and treated as
+    misses so the API keeps answering from the database.
+    """
+
+    LIST_VERSION_KEY = 'products:list:version'
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logging.warning(f"Response cache read failed: {e}")
+            return None
+
+    def set(self, key: str, body: bytes, next_cursor: Optional[str] = None) -> CachedResponse:
+        value = CachedResponse(make_etag(body), body, next_cursor)
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            logging.warning(f"Response cache write failed: {e}")
+        return value
+
+    def product_key(self, product_id: int) -> str:
+        return f'products:{product_id}'
+
+    def list_key(self, *params) -> str:
+        """Key of a list page, from the query parameters that shape it"""
+        try:
+            version = self.backend.version(self.LIST_VERSION_KEY)
+        except Exception as e:
+            logging.warning(f"Response cache read failed: {e}")
+            version = 'unavailable'
+        return f'products:list:{version}:' + ':'.join(str(param) for param in params)
+
+    def invalidate_products(self, product_ids: Iterable[int]):
+        """Drop the cached responses of changed, added or deleted products"""
+        try:
+            self.backend.delete(*(self.product_key(product_id) for product_id in product_ids))
+            self.backend.incr(self.LIST_VERSION_KEY)
+        except Exception as e:
+            logging.warning(f"Response cache invalidation failed: {e}")
+
+def create_response_cache() -> ResponseCache:
+    if REDIS_URL:
+        return ResponseCache(RedisBackend(REDIS_URL, RESPONSE_CACHE_TTL_SECONDS))
+    return ResponseCache(MemoryBackend(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS))
+
+response_cache = create_response_cache()
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+from statistics import mean, pstdev
+from typing import Optional, Sequence, Tuple
+from .metrics import FLAT_SCHEDULE_SCRAPES, SCHEDULED_SCRAPES, counter_total
+from config import (
+    FLAT_CHECK_INTERVAL_MINUTES, MIN_CHECK_INTERVAL_MINUTES, MAX_CHECK_INTERVAL_MINUTES,
+    PLATFORM_CHECK_WEIGHTS,
+)
+
+def volatility_factor(runs: Sequence[Tuple[float, datetime]]) -> float:
+    """Scale for the check interval from recent price history.
+
+    ``runs`` are the most recent (price, first seen) change points, newest
+    first. A product whose price never moves is checked up to 4x less often
+    than the flat schedule; one that changes several times a day is checked
+    as often as the minimum interval allows.
+    """
+    if not runs:
+        return 1.0
+
+    oldest = runs[-1][1]
+    if oldest.tzinfo is None:
+        oldest = oldest.replace(tzinfo=timezone.utc)
+    span_days = max(0.0, (datetime.now(timezone.utc) - oldest).total_seconds() / 86400)
+    changes_per_day = (len(runs) - 1) / max(1.0, span_days)
+
+    prices = [price for price, _ in runs]
+    avg = mean(prices)
+    spread = pstdev(prices) / avg if avg else 0.0
+
+    # A short history is weak evidence of a stable price, so newly tracked
+    # products back off gradually
+    return min(1.0 + span_days, 4.0 / (1.0 + 2.0 * changes_per_day + 20.0 * spread))
+
+def proximity_factor(current_price: Optional[float], target_price: Optional[float]) -> float:
+    """Scale for the check interval from the distance to the target price.
+
+    Products within 20% of their target are checked progressively more often,
+    down to a quarter of the interval when the price is within 5%.
+    """
+    if not current_price or not target_price or current_price <= target_price:
+        return 1.0
+
+    gap = (current_price - target_price) / current_price
+    return min(1.0, max(0.25, gap / 0.2))
+
+def next_check_interval(platform: Optional[str], current_price: Optional[float],
+                        target_price: Optional[float], runs: Sequence[Tuple[float, datetime]]) -> timedelta:
+    """Time until a product should next be checked"""
+    minutes = (
+        FLAT_CHECK_INTERVAL_MINUTES
+        * PLATFORM_CHECK_WEIGHTS.get(platform or 'generic', 1.0)
+        * volatility_factor(runs)
+        * proximity_factor(current_price, target_price)
+    )
+    minutes = min(MAX_CHECK_INTERVAL_MINUTES, max(MIN_CHECK_INTERVAL_MINUTES, minutes))
+    return timedelta(minutes=minutes)
+
+class CheckMetrics:
+    """Scrapes performed by the priority scheduler versus a flat schedule.
+
+    Kept in the Prometheus counters, so with PROMETHEUS_MULTIPROC_DIR set
+    every process, API workers included, reports the totals of all
+    scheduler workers since the directory was created.
+    """
+
+    def record_tick(self, active_products: int, tick_minutes: float, scrapes: int):
+        """Account for one scheduler tick.
+
+        The flat schedule would have checked every active product once per
+        FLAT_CHECK_INTERVAL_MINUTES, i.e. this fraction of them per tick.
+        Only one worker passes ``active_products``, so sweeps spread over
+        several workers count the baseline once.
+        """
+        SCHEDULED_SCRAPES.inc(scrapes)
+        FLAT_SCHEDULE_SCRAPES.inc(active_products * tick_minutes / FLAT_CHECK_INTERVAL_MINUTES)
+
+    def snapshot(self) -> dict:
+        performed = round(counter_total('pricepulse_scheduled_scrapes_total'))
+        flat = round(counter_total('pricepulse_flat_schedule_scrapes_total'))
+        saved = flat - performed
+        return {
+            'scrapes_performed': performed,
+            'flat_schedule_scrapes': flat,
+            'scrapes_saved': saved,
+            'savings_ratio': round(saved / flat, 4) if flat else 0.0,
+        }
+
+check_metrics = CheckMetrics()
@@ -2,9 +2,12 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
-from typing import List
-import sendgrid
-from sendgrid.helpers.mail import Mail
+import threading
+from typing import List, Tuple
+import logging
+
+# (recipient_email, subject, html_content)
+EmailMessage = Tuple[str, str, str]
 
 class EmailService:
     def __init__(self):
@@ -12,13 +15,22 @@ class EmailService:
         self.smtp_port = int(os.getenv('SMTP_PORT', '587'))
         self.smtp_user = os.getenv('SMTP_USER')
         self.smtp_password = os.getenv('SMTP_PASSWORD')
+        # Disable for a local stand-in server such as aiosmtpd
+        self.smtp_starttls = os.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+        self.sender_email = os.getenv('ALERT_FROM_EMAIL', self.smtp_user)
         self.sendgrid_api_key = os.getenv('SENDGRID_API_KEY')
-    
-    def send_price_alert(self, recipient_email: str, product_name: str, 
-                        old_price: float, new_price: float, product_url: str):
-        """Send price drop alert email"""
+
+        # One authenticated SMTP connection and one SendGrid client are
+        # reused across sends instead of being rebuilt for every email
+        self._smtp = None
+        self._sendgrid = None
+        self._lock = threading.Lock()
+
+    def build_price_alert(self, product_name: str, old_price: float,
+                          new_price: float, product_url: str) -> Tuple[str, str]:
+        """Subject and HTML body of a price drop alert"""
         subject = f"Price Drop Alert: {product_name}"
-        
+
         html_content = f"""
         <html>
             <body>
@@ -33,49 +45,112 @@ class EmailService:
             </body>
         </html>
         """
-        
-        if self.sendgrid_api_key:
-            return self._send_with_sendgrid(recipient_email, subject, html_content)
-        else:
-            return self._send_with_smtp(recipient_email, subject, html_content)
-    
-    def _send_with_smtp(self, recipient_email: str, subject: str, html_content: str):
+        return subject, html_content
+
+    def send_price_alert(self, recipient_email: str, product_name: str,
+                        old_price: float, new_price: float, product_url: str):
+        """Send price drop alert email"""
+        subject, html_content = self.build_price_alert(product_name, old_price, new_price, product_url)
+        return self.send_batch([(recipient_email, subject, html_content)])[0]
+
+    def send_batch(self, messages: List[EmailMessage]) -> List[bool]:
+        """Send several emails over the pooled connection, returning per-message success"""
+        with self._lock:
+            if self.sendgrid_api_key:
+                return [self._send_with_sendgrid(*message) for message in messages]
+
+            try:
+                server = self._smtp_connection()
+            except Exception as e:
+                logging.exception(f"Error connecting to SMTP server: {e}")
+                self._close_smtp()
+                return [False] * len(messages)
+
+            results = []
+            for message in messages:
+                try:
+                    results.append(self._send_with_smtp(server, *message))
+                except smtplib.SMTPServerDisconnected:
+                    # The server dropped the pooled connection; reconnect once
+                    self._close_smtp()
+                    try:
+                        server = self._smtp_connection()
+                        results.append(self._send_with_smtp(server, *message))
+                    except Exception as e:
+                        logging.exception(f"Error sending email to {message[0]}: {e}")
+                        results.append(False)
+            return results
+
+    def close(self):
+        """Close the pooled SMTP connection"""
+        with self._lock:
+            self._close_smtp()
+
+    def _smtp_connection(self) -> smtplib.SMTP:
+        """The pooled SMTP connection, opened and authenticated on first use"""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close_smtp()
+
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        if self.smtp_starttls:
+            server.starttls()
+        if self.smtp_user and self.smtp_password:
+            server.login(self.smtp_user, self.smtp_password)
+        self._smtp = server
+        return server
+
+    def _close_smtp(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _send_with_smtp(self, server: smtplib.SMTP, recipient_email: str, subject: str, html_content: str):
         """Send email using SMTP"""
         try:
             message = MIMEMultipart("alternative")
             message["Subject"] = subject
-            message["From"] = self.smtp_user
+            message["From"] = self.sender_email
             message["To"] = recipient_email
-            
+
             html_part = MIMEText(html_content, "html")
             message.attach(html_part)
-            
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.smtp_user, self.smtp_password)
-            server.sendmail(self.smtp_user, recipient_email, message.as_string())
-            server.quit()
-            
+
+            server.sendmail(self.sender_email, recipient_email, message.as_string())
+
             return True
+        except smtplib.SMTPServerDisconnected:
+            raise
         except Exception as e:
-            print(f"Error sending email: {e}")
+            logging.warning(f"Error sending email to {recipient_email}: {e}")
             return False
-    
+
     def _send_with_sendgrid(self, recipient_email: str, subject: str, html_content: str):
         """Send email using SendGrid"""
         try:
-            sg = sendgrid.SendGridAPIClient(api_key=self.sendgrid_api_key)
+            # Imported on first use; SMTP deployments never load it
+            import sendgrid
+            from sendgrid.helpers.mail import Mail
+            if self._sendgrid is None:
+                self._sendgrid = sendgrid.SendGridAPIClient(api_key=self.sendgrid_api_key)
             message = Mail(
-                from_email=self.smtp_user,
+                from_email=self.sender_email,
                 to_emails=recipient_email,
                 subject=subject,
                 html_content=html_content
             )
-            
-            response = sg.send(message)
+
+            response = self._sendgrid.send(message)
             return response.status_code == 202
         except Exception as e:
-            print(f"Error sending email with SendGrid: {e}")
+            logging.warning(f"Error sending email to {recipient_email} with SendGrid: {e}")
             return False
 
 email_service = EmailService()
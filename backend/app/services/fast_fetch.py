@@ -0,0 +1,125 @@
+from typing import Dict, Iterable, Optional
+import asyncio
+import time
+import httpx
+from lxml import etree, html
+from ..scrapy_spiders.fetch_cache import fetch_cache
+from ..scrapy_spiders.product_spider import parse_product_page
+from ..scrapy_spiders.settings import DEFAULT_REQUEST_HEADERS, USER_AGENT
+from ..scrapy_spiders.throttle import domain_limits, domain_slot
+from .metrics import record_fetch
+from config import FAST_PATH_DOMAINS, FAST_PATH_MAX_CONNECTIONS, FAST_PATH_TIMEOUT
+import logging
+
+# httpx negotiates its own encodings and keeps connections alive
+HEADERS = {
+    'User-Agent': USER_AGENT,
+    **{name: value for name, value in DEFAULT_REQUEST_HEADERS.items() if name not in ('Accept-Encoding', 'Connection')},
+}
+
+class DomainSlot:
+    """Concurrency and spacing of fast-path requests to one domain, from the
+    same politeness limits as the domain's Scrapy downloader slot"""
+
+    def __init__(self, limits: dict):
+        self.semaphore = asyncio.Semaphore(limits['concurrency'])
+        self.delay = limits['delay']
+        self.next_start = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self.next_start)
+        self.next_start = start + self.delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+class FastFetcher:
+    """Fetches product pages with one keep-alive httpx client and parses them
+    with lxml, skipping Scrapy's middleware stack.
+
+    Runs on the crawl engine's asyncio loop. ``fetch`` returns None whenever
+    the page should go through the spider instead: network errors, non-200
+    responses (Scrapy retries and throttles those) and pages without an
+    extractable price.
+    """
+
+    def __init__(self, domains: Iterable[str] = FAST_PATH_DOMAINS,
+                 max_connections: int = FAST_PATH_MAX_CONNECTIONS, timeout: float = FAST_PATH_TIMEOUT):
+        self.domains = set(domains)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Dict[str, DomainSlot] = {}
+
+    def handles(self, url: str) -> bool:
+        return domain_slot(url) in self.domains
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=HEADERS,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    def _slot(self, domain: str) -> DomainSlot:
+        if domain not in self._slots:
+            self._slots[domain] = DomainSlot(domain_limits(domain))
+        return self._slots[domain]
+
+    async def fetch(self, url: str, force_refresh: bool = False, ingest: bool = False) -> Optional[dict]:
+        """Scraped item for ``url``, or None to fall back to the spider"""
+        headers = {}
+        if not force_refresh:
+            entry = fetch_cache.get(url)
+            if entry and entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry and entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        domain = domain_slot(url)
+        queued_at = time.monotonic()
+        try:
+            async with self._slot(domain):
+                sent_at = time.monotonic()
+                response = await self.client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            record_fetch(domain, 'fast', None)
+            logging.debug(f"Fast path fetch of {url} failed: {e}")
+            return None
+        record_fetch(domain, 'fast', response.status_code, time.monotonic() - sent_at, sent_at - queued_at)
+
+        if response.status_code == 304:
+            return {'url': url, 'unchanged': True, 'ingest': ingest}
+        if response.status_code != 200:
+            return None
+
+        try:
+            root = html.document_fromstring(response.content)
+        except (etree.ParserError, ValueError):
+            return None
+
+        item = parse_product_page(url, str(response.url), root, force_refresh=force_refresh, ingest=ingest)
+        if not item.get('unchanged') and item.get('price') is None:
+            return None
+
+        # Only remembered once a price was read, so the spider's fallback
+        # request is not answered with a 304 for a page it never parsed
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if etag or last_modified:
+            fetch_cache.record(item, validators=(etag, last_modified))
+        return item
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,167 @@
+"""Streaming export of price history as CSV, NDJSON or Parquet.
+
+Rows are read through a server-side cursor in batches of EXPORT_BATCH_ROWS
+and each batch is encoded and handed on before the next one is fetched, so
+an export of any size runs in constant memory. Parquet is written one row
+group per batch with pyarrow.
+
+    python -m app.services.history_export --format parquet --since 2025-01-01 -o history.parquet
+    python -m app.services.history_export --product-id 1 --product-id 2 > history.csv
+"""
+from sqlalchemy import select
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+import argparse
+import csv
+import importlib.util
+import io
+import json
+import sys
+from ..db.database import SessionLocal
+from ..models.product import PriceHistory
+from config import EXPORT_BATCH_ROWS
+
+COLUMNS = ('product_id', 'price', 'timestamp', 'last_seen_at')
+
+MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+def as_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive timestamps
+    if moment is None or moment.tzinfo:
+        return moment
+    return moment.replace(tzinfo=timezone.utc)
+
+def history_batches(product_ids: Sequence[int] = (), since: Optional[datetime] = None,
+                    until: Optional[datetime] = None, session_factory=SessionLocal,
+                    batch_size: int = EXPORT_BATCH_ROWS) -> Iterator[List[tuple]]:
+    """Price runs as lists of (product_id, price, timestamp, last_seen_at),
+    newest first per product, for some or all products.
+
+    Ordered as the (product_id, timestamp DESC) index is, so the database
+    streams rows without sorting them first.
+    """
+    query = select(PriceHistory.product_id, PriceHistory.price, PriceHistory.timestamp, PriceHistory.last_seen_at)
+    if product_ids:
+        query = query.where(PriceHistory.product_id.in_(product_ids))
+    if since:
+        query = query.where(PriceHistory.timestamp >= since)
+    if until:
+        query = query.where(PriceHistory.timestamp < until)
+    query = query.order_by(PriceHistory.product_id, PriceHistory.timestamp.desc())
+
+    with session_factory() as db:
+        # yield_per fetches through a server-side cursor
+        result = db.execute(query.execution_options(yield_per=batch_size))
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+
+def iso(moment: Optional[datetime]) -> Optional[str]:
+    return as_utc(moment).isoformat() if moment else None
+
+def write_csv(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for batch in batches:
+        writer.writerows((product_id, price, iso(timestamp), iso(last_seen_at))
+                         for product_id, price, timestamp, last_seen_at in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def write_ndjson(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield ''.join(
+            json.dumps({'product_id': product_id, 'price': price,
+                        'timestamp': iso(timestamp), 'last_seen_at': iso(last_seen_at)}) + '\n'
+            for product_id, price, timestamp, last_seen_at in batch
+        ).encode()
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file collecting what pyarrow writes until it is drained"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def write_parquet(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """Parquet with one row group per batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('product_id', pa.int32()),
+        ('price', pa.float64()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('last_seen_at', pa.timestamp('us', tz='UTC')),
+    ])
+    sink = ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for batch in batches:
+            product_ids, prices, timestamps, last_seen = zip(*batch)
+            writer.write_table(pa.table([
+                pa.array(product_ids, pa.int32()),
+                pa.array(prices, pa.float64()),
+                pa.array([as_utc(moment) for moment in timestamps], schema.field('timestamp').type),
+                pa.array([as_utc(moment) for moment in last_seen], schema.field('last_seen_at').type),
+            ], schema=schema))
+            yield sink.drain()
+    # The footer is written on close
+    yield sink.drain()
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec('pyarrow') is not None
+
+WRITERS: Dict[str, Callable[[Iterable[List[tuple]]], Iterator[bytes]]] = {
+    'csv': write_csv,
+    'ndjson': write_ndjson,
+    'parquet': write_parquet,
+}
+
+def export_history(file_format: str, product_ids: Sequence[int] = (), since: Optional[datetime] = None,
+                   until: Optional[datetime] = None, session_factory=SessionLocal) -> Iterator[bytes]:
+    """The encoded export, in chunks of about one batch each"""
+    return WRITERS[file_format](history_batches(product_ids, since, until, session_factory))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--format', choices=sorted(WRITERS), default='csv')
+    parser.add_argument('--product-id', type=int, action='append', default=[],
+                        help="product to export, repeatable (default all products)")
+    parser.add_argument('--since', type=datetime.fromisoformat, help="first seen at or after (ISO 8601)")
+    parser.add_argument('--until', type=datetime.fromisoformat, help="first seen before (ISO 8601)")
+    parser.add_argument('-o', '--output', help="file to write (default stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in export_history(args.format, args.product_id, args.since, args.until):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+if __name__ == '__main__':
+    main()
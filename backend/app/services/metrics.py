@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from typing import Optional, Tuple
+import os
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+# Statuses sites answer with when they throttle or block the crawler
+BAN_STATUSES = {403, 429, 503}
+
+# From a millisecond parse up to a multi-minute sweep batch
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+# Pipeline stages a page goes through: queue_wait (submitted until its
+# request is sent), fetch, parse, db_write (per ingest batch), alert_send
+# (per delivery batch) and thumbnail (resizing one product image)
+STAGE_SECONDS = Histogram(
+    'pricepulse_stage_seconds', 'Time spent in each scrape pipeline stage', ['stage'], buckets=BUCKETS
+)
+FETCH_SECONDS = Histogram(
+    'pricepulse_fetch_seconds', 'Page download latency per domain', ['domain', 'fetcher'], buckets=BUCKETS
+)
+FETCHES = Counter(
+    'pricepulse_fetches_total', 'Page fetches per domain by outcome', ['domain', 'fetcher', 'outcome']
+)
+SWEEP_BATCH_SECONDS = Histogram(
+    'pricepulse_sweep_batch_seconds', 'Time from claiming a sweep batch until all its pages finished',
+    buckets=BUCKETS
+)
+SWEEP_IN_FLIGHT = Gauge(
+    'pricepulse_sweep_in_flight_pages', 'Sweep pages queued or being fetched', multiprocess_mode='livesum'
+)
+SCRAPE_BACKLOG = Gauge(
+    'pricepulse_scrape_backlog', 'Active products due for a check and not leased by a worker',
+    multiprocess_mode='livemax'
+)
+SCHEDULED_SCRAPES = Counter('pricepulse_scheduled_scrapes_total', 'Pages queued by the priority scheduler')
+FLAT_SCHEDULE_SCRAPES = Counter(
+    'pricepulse_flat_schedule_scrapes_total', 'Pages a flat schedule would have queued for the active products'
+)
+INGESTED_ITEMS = Counter('pricepulse_ingested_items_total', 'Scraped items written to the database')
+ALERTS = Counter('pricepulse_alerts_total', 'Alert emails by delivery outcome', ['outcome'])
+THUMBNAILS = Counter(
+    'pricepulse_thumbnail_images_total', 'Product images downloaded for thumbnails by outcome', ['outcome']
+)
+HTTP_SECONDS = Histogram(
+    'pricepulse_http_request_seconds', 'API request latency per route', ['method', 'route', 'status'],
+    buckets=BUCKETS
+)
+
+@contextmanager
+def timed(stage: str):
+    """Observe the duration of a block, or a decorated function, as a stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+def fetch_outcome(status: Optional[int]) -> str:
+    if status is None:
+        return 'error'
+    if status == 200:
+        return 'success'
+    if status == 304:
+        return 'not_modified'
+    if status in BAN_STATUSES:
+        return 'banned'
+    return 'http_error'
+
+def record_fetch(domain: str, fetcher: str, status: Optional[int], latency: Optional[float] = None,
+                 queue_wait: Optional[float] = None):
+    """Account for one page request"""
+    FETCHES.labels(domain, fetcher, fetch_outcome(status)).inc()
+    if latency is not None:
+        FETCH_SECONDS.labels(domain, fetcher).observe(latency)
+        STAGE_SECONDS.labels('fetch').observe(latency)
+    if queue_wait is not None:
+        STAGE_SECONDS.labels('queue_wait').observe(max(0.0, queue_wait))
+
+def collected() -> CollectorRegistry:
+    """Registry of every metric. When the app runs as several processes with
+    PROMETHEUS_MULTIPROC_DIR set, the values of all of them are aggregated."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+def counter_total(name: str) -> float:
+    """Value of a counter, summed over its labels and processes"""
+    return sum(
+        sample.value for metric in collected().collect() for sample in metric.samples if sample.name == name
+    )
+
+def render() -> Tuple[bytes, str]:
+    """Exposition of every metric, with content type"""
+    return generate_latest(collected()), CONTENT_TYPE_LATEST
@@ -0,0 +1,152 @@
+from contextlib import asynccontextmanager
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Set
+import asyncio
+import json
+import threading
+import asyncpg
+from ..db.database import SQLALCHEMY_DATABASE_URL
+from config import EVENTS_BACKEND, EVENTS_CHANNEL, EVENTS_QUEUE_SIZE
+import logging
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7900
+LISTEN_RETRY_SECONDS = 5
+
+class EventStream:
+    """Events queued for one connected client.
+
+    The queue is bounded so a stalled client cannot hold unbounded memory;
+    events that do not fit are dropped and ``dropped`` tells the client to
+    reload instead.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, product_ids: Iterable[int], maxsize: int):
+        self.loop = loop
+        self.product_ids = set(product_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    def wants(self, price_event: dict) -> bool:
+        return not self.product_ids or price_event['product_id'] in self.product_ids
+
+    def put(self, events: List[dict]):
+        """Queue events; runs on the client's event loop"""
+        for price_event in events:
+            try:
+                self.queue.put_nowait(price_event)
+            except asyncio.QueueFull:
+                self.dropped = True
+
+class PriceEventBroker:
+    """Pub/sub of price change and alert events for live dashboards.
+
+    Ingest publishes in its write transaction and subscribers get the events
+    once it commits. With the memory backend events go straight to the
+    streams of this process; with the postgres backend they are sent with
+    NOTIFY and every API process relays what its LISTEN connection receives,
+    wherever the price was scraped.
+    """
+
+    def __init__(self, backend: str = EVENTS_BACKEND, channel: str = EVENTS_CHANNEL,
+                 queue_size: int = EVENTS_QUEUE_SIZE):
+        self.backend = backend
+        self.channel = channel
+        self.queue_size = queue_size
+        self._streams: Set[EventStream] = set()
+        self._lock = threading.Lock()
+        self._listener: Optional[asyncio.Task] = None
+
+    def publish(self, db: Session, events: List[dict]) -> None:
+        """Publish events in the caller's transaction.
+
+        Each event is a JSON-serializable dict with at least ``type`` and
+        ``product_id``. Nothing is delivered if the transaction rolls back.
+        """
+        if not events:
+            return
+        if self.backend == 'postgres':
+            for payload in self._payloads(events):
+                db.execute(text("SELECT pg_notify(:channel, :payload)"), {'channel': self.channel, 'payload': payload})
+        else:
+            event.listen(db, 'after_commit', lambda session: self.dispatch(events), once=True)
+
+    def _payloads(self, events: List[dict]) -> Iterator[str]:
+        """JSON arrays of events, each small enough for one NOTIFY"""
+        chunk, size = [], 2
+        for encoded in (json.dumps(price_event, separators=(',', ':')) for price_event in events):
+            if chunk and size + len(encoded) + 1 > NOTIFY_PAYLOAD_LIMIT:
+                yield '[' + ','.join(chunk) + ']'
+                chunk, size = [], 2
+            chunk.append(encoded)
+            size += len(encoded) + 1
+        if chunk:
+            yield '[' + ','.join(chunk) + ']'
+
+    def dispatch(self, events: List[dict]) -> None:
+        """Hand events to this process's streams; safe from any thread"""
+        with self._lock:
+            streams = list(self._streams)
+        for stream in streams:
+            wanted = [price_event for price_event in events if stream.wants(price_event)]
+            if not wanted:
+                continue
+            try:
+                stream.loop.call_soon_threadsafe(stream.put, wanted)
+            except RuntimeError:
+                # The stream's loop has closed
+                with self._lock:
+                    self._streams.discard(stream)
+
+    @asynccontextmanager
+    async def subscribe(self, product_ids: Iterable[int] = ()) -> AsyncIterator[EventStream]:
+        """Stream of events for the given products, or all products"""
+        stream = EventStream(asyncio.get_running_loop(), product_ids, self.queue_size)
+        with self._lock:
+            self._streams.add(stream)
+        try:
+            yield stream
+        finally:
+            with self._lock:
+                self._streams.discard(stream)
+
+    async def start(self):
+        """Start relaying NOTIFY events, for the postgres backend"""
+        if self.backend == 'postgres' and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            try:
+                connection = await asyncpg.connect(SQLALCHEMY_DATABASE_URL)
+                try:
+                    closed = asyncio.Event()
+                    connection.add_termination_listener(lambda _: closed.set())
+                    await connection.add_listener(self.channel, self._notified)
+                    logging.info(f"Listening for price events on {self.channel}")
+                    await closed.wait()
+                finally:
+                    await connection.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Price event listener failed: {e}")
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    def _notified(self, connection, pid, channel, payload):
+        try:
+            self.dispatch(json.loads(payload))
+        except ValueError as e:
+            logging.error(f"Ignoring malformed price event payload: {e}")
+
+price_events = PriceEventBroker()
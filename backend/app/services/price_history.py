@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, List, Optional, Sequence
+import math
+
+# pandas is only imported once a chart is aggregated, so processes that never
+# serve one do not pay for loading it
+if TYPE_CHECKING:
+    import pandas as pd
+
+EXPAND_STEPS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+BUCKET_WIDTHS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+
+def as_utc(moment: datetime) -> datetime:
+    # SQLite hands back naive timestamps
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def expand_runs(runs: Sequence, step: timedelta, until: Optional[datetime] = None,
+                limit: Optional[int] = None) -> List[dict]:
+    """Turn price runs (newest first) into a dense series, newest first.
+
+    Each run is repeated every ``step`` from when its price was first seen
+    until the next change, or until it was last confirmed for the latest run.
+    Points from ``until`` on are left out, apart from the first point of a
+    run, and at most ``limit`` points are returned.
+    """
+    points = []
+    run_end = None
+    for run in runs:
+        end = run_end or run.last_seen_at or run.timestamp
+        if until is not None:
+            end = min(as_utc(end), as_utc(until))
+        # Every run has a point when it started, then one per step before end
+        count = max(1, math.ceil((as_utc(end) - as_utc(run.timestamp)) / step))
+        for index in range(count - 1, -1, -1):
+            if limit is not None and len(points) >= limit:
+                return points
+            points.append({
+                'id': run.id,
+                'product_id': run.product_id,
+                'price': run.price,
+                'timestamp': run.timestamp + index * step,
+                'last_seen_at': run.last_seen_at,
+            })
+        run_end = run.timestamp
+    return points
+
+def to_utc(moment) -> 'pd.Timestamp':
+    import pandas as pd
+    moment = pd.Timestamp(moment)
+    return moment.tz_localize('UTC') if moment.tzinfo is None else moment.tz_convert('UTC')
+
+def bucket_origin(start: 'pd.Timestamp', bucket: str) -> 'pd.Timestamp':
+    """Calendar-aligned start of the bucket containing ``start``"""
+    import pandas as pd
+    if bucket == 'hour':
+        return start.floor('h')
+    origin = start.floor('D')
+    if bucket == 'week':
+        origin -= pd.Timedelta(days=origin.dayofweek)
+    return origin
+
+def aggregate_runs(runs: Sequence, start: Optional[datetime], end: datetime,
+                   bucket: Optional[str] = None, points: Optional[int] = None) -> List[dict]:
+    """Downsample price runs (any order) into OHLC buckets, oldest first.
+
+    Prices are treated as a step function: each run holds until the next
+    change, so a bucket's open is the price in force at its start and its
+    average is weighted by how long each price held. Buckets are either
+    calendar ``bucket``s or ``points`` equal slices of [start, end).
+    """
+    if not runs:
+        return []
+
+    import numpy as np
+    import pandas as pd
+
+    changes = pd.Series(
+        [run.price for run in runs],
+        index=pd.DatetimeIndex([to_utc(run.timestamp) for run in runs]),
+    ).sort_index()
+    changes = changes[~changes.index.duplicated(keep='last')]
+
+    start = to_utc(start) if start else changes.index[0]
+    end = max(to_utc(end), start + pd.Timedelta(seconds=1))
+
+    if points:
+        origin, width = start, (end - start) / points
+    else:
+        origin, width = bucket_origin(start, bucket or 'day'), BUCKET_WIDTHS[bucket or 'day']
+
+    # Breakpoints are every bucket start plus every price change in range; the
+    # price at each is the last change at or before it
+    edges = pd.date_range(origin, end, freq=width, inclusive='left')
+    in_range = changes.index[(changes.index > origin) & (changes.index < end)]
+    breakpoints = edges.union(in_range)
+    prices = changes.reindex(changes.index.union(breakpoints)).ffill().reindex(breakpoints)
+
+    held_for = np.diff(breakpoints.append(pd.DatetimeIndex([end])).asi8) / 1e9
+    frame = pd.DataFrame({
+        'price': prices.to_numpy(),
+        'bucket': ((breakpoints - origin) // width).to_numpy(),
+        'weighted': prices.to_numpy() * held_for,
+        'seconds': held_for,
+    }).dropna(subset=['price'])
+    frame = frame[frame['seconds'] > 0]
+
+    grouped = frame.groupby('bucket')
+    summary = grouped['price'].agg(['first', 'max', 'min', 'last'])
+    summary['avg'] = grouped['weighted'].sum() / grouped['seconds'].sum()
+
+    return [
+        {
+            'timestamp': (origin + width * int(bucket_index)).to_pydatetime(),
+            'open': row['first'],
+            'high': row['max'],
+            'low': row['min'],
+            'close': row['last'],
+            'avg': round(row['avg'], 4),
+        }
+        for bucket_index, row in summary.iterrows()
+    ]
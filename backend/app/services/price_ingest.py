@@ -0,0 +1,264 @@
+from sqlalchemy import func, insert, or_, select, tuple_, update
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+import threading
+from ..db.database import SessionLocal
+from ..models.product import Product, PriceHistory
+from ..scrapy_spiders.fetch_cache import fetch_cache
+from .check_priority import next_check_interval
+from .alert_matcher import match_price_drops
+from .alert_outbox import alert_worker, enqueue_alerts
+from .cache import response_cache
+from .metrics import INGESTED_ITEMS, timed
+from .price_events import price_events
+from .price_stats import load_stats, roll_forward, save_stats, summarize_runs
+from .thumbnails import thumbnail_worker
+from .url_canonical import canonical_key
+from config import INGEST_BATCH_SIZE, INGEST_FLUSH_SECONDS, MIN_CHECK_INTERVAL_MINUTES, VOLATILITY_WINDOW
+import logging
+
+# Page details copied onto products that were added without them
+DETAIL_COLUMNS = ('name', 'image_url', 'description')
+
+def has_detail(product, column: str) -> bool:
+    # Bulk imports use the URL as a placeholder name
+    value = getattr(product, column)
+    return bool(value) and not (column == 'name' and value == product.url)
+
+def detail_value(value) -> str:
+    # Some selectors return every matching text node
+    if isinstance(value, list):
+        value = ' '.join(part.strip() for part in value if part.strip())
+    return value.strip()
+
+class PriceIngestor:
+    """Buffers scraped items and writes them to the DB in batches.
+
+    Each flush is one transaction: a bulk UPDATE of the affected products,
+    one UPDATE extending the price runs that were confirmed and a single
+    multi-row INSERT for the prices that changed, instead of a round-trip and
+    commit per scraped page.
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = INGEST_BATCH_SIZE,
+                 flush_interval: float = INGEST_FLUSH_SECONDS):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def add(self, item: dict) -> bool:
+        """Buffer an item; returns True once the batch size is reached"""
+        with self._lock:
+            self._buffer.append(item)
+            return len(self._buffer) >= self.batch_size
+
+    def flush(self) -> int:
+        """Write everything buffered so far; once it returns, items added
+        before the call are stored, even when another flush took them"""
+        # Flushes are serialized so batches for the same product land in order
+        with self._flush_lock:
+            with self._lock:
+                items, self._buffer = self._buffer, []
+            if not items:
+                return 0
+            return self.write_batch(items)
+
+    @timed('db_write')
+    def write_batch(self, items: List[dict]) -> int:
+        """Store a batch of scraped items, returning the number of price changes written"""
+        # Later items for the same URL supersede earlier ones. The product
+        # holding the item's canonical key takes the result whichever URL
+        # variant was scraped
+        by_url: Dict[str, dict] = {item['url']: item for item in items if item.get('url')}
+        if not by_url:
+            return 0
+        by_key: Dict[str, dict] = {canonical_key(url): item for url, item in by_url.items()}
+
+        db = self.session_factory()
+        try:
+            products = db.execute(
+                select(
+                    Product.id, Product.url, Product.canonical_key, Product.name, Product.platform,
+                    Product.current_price, Product.target_price,
+                    Product.image_url, Product.description
+                ).where(
+                    or_(Product.canonical_key.in_(by_key), Product.url.in_(by_url)),
+                    Product.is_active == True
+                )
+            ).all()
+            if not products:
+                return 0
+
+            recent_runs = self._recent_runs(db, [product.id for product in products])
+            stats = load_stats(db, [product.id for product in products])
+
+            now = datetime.now(timezone.utc)
+            product_updates = []
+            repriced = []
+            new_images = False
+            history_rows = []
+            confirmed_runs = []
+            drops = []
+            events = []
+            stats_rows = []
+
+            for product in products:
+                scraped_data = by_key.get(product.canonical_key) or by_url[product.url]
+                unchanged = bool(scraped_data.get('unchanged'))
+                new_price = None if unchanged else scraped_data.get('price')
+                # No price on the page (broken selector, captcha, ...) is not
+                # a confirmation of the current one
+                missed = new_price is None and not unchanged
+                current_price = product.current_price
+                runs = recent_runs.get(product.id, [])
+                change_points = [(price, started_at) for _, price, started_at in runs]
+                latest_id, latest_price = (runs[0][0], runs[0][1]) if runs else (None, None)
+
+                if new_price is not None:
+                    current_price = new_price
+
+                    old_price = product.current_price
+                    if old_price and new_price < old_price:
+                        drops.append({
+                            'product_id': product.id,
+                            'product_name': product.name,
+                            'product_url': product.url,
+                            'old_price': old_price,
+                            'new_price': new_price,
+                        })
+
+                # History is stored as runs of identical prices: a confirmed
+                # price only extends the latest run, a changed one starts a new run
+                if new_price is not None and new_price != latest_price:
+                    history_rows.append({
+                        'product_id': product.id, 'price': new_price,
+                        'timestamp': now, 'last_seen_at': now,
+                    })
+                    change_points = [(new_price, now)] + change_points[:VOLATILITY_WINDOW - 1]
+                elif latest_id is not None and not missed:
+                    confirmed_runs.append((latest_id, runs[0][2]))
+
+                # Unchanged pages confirm the current price
+                observed = new_price if new_price is not None else (
+                    product.current_price if unchanged else None
+                )
+                if observed is not None:
+                    previous = stats.get(product.id)
+                    stats_rows.append(
+                        roll_forward(previous, observed, now, change_points) if previous
+                        else summarize_runs(product.id, change_points or [(observed, now)], now)
+                    )
+
+                # Pages without a price are retried soon instead of waiting
+                # a full interval
+                interval = timedelta(minutes=MIN_CHECK_INTERVAL_MINUTES) if missed else next_check_interval(
+                    product.platform, current_price, product.target_price, change_points
+                )
+                values = {
+                    'id': product.id,
+                    'last_checked_at': now,
+                    # Checked, so whichever worker leased the product is done
+                    'lease_owner': None,
+                    'lease_expires_at': None,
+                    'next_check_at': now + interval,
+                }
+                if new_price is not None:
+                    values['current_price'] = new_price
+                    if new_price != product.current_price:
+                        repriced.append(product.id)
+                        events.append({
+                            'type': 'price', 'product_id': product.id, 'price': new_price,
+                            'previous_price': product.current_price, 'checked_at': now.isoformat(),
+                        })
+                # Products added without a scrape, e.g. by a bulk import, take
+                # their missing details from the page
+                details = {
+                    column: detail_value(scraped_data[column]) for column in DETAIL_COLUMNS
+                    if scraped_data.get(column) and not has_detail(product, column)
+                }
+                if details:
+                    values.update(details)
+                    repriced.append(product.id)
+                    new_images = new_images or 'image_url' in details
+                product_updates.append(values)
+
+            # Bulk UPDATE by primary key groups rows by the columns they set
+            for columns in {frozenset(values) for values in product_updates}:
+                db.execute(update(Product), [values for values in product_updates if frozenset(values) == columns])
+            if confirmed_runs:
+                # Keyed on (id, timestamp) so each run is found in its partition
+                db.execute(
+                    update(PriceHistory)
+                    .where(tuple_(PriceHistory.id, PriceHistory.timestamp).in_(confirmed_runs))
+                    .values(last_seen_at=now)
+                )
+            if history_rows:
+                db.execute(insert(PriceHistory).values(history_rows))
+            save_stats(db, stats_rows, stats)
+            # Alerts are queued in the same transaction as the prices that
+            # triggered them and sent by the delivery worker
+            alerts = match_price_drops(db, drops)
+            enqueue_alerts(db, alerts)
+            # Dashboards hear about drops that alerted subscribers too, not
+            # who the subscribers are
+            alerted = {}
+            for alert in alerts:
+                alerted[alert['product_id']] = alerted.get(alert['product_id'], 0) + 1
+            events.extend(
+                {'type': 'alert', 'product_id': drop['product_id'], 'old_price': drop['old_price'],
+                 'new_price': drop['new_price'], 'subscribers': alerted[drop['product_id']]}
+                for drop in drops if drop['product_id'] in alerted
+            )
+            price_events.publish(db, events)
+            db.commit()
+        except Exception as e:
+            logging.error(f"Error writing batch of {len(by_url)} scraped items: {e}")
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+        INGESTED_ITEMS.inc(len(by_url))
+        # Only now that the prices are stored may the next fetch of these
+        # pages be answered from their validators and fingerprints
+        for item in items:
+            fetch_cache.commit(item)
+        if repriced:
+            response_cache.invalidate_products(repriced)
+        if alerts:
+            alert_worker.notify()
+        if new_images:
+            thumbnail_worker.notify()
+
+        logging.info(f"Stored {len(history_rows)} price changes for {len(products)} checked products")
+        return len(history_rows)
+
+    def _recent_runs(self, db, product_ids: List[int]) -> Dict[int, List[Tuple[int, float, datetime]]]:
+        """Most recent price runs per product as (id, price, first seen),
+        newest first, in one query"""
+        ranked = select(
+            PriceHistory.id,
+            PriceHistory.product_id,
+            PriceHistory.price,
+            PriceHistory.timestamp,
+            func.row_number().over(
+                partition_by=PriceHistory.product_id,
+                order_by=PriceHistory.timestamp.desc()
+            ).label('rank')
+        ).where(PriceHistory.product_id.in_(product_ids)).subquery()
+
+        rows = db.execute(
+            select(ranked.c.product_id, ranked.c.id, ranked.c.price, ranked.c.timestamp)
+            .where(ranked.c.rank < VOLATILITY_WINDOW)
+            .order_by(ranked.c.product_id, ranked.c.rank)
+        )
+
+        recent: Dict[int, List[Tuple[int, float, datetime]]] = {}
+        for product_id, run_id, price, started_at in rows:
+            recent.setdefault(product_id, []).append((run_id, price, started_at))
+        return recent
+
+price_ingestor = PriceIngestor()
@@ -0,0 +1,199 @@
+"""Per-product price statistics (the ``price_stats`` table).
+
+Ingest rolls a product's row forward every time its price is checked, from
+the previous row and the recent change points it already loads, so keeping
+the rollups current costs one extra query per batch. A nightly job rebuilds
+every row from the retained history with pandas, which backfills products
+tracked before the table existed and drops what retention removed.
+
+    python -m app.services.price_stats   # rebuild now
+"""
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from statistics import mean, pstdev
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple
+from ..db.database import SessionLocal
+from ..models.product import PriceHistory, PriceStats, Product
+from config import STATS_RECOMPUTE_CHUNK, VOLATILITY_WINDOW
+import logging
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+def as_utc(moment: datetime) -> datetime:
+    # SQLite hands back naive timestamps
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def spread(prices: Sequence[float]) -> float:
+    """Standard deviation relative to the mean"""
+    avg = mean(prices)
+    return pstdev(prices) / avg if avg else 0.0
+
+def discount(mean_price: float, last_price: float) -> float:
+    """Percent the latest price is below the mean; negative when above"""
+    return (mean_price - last_price) / mean_price * 100 if mean_price > 0 else 0.0
+
+def summarize_runs(product_id: int, runs: Sequence[Tuple[float, datetime]], now: datetime) -> dict:
+    """A stats row from (price, first seen) change points, newest first,
+    for a product without one yet. Exact when ``runs`` is its whole history."""
+    held_until = [now] + [as_utc(started_at) for _, started_at in runs[:-1]]
+    seconds = [max(0.0, (end - as_utc(started_at)).total_seconds())
+               for (_, started_at), end in zip(runs, held_until)]
+    prices = [price for price, _ in runs]
+    observed = sum(seconds)
+    mean_price = sum(price * held for price, held in zip(prices, seconds)) / observed if observed else prices[0]
+    return {
+        'product_id': product_id,
+        'last_price': prices[0],
+        'min_price': min(prices),
+        'max_price': max(prices),
+        'mean_price': mean_price,
+        'observed_seconds': observed,
+        'change_count': len(runs),
+        'volatility': spread(prices[:VOLATILITY_WINDOW]),
+        'discount_pct': discount(mean_price, prices[0]),
+        'first_seen_at': as_utc(runs[-1][1]),
+        'last_change_at': as_utc(runs[0][1]),
+        'observed_until': now,
+    }
+
+def roll_forward(previous, price: float, now: datetime, runs: Sequence[Tuple[float, datetime]]) -> dict:
+    """The stats row after ``price`` was observed at ``now``.
+
+    The time since the previous observation counts towards the price that
+    was in force then. ``runs`` are the recent (price, first seen) change
+    points, newest first, including ``price`` if it is a change.
+    """
+    elapsed = max(0.0, (now - as_utc(previous.observed_until)).total_seconds())
+    observed = previous.observed_seconds + elapsed
+    mean_price = (
+        (previous.mean_price * previous.observed_seconds + previous.last_price * elapsed) / observed
+        if observed else price
+    )
+    changed = price != previous.last_price
+    prices = [run_price for run_price, _ in runs] or [price]
+    return {
+        'product_id': previous.product_id,
+        'last_price': price,
+        'min_price': min(previous.min_price, price),
+        'max_price': max(previous.max_price, price),
+        'mean_price': mean_price,
+        'observed_seconds': observed,
+        'change_count': previous.change_count + changed,
+        'volatility': spread(prices[:VOLATILITY_WINDOW]),
+        'discount_pct': discount(mean_price, price),
+        'first_seen_at': previous.first_seen_at,
+        'last_change_at': now if changed else previous.last_change_at,
+        'observed_until': now,
+    }
+
+def load_stats(db: Session, product_ids: List[int]) -> Dict[int, PriceStats]:
+    return {stats.product_id: stats for stats in db.scalars(
+        select(PriceStats).where(PriceStats.product_id.in_(product_ids))
+    )}
+
+def save_stats(db: Session, rows: List[dict], existing: Dict[int, PriceStats]) -> None:
+    """Write rolled forward rows in the caller's transaction"""
+    updates = [row for row in rows if row['product_id'] in existing]
+    inserts = [row for row in rows if row['product_id'] not in existing]
+    if updates:
+        db.execute(update(PriceStats), updates)
+    if inserts:
+        if db.get_bind().dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+            # Another worker may have added the row meanwhile; either is a
+            # fair start and the nightly rebuild settles it
+            db.execute(pg_insert(PriceStats).on_conflict_do_nothing(), inserts)
+        else:
+            db.execute(insert(PriceStats), inserts)
+
+def summarize_history(history: 'pd.DataFrame') -> 'pd.DataFrame':
+    """Stats rows by product_id from price runs with columns product_id,
+    price, timestamp and last_seen_at (UTC)"""
+    history = history.sort_values(['product_id', 'timestamp'], kind='stable')
+    by_product = history.groupby('product_id', sort=False)
+    # Each run holds until the next one starts, the latest one until it was
+    # last confirmed
+    held_until = by_product['timestamp'].shift(-1).fillna(history['last_seen_at']).fillna(history['timestamp'])
+    seconds = (held_until - history['timestamp']).dt.total_seconds().clip(lower=0)
+    history = history.assign(held_until=held_until, seconds=seconds, weighted=history['price'] * seconds)
+
+    by_product = history.groupby('product_id', sort=False)
+    summary = by_product.agg(
+        last_price=('price', 'last'),
+        min_price=('price', 'min'),
+        max_price=('price', 'max'),
+        weighted=('weighted', 'sum'),
+        observed_seconds=('seconds', 'sum'),
+        change_count=('price', 'size'),
+        first_seen_at=('timestamp', 'first'),
+        last_change_at=('timestamp', 'last'),
+        observed_until=('held_until', 'last'),
+    )
+    summary['mean_price'] = (summary['weighted'] / summary['observed_seconds']).where(
+        summary['observed_seconds'] > 0, summary['last_price']
+    )
+
+    recent = by_product.tail(VOLATILITY_WINDOW).groupby('product_id')['price']
+    recent_mean = recent.mean()
+    summary['volatility'] = (recent.std(ddof=0) / recent_mean).where(recent_mean > 0, 0.0).fillna(0.0)
+    summary['discount_pct'] = ((summary['mean_price'] - summary['last_price']) / summary['mean_price'] * 100).where(
+        summary['mean_price'] > 0, 0.0
+    )
+    return summary.drop(columns='weighted')
+
+def recompute_price_stats(session_factory=SessionLocal, chunk_size: int = STATS_RECOMPUTE_CHUNK) -> int:
+    """Rebuild every stats row from price history, a chunk of products per
+    transaction, returning the number of rows written"""
+    import pandas as pd
+
+    written, after = 0, 0
+    while True:
+        db = session_factory()
+        try:
+            product_ids = db.scalars(
+                select(Product.id).where(Product.id > after).order_by(Product.id).limit(chunk_size)
+            ).all()
+            if not product_ids:
+                return written
+            after = product_ids[-1]
+
+            read_at = datetime.now(timezone.utc)
+            history = pd.DataFrame(db.execute(
+                select(PriceHistory.product_id, PriceHistory.price, PriceHistory.timestamp, PriceHistory.last_seen_at)
+                .where(PriceHistory.product_id.in_(product_ids), PriceHistory.price != None)
+            ).all(), columns=['product_id', 'price', 'timestamp', 'last_seen_at'])
+            history['timestamp'] = pd.to_datetime(history['timestamp'], utc=True)
+            history['last_seen_at'] = pd.to_datetime(history['last_seen_at'], utc=True)
+            summary = summarize_history(history) if len(history) else pd.DataFrame()
+
+            # Rows ingest rolled forward since the history was read are newer
+            # than the rebuild and stay
+            db.execute(delete(PriceStats).where(
+                PriceStats.product_id.in_(product_ids),
+                or_(PriceStats.observed_until == None, PriceStats.observed_until <= read_at),
+            ))
+            kept = set(db.scalars(select(PriceStats.product_id).where(PriceStats.product_id.in_(product_ids))))
+            rows = [
+                {column: (None if pd.isna(value) else value) for column, value in row.items()}
+                for row in summary.reset_index().to_dict('records') if row['product_id'] not in kept
+            ]
+            for row in rows:
+                row['product_id'] = int(row['product_id'])
+                row['change_count'] = int(row['change_count'])
+                for column in ('first_seen_at', 'last_change_at', 'observed_until'):
+                    row[column] = row[column].to_pydatetime()
+            if rows:
+                db.execute(insert(PriceStats), rows)
+            db.commit()
+            written += len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f"Rebuilt {recompute_price_stats()} price stats rows")
@@ -0,0 +1,57 @@
+"""Lazily created background services.
+
+The crawl engine, the price scheduler, the alert delivery worker and the
+thumbnail worker are imported on first use, so importing the API does not load Scrapy, Twisted or
+APScheduler, and a process only pays for the roles it runs.
+"""
+from typing import Iterable
+import threading
+
+_started = []
+_lock = threading.Lock()
+
+def _track(service):
+    with _lock:
+        if service not in _started:
+            _started.append(service)
+    return service
+
+def get_scraper_service():
+    """The crawl engine, started if it is not running yet.
+
+    Starting blocks until the spider is open, so async callers should call
+    this from a worker thread.
+    """
+    from .scraper_runner import scraper_service
+    scraper_service.start()
+    return _track(scraper_service)
+
+def get_price_scheduler():
+    from .scheduler import price_scheduler
+    return price_scheduler
+
+def get_alert_worker():
+    from .alert_outbox import alert_worker
+    return alert_worker
+
+def get_thumbnail_worker():
+    from .thumbnails import thumbnail_worker
+    return thumbnail_worker
+
+def start_roles(roles: Iterable[str]):
+    """Start the background services of a process's roles"""
+    roles = set(roles)
+    if 'scraper' in roles:
+        get_scraper_service()
+        _track(get_alert_worker()).start()
+        _track(get_thumbnail_worker()).start()
+    if 'scheduler' in roles:
+        _track(get_price_scheduler()).start()
+
+def stop_services():
+    """Stop every service this process started, latest first"""
+    with _lock:
+        services = _started[::-1]
+        _started.clear()
+    for service in services:
+        service.stop()
@@ -1,26 +1,60 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from sqlalchemy.orm import Session
-from ..db.database import SessionLocal
+from sqlalchemy import or_
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import os
+import socket
+import threading
+import time
+from ..db.database import SessionLocal, engine
+from ..db.locks import HeldAdvisoryLock, advisory_lock
+from ..db.partitions import drop_expired_partitions, ensure_price_history_partitions, is_partitioned
 from ..models.product import Product, PriceHistory
-from .scraper_runner import scraper_service
-from .email_alert import email_service
+from .price_ingest import price_ingestor
+from .price_stats import recompute_price_stats
+from .check_priority import check_metrics
+from .registry import get_scraper_service
+from .metrics import SCRAPE_BACKLOG, SWEEP_BATCH_SECONDS, SWEEP_IN_FLIGHT
+from config import (
+    CHECK_BATCH_SIZE, CHECK_TICK_MINUTES, HISTORY_RETENTION_DAYS, LEASE_HEARTBEAT_SECONDS, LEASE_SECONDS,
+    MIN_CHECK_INTERVAL_MINUTES, SWEEP_MAX_IN_FLIGHT, WORKER_ID,
+)
 import logging
 
 class PriceScheduler:
     def __init__(self):
-        self.scheduler = BackgroundScheduler()
-        self.setup_jobs()
+        # The APScheduler instance and its jobs are only built by start()
+        self.scheduler: Optional[BackgroundScheduler] = None
+        self.metrics = check_metrics
+        # The worker holding it accounts the flat-schedule baseline
+        self.baseline_lock = HeldAdvisoryLock(engine, 'scheduler_baseline')
+        self.worker_id = WORKER_ID or f"{socket.gethostname()}-{os.getpid()}"
+        self._in_flight = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def running(self) -> bool:
+        return self.scheduler is not None and self.scheduler.running
     
     def setup_jobs(self):
         """Setup scheduled jobs"""
-        # Check prices every hour
+        # Pick up products whose next check is due
+        self.scheduler.add_job(
+            func=self.check_due_prices,
+            trigger=IntervalTrigger(minutes=CHECK_TICK_MINUTES),
+            id='price_check_due',
+            name='Check due product prices',
+            replace_existing=True
+        )
+        
+        # Keep leases of running batches from expiring
         self.scheduler.add_job(
-            func=self.check_all_prices,
-            trigger=IntervalTrigger(hours=1),
-            id='price_check_hourly',
-            name='Check all product prices',
+            func=self.renew_leases,
+            trigger=IntervalTrigger(seconds=LEASE_HEARTBEAT_SECONDS),
+            id='lease_heartbeat',
+            name='Renew product leases',
             replace_existing=True
         )
         
@@ -32,86 +66,208 @@ class PriceScheduler:
             name='Daily data cleanup',
             replace_existing=True
         )
+        
+        # Rebuild price statistics from the history the cleanup kept
+        self.scheduler.add_job(
+            func=self.rebuild_price_stats,
+            trigger=CronTrigger(hour=3, minute=0),
+            id='price_stats_rebuild',
+            name='Rebuild price statistics',
+            replace_existing=True
+        )
     
     def start(self):
         """Start the scheduler"""
-        if not self.scheduler.running:
+        if not self.running:
+            # Forked workers must not share the parent's lease identity
+            self.worker_id = WORKER_ID or f"{socket.gethostname()}-{os.getpid()}"
+            # Sweeps write price history, so its upcoming partitions must exist
+            with SessionLocal() as db:
+                ensure_price_history_partitions(db)
+            self.scheduler = BackgroundScheduler()
+            self.setup_jobs()
             self.scheduler.start()
             logging.info("Price scheduler started")
     
     def stop(self):
         """Stop the scheduler"""
-        if self.scheduler.running:
+        if self.running:
             self.scheduler.shutdown()
+            self.baseline_lock.release()
             logging.info("Price scheduler stopped")
     
-    def check_all_prices(self):
-        """Check prices for all active products"""
+    def check_due_prices(self):
+        """Claim due products until this worker has a full sweep in flight"""
+        now = datetime.now(timezone.utc)
         db = SessionLocal()
         try:
-            active_products = db.query(Product).filter(Product.is_active == True).all()
-            
-            for product in active_products:
-                self.check_single_product_price(product, db)
-                
-        except Exception as e:
-            logging.error(f"Error in price check job: {e}")
+            active_count = db.query(Product).filter(Product.is_active == True).count()
+            SCRAPE_BACKLOG.set(db.query(Product).filter(
+                Product.is_active == True,
+                or_(Product.next_check_at == None, Product.next_check_at <= now),
+                or_(Product.lease_expires_at == None, Product.lease_expires_at <= now),
+            ).count())
         finally:
             db.close()
+        
+        baseline = active_count if self.baseline_lock.held() else 0
+        self.metrics.record_tick(baseline, CHECK_TICK_MINUTES, self.claim_due_batches())
+    
+    def claim_due_batches(self) -> int:
+        """Lease and submit batches of due products; returns pages queued"""
+        scrapes = 0
+        while True:
+            with self._lock:
+                capacity = SWEEP_MAX_IN_FLIGHT - self._in_flight
+            if capacity <= 0:
+                break
+            due = self._lease_due(min(CHECK_BATCH_SIZE, capacity))
+            if not due:
+                break
+            scrapes += self._submit(due)
+        return scrapes
     
-    def check_single_product_price(self, product: Product, db: Session):
-        """Check price for a single product"""
+    def _lease_due(self, limit: int) -> List[Tuple[int, str, Optional[str]]]:
+        """Lease up to ``limit`` due products to this worker.
+        
+        Rows locked by another worker's claim are skipped rather than waited
+        on, so concurrent workers take disjoint batches. Products whose lease
+        expired, i.e. whose worker died mid-sweep, are due again.
+        """
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
         try:
-            # Scrape current price
-            scraped_data = scraper_service.scrape_product_sync(product.url)
+            # next_check_at is indexed, so the products table doubles as a
+            # priority queue ordered by when each product is due
+            due = db.query(Product.id, Product.url, Product.canonical_key, Product.lease_owner).filter(
+                Product.is_active == True,
+                or_(Product.next_check_at == None, Product.next_check_at <= now),
+                or_(Product.lease_expires_at == None, Product.lease_expires_at <= now),
+            ).order_by(Product.next_check_at.asc().nullsfirst()).limit(limit).with_for_update(
+                skip_locked=True, of=Product
+            ).all()
+            if not due:
+                return []
             
-            if scraped_data and 'price' in scraped_data:
-                new_price = scraped_data['price']
-                old_price = product.current_price
-                
-                # Update product price
-                product.current_price = new_price
-                
-                # Save price history
-                price_history = PriceHistory(
-                    product_id=product.id,
-                    price=new_price
-                )
-                db.add(price_history)
-                
-                # Check for price drop alert
-                if (old_price and new_price < old_price and 
-                    product.target_price and new_price <= product.target_price):
-                    
-                    # Get user emails (you'd need to implement user-product relationships)
-                    # For now, using a placeholder email
-                    user_email = "user@example.com"  # Replace with actual user lookup
-                    
-                    email_service.send_price_alert(
-                        recipient_email=user_email,
-                        product_name=product.name,
-                        old_price=old_price,
-                        new_price=new_price,
-                        product_url=product.url
-                    )
-                
-                db.commit()
-                logging.info(f"Updated price for {product.name}: ${new_price}")
-                
+            db.query(Product).filter(Product.id.in_([row.id for row in due])).update(
+                {Product.lease_owner: self.worker_id,
+                 Product.lease_expires_at: now + timedelta(seconds=LEASE_SECONDS)},
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+        
+        reclaimed = sum(1 for row in due if row.lease_owner is not None)
+        if reclaimed:
+            logging.warning(f"Reclaimed {reclaimed} products from expired leases")
+        return [(row.id, row.url, row.canonical_key) for row in due]
+    
+    def _submit(self, due: List[Tuple[int, str, Optional[str]]]) -> int:
+        # Each item is scraped once, also when products tracked before keys
+        # were unique still point at it under another URL
+        by_key = {}
+        for _, url, key in due:
+            key = key or url
+            by_key[key] = min(url, by_key.get(key, url))
+        urls = set(by_key.values())
+        ids = [id for id, _, _ in due]
+        
+        with self._lock:
+            self._in_flight += len(urls)
+        SWEEP_IN_FLIGHT.inc(len(urls))
+        started = time.monotonic()
+        
+        # Items stream from the crawl engine into the batched ingest
+        # pipeline as pages are scraped, so this returns immediately. The
+        # callback runs on the crawl thread, so the database work it
+        # triggers goes to the scheduler's pool.
+        sweep = get_scraper_service().submit(urls, ingest=True)
+        sweep.add_done_callback(
+            lambda future: self.scheduler.add_job(self._finish_batch, args=[ids, len(urls), time.monotonic() - started])
+        )
+        return len(urls)
+    
+    def _finish_batch(self, ids: List[int], pages: int, elapsed: float):
+        """Release what is left of a finished batch and claim more work"""
+        SWEEP_BATCH_SECONDS.observe(elapsed)
+        SWEEP_IN_FLIGHT.dec(pages)
+        # Ingested products clear their lease, so the batch's items still
+        # buffered for ingest are written first. What is left failed to
+        # scrape and is retried after the minimum interval.
+        price_ingestor.flush()
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            failed = db.query(Product).filter(
+                Product.id.in_(ids), Product.lease_owner == self.worker_id
+            ).update(
+                {Product.lease_owner: None, Product.lease_expires_at: None,
+                 Product.next_check_at: now + timedelta(minutes=MIN_CHECK_INTERVAL_MINUTES)},
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+        
+        with self._lock:
+            self._in_flight -= pages
+        logging.info(f"Price sweep batch finished: {pages} pages for {len(ids)} products, {failed} failed")
+        
+        if self.running:
+            self.metrics.record_tick(0, 0, self.claim_due_batches())
+    
+    def renew_leases(self):
+        """Heartbeat: extend this worker's leases while its batches run"""
+        with self._lock:
+            if not self._in_flight:
+                return
+        db = SessionLocal()
+        try:
+            db.query(Product).filter(Product.lease_owner == self.worker_id).update(
+                {Product.lease_expires_at: datetime.now(timezone.utc) + timedelta(seconds=LEASE_SECONDS)},
+                synchronize_session=False
+            )
+            db.commit()
         except Exception as e:
-            logging.error(f"Error checking price for product {product.id}: {e}")
-            db.rollback()
+            logging.error(f"Error renewing leases: {e}")
+        finally:
+            db.close()
     
     def cleanup_old_data(self):
         """Clean up old price history data"""
+        # Every scheduler process has this job; one of them runs it
+        with advisory_lock(engine, 'daily_cleanup') as acquired:
+            if acquired:
+                self._cleanup_old_data()
+    
+    def rebuild_price_stats(self):
+        """Recompute every product's price statistics from its history"""
+        with advisory_lock(engine, 'price_stats_rebuild') as acquired:
+            if not acquired:
+                return
+            try:
+                rows = recompute_price_stats()
+                logging.info(f"Rebuilt price statistics of {rows} products")
+            except Exception as e:
+                logging.error(f"Error rebuilding price statistics: {e}")
+    
+    def _cleanup_old_data(self):
         db = SessionLocal()
         try:
-            # Keep only last 30 days of price history
-            from datetime import datetime, timedelta
-            cutoff_date = datetime.now() - timedelta(days=30)
+            # Drop price runs that ended before the retention window
+            cutoff_date = datetime.now(timezone.utc) - timedelta(days=HISTORY_RETENTION_DAYS)
+            
+            if is_partitioned(db):
+                # Whole months are dropped at once instead of deleting rows,
+                # and partitions for the coming months are created ahead
+                dropped = drop_expired_partitions(db, cutoff_date)
+                ensure_price_history_partitions(db)
+                logging.info(f"Dropped {dropped} old price history partitions")
+                return
             
             deleted_count = db.query(PriceHistory).filter(
-                PriceHistory.timestamp < cutoff_date
+                PriceHistory.last_seen_at < cutoff_date
             ).delete()
             
             db.commit()
@@ -1,73 +1,238 @@
-from scrapy.crawler import CrawlerRunner, CrawlerProcess
-from scrapy.utils.project import get_project_settings
-from twisted.internet import reactor, defer
+from scrapy import Request, signals
+from scrapy.crawler import CrawlerRunner
+from scrapy.exceptions import DontCloseSpider
+from scrapy.settings import Settings
+from twisted.internet import threads
 from twisted.internet.asyncioreactor import install
+from twisted.internet.defer import Deferred
+from concurrent.futures import Future
 import asyncio
+import itertools
 import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
 from ..scrapy_spiders.product_spider import ProductSpider
+from ..scrapy_spiders.throttle import domain_slot
+from .fast_fetch import FastFetcher
+from .price_ingest import price_ingestor
 import logging
 
+def get_crawler_settings() -> Settings:
+    """Load the project's Scrapy settings module"""
+    settings = Settings()
+    settings.setmodule('app.scrapy_spiders.settings', priority='project')
+    return settings
+
+class CrawlBatch:
+    """A set of URLs submitted together and the Future they resolve"""
+
+    def __init__(self, batch_id: int, urls: Iterable[str], on_item: Optional[Callable[[dict], None]] = None,
+                 force_refresh: bool = False, ingest: bool = False):
+        self.id = batch_id
+        self.pending = set(urls)
+        self.results: Dict[str, dict] = {}
+        self.on_item = on_item
+        self.force_refresh = force_refresh
+        self.ingest = ingest
+        self.future: Future = Future()
+
+    def settle(self, url: str, item: Optional[dict] = None):
+        """Mark a URL as finished, with or without a scraped item"""
+        if url not in self.pending:
+            return
+        self.pending.discard(url)
+
+        if item is not None:
+            self.results[url] = item
+            if self.on_item:
+                try:
+                    self.on_item(item)
+                except Exception as e:
+                    logging.error(f"Error handling scraped item for {url}: {e}")
+
+        if not self.pending and not self.future.done():
+            self.future.set_result(self.results)
+
 class ScraperService:
+    """Long-lived Scrapy crawl engine running on its own reactor thread.
+
+    A single ProductSpider stays open for the lifetime of the app; callers
+    submit URLs and get back a Future, so neither the FastAPI event loop nor
+    the scheduler thread pays Scrapy's startup cost or blocks on a crawl.
+    """
+
     def __init__(self):
+        self.reactor = None
+        self.fast_fetcher = FastFetcher()
         self.runner = None
-        self.setup_reactor()
-    
-    def setup_reactor(self):
-        """Setup the Twisted reactor for asyncio compatibility"""
+        self.crawler = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._batches: Dict[int, CrawlBatch] = {}
+        self._batch_ids = itertools.count(1)
+
+    def start(self):
+        """Start the reactor thread and open the spider"""
+        # Concurrent first users wait for the one starting the engine
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run_reactor, name='crawl-engine', daemon=True)
+            self._thread.start()
+
+            if not self._ready.wait(timeout=30):
+                raise RuntimeError("Crawl engine failed to start")
+            logging.info("Crawl engine started")
+
+    def stop(self):
+        """Close the spider and stop the reactor thread"""
+        if not self._thread or not self._thread.is_alive():
+            return
+
+        self.reactor.callFromThread(self._shutdown)
+        self._thread.join(timeout=30)
+        logging.info("Crawl engine stopped")
+
+    def _run_reactor(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
         try:
-            install()
-        except:
+            install(eventloop=loop)
+        except Exception:
             pass  # Reactor already installed
-    
-    async def scrape_product(self, url: str) -> dict:
+
+        from twisted.internet import reactor
+        self.reactor = reactor
+        reactor.callWhenRunning(self._open_spider)
+        reactor.run(installSignalHandlers=False)
+
+    def _open_spider(self):
+        self.runner = CrawlerRunner(get_crawler_settings())
+        self.crawler = self.runner.create_crawler(ProductSpider)
+
+        connect = self.crawler.signals.connect
+        connect(self._spider_opened, signal=signals.spider_opened)
+        connect(self._spider_idle, signal=signals.spider_idle)
+        connect(self._item_scraped, signal=signals.item_scraped)
+        connect(self._item_dropped, signal=signals.item_dropped)
+        connect(self._spider_error, signal=signals.spider_error)
+
+        self.runner.crawl(self.crawler)
+
+    def _shutdown(self):
+        for batch in self._batches.values():
+            batch.future.cancel()
+        self._batches.clear()
+
+        d = Deferred.fromFuture(asyncio.ensure_future(self.fast_fetcher.close()))
+        d.addBoth(lambda _: self.runner.stop())
+        d.addBoth(lambda _: self.reactor.stop())
+
+    def _spider_opened(self, spider):
+        self._ready.set()
+
+    def _spider_idle(self, spider):
+        # Keep the spider open between submissions
+        raise DontCloseSpider
+
+    def _settle(self, meta: dict, item: Optional[dict] = None):
+        batch = self._batches.get(meta.get('crawl_batch'))
+        if batch is None:
+            return
+        batch.settle(meta.get('product_url'), item)
+        if batch.future.done():
+            self._batches.pop(batch.id, None)
+
+    def _item_scraped(self, item, response, spider):
+        self._settle(response.meta, dict(item))
+
+    def _item_dropped(self, item, response, exception, spider):
+        self._settle(response.meta)
+
+    def _spider_error(self, failure, response, spider):
+        self._settle(response.meta)
+
+    def _request_failed(self, failure):
+        logging.error(f"Error scraping {failure.request.url}: {failure.value}")
+        self._settle(failure.request.meta)
+
+    def _schedule(self, batch: CrawlBatch):
+        if not batch.pending:
+            batch.future.set_result(batch.results)
+            return
+
+        self._batches[batch.id] = batch
+        for url in list(batch.pending):
+            if self.fast_fetcher.handles(url):
+                asyncio.ensure_future(self._fetch_fast(batch, url))
+            else:
+                self._crawl(batch, url)
+
+    def _crawl(self, batch: CrawlBatch, url: str):
+        self.crawler.engine.crawl(Request(
+            url,
+            callback=self.crawler.spider.parse,
+            errback=self._request_failed,
+            dont_filter=True,
+            meta={
+                'product_url': url,
+                'crawl_batch': batch.id,
+                'download_slot': domain_slot(url),
+                'force_refresh': batch.force_refresh,
+                'ingest': batch.ingest,
+                'queued_at': time.monotonic(),
+            },
+        ))
+
+    async def _fetch_fast(self, batch: CrawlBatch, url: str):
+        try:
+            item = await self.fast_fetcher.fetch(url, batch.force_refresh, batch.ingest)
+        except Exception as e:
+            logging.error(f"Fast path error for {url}: {e}")
+            item = None
+        if batch.future.done():
+            return
+        if item is None:
+            self._crawl(batch, url)
+            return
+
+        # Fast path items skip the item pipeline, so they go to the ingestor here
+        if item.get('ingest') and price_ingestor.add(item):
+            threads.deferToThread(price_ingestor.flush)
+        self._settle({'crawl_batch': batch.id, 'product_url': url}, item)
+
+    def submit(self, urls: Iterable[str], on_item: Optional[Callable[[dict], None]] = None,
+               force_refresh: bool = False, ingest: bool = False) -> Future:
+        """Queue URLs on the running spider.
+
+        Returns a Future resolving to a dict of scraped items keyed by URL.
+        ``on_item`` is called on the reactor thread as each item arrives and
+        must not block. Pages whose price is unchanged since the last fetch
+        come back as ``{'url': ..., 'unchanged': True}`` unless
+        ``force_refresh`` is set. With ``ingest`` the results are also stored
+        by the batched price ingest pipeline.
+        """
+        if not self._ready.is_set():
+            raise RuntimeError("Crawl engine is not running")
+
+        batch = CrawlBatch(next(self._batch_ids), urls, on_item, force_refresh, ingest)
+        self.reactor.callFromThread(self._schedule, batch)
+        return batch.future
+
+    async def scrape_product(self, url: str, force_refresh: bool = False, ingest: bool = False) -> dict:
         """Scrape product data from given URL"""
         try:
-            # Create a new event loop for the scraping operation
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # Use CrawlerProcess for one-time scraping
-            process = CrawlerProcess(get_project_settings())
-            
-            # Store result
-            result = {}
-            
-            def spider_closed(spider):
-                result.update(spider.scraped_data)
-            
-            # Connect to spider_closed signal
-            from scrapy import signals
-            from pydispatch import dispatcher
-            dispatcher.connect(spider_closed, signal=signals.spider_closed)
-            
-            # Run the spider
-            process.crawl(ProductSpider, url=url)
-            process.start()
-            
-            return result
-            
+            results = await asyncio.wrap_future(self.submit([url], force_refresh=force_refresh, ingest=ingest))
+            return results.get(url, {})
         except Exception as e:
             logging.error(f"Error scraping {url}: {str(e)}")
             return {}
-    
-    def scrape_product_sync(self, url: str) -> dict:
+
+    def scrape_product_sync(self, url: str, timeout: float = 120) -> dict:
         """Synchronous version for background tasks"""
-        settings = get_project_settings()
-        process = CrawlerProcess(settings)
-        
-        result = {}
-        
-        def spider_closed(spider):
-            nonlocal result
-            result = spider.scraped_data
-        
-        from scrapy import signals
-        from pydispatch import dispatcher
-        dispatcher.connect(spider_closed, signal=signals.spider_closed)
-        
-        process.crawl(ProductSpider, url=url)
-        process.start()
-        
-        return result
+        return self.submit([url]).result(timeout=timeout).get(url, {})
 
 scraper_service = ScraperService()
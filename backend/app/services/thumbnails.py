@@ -0,0 +1,321 @@
+from sqlalchemy import or_, select, update
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urljoin
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import httpx
+from ..db.database import SessionLocal
+from ..models.product import Product
+from ..scrapy_spiders.settings import USER_AGENT
+from .cache import response_cache
+from .metrics import THUMBNAILS, timed
+from config import (
+    THUMBNAIL_BATCH_SIZE, THUMBNAIL_CACHE_MAX_MB, THUMBNAIL_CACHE_PATH, THUMBNAIL_CONCURRENCY,
+    THUMBNAIL_FETCH_TIMEOUT, THUMBNAIL_MAX_SOURCE_MB, THUMBNAIL_POLL_SECONDS, THUMBNAIL_QUALITY,
+    THUMBNAIL_RETRY_HOURS, THUMBNAIL_SIZES,
+)
+import logging
+
+# Served thumbnails get their modification time refreshed at most this often;
+# eviction removes the files with the oldest ones first
+TOUCH_INTERVAL_SECONDS = 3600
+# Eviction frees space down to this fraction of the limit, so a full cache is
+# not rescanned on every write
+EVICT_TO = 0.9
+
+def make_thumbnails(data: bytes, sizes: Iterable[int] = THUMBNAIL_SIZES,
+                    quality: int = THUMBNAIL_QUALITY) -> Dict[int, bytes]:
+    """WebP thumbnails of an image by size, each fitted within size x size"""
+    # Pillow is only loaded by processes that make thumbnails
+    from PIL import Image, ImageOps
+
+    sizes = sorted(sizes, reverse=True)
+    with Image.open(BytesIO(data)) as image:
+        # JPEG can be decoded at a fraction of its size, which is much cheaper
+        # than decoding every pixel and scaling down afterwards
+        image.draft('RGB', (sizes[0], sizes[0]))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    thumbnails = {}
+    # Largest first, so each size is scaled down from the previous one
+    for size in sizes:
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+        thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
+class ThumbnailCache:
+    """WebP thumbnails on disk, named by the SHA-256 of the image they were
+    made from (``<root>/ab/ab12...-320.webp``).
+
+    A file never changes once written, so it can be served with a
+    year-long, immutable Cache-Control, and products showing the same image
+    share its thumbnails. When the cache grows past ``max_bytes`` the least
+    recently served files are removed.
+    """
+
+    def __init__(self, root: str = THUMBNAIL_CACHE_PATH, max_bytes: int = THUMBNAIL_CACHE_MAX_MB * 2 ** 20):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def path(self, digest: str, size: int) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}-{size}.webp")
+
+    def has(self, digest: str, sizes: Iterable[int]) -> bool:
+        return all(os.path.exists(self.path(digest, size)) for size in sizes)
+
+    def get(self, digest: str, size: int) -> Optional[str]:
+        """Path of a cached thumbnail, marked as recently used, or None"""
+        path = self.path(digest, size)
+        try:
+            modified = os.stat(path).st_mtime
+        except OSError:
+            return None
+        if time.time() - modified > TOUCH_INTERVAL_SECONDS:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return path
+
+    def put(self, digest: str, thumbnails: Dict[int, bytes]) -> None:
+        directory = os.path.join(self.root, digest[:2])
+        os.makedirs(directory, exist_ok=True)
+        for size, data in thumbnails.items():
+            # Renamed into place, so readers never see a partial file
+            fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, self.path(digest, size))
+
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._files())
+            else:
+                self._bytes += sum(len(data) for data in thumbnails.values())
+            full = self._bytes > self.max_bytes
+        if full:
+            self.evict()
+
+    def evict(self) -> int:
+        """Remove the least recently used thumbnails until the cache is
+        below its limit, returning the bytes freed"""
+        with self._lock:
+            files = sorted(self._files())
+            total = sum(size for _, size, _ in files)
+            freed = 0
+            for _, size, path in files:
+                if total - freed <= self.max_bytes * EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                    freed += size
+                except FileNotFoundError:
+                    pass
+            self._bytes = total - freed
+        if freed:
+            logging.info(f"Evicted {freed / 2 ** 20:.1f} MB of thumbnails")
+        return freed
+
+    def _files(self) -> Iterator[Tuple[float, int, str]]:
+        """(modified, size, path) of every thumbnail; other processes may be
+        removing files meanwhile"""
+        try:
+            shards = [entry.path for entry in os.scandir(self.root) if entry.is_dir()]
+        except FileNotFoundError:
+            return
+        for shard in shards:
+            try:
+                entries = list(os.scandir(shard))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if not entry.name.endswith('.webp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, entry.path
+
+class ThumbnailWorker:
+    """Background thread making thumbnails of product images.
+
+    Products with an image and no ``image_hash`` are claimed in batches with
+    SELECT ... FOR UPDATE SKIP LOCKED and a stamped ``image_fetched_at``,
+    committed straight away, so several scraper processes can share the
+    work. Each image is downloaded once and its thumbnails are written to
+    the cache under the image's hash, which is then stored on the product.
+    Failed downloads are retried after THUMBNAIL_RETRY_HOURS.
+    """
+
+    def __init__(self, cache: ThumbnailCache, session_factory=SessionLocal,
+                 batch_size: int = THUMBNAIL_BATCH_SIZE, poll_interval: float = THUMBNAIL_POLL_SECONDS,
+                 concurrency: int = THUMBNAIL_CONCURRENCY):
+        self.cache = cache
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.concurrency = concurrency
+        self.max_source_bytes = THUMBNAIL_MAX_SOURCE_MB * 2 ** 20
+        self._client: Optional[httpx.Client] = None
+        self._client_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    @property
+    def client(self) -> httpx.Client:
+        # Created on first use: API processes only need it to rebuild
+        # evicted thumbnails
+        with self._client_lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    timeout=THUMBNAIL_FETCH_TIMEOUT, follow_redirects=True,
+                    headers={'User-Agent': USER_AGENT, 'Accept': 'image/webp,image/*;q=0.8'},
+                    limits=httpx.Limits(max_connections=self.concurrency * 2),
+                )
+            return self._client
+
+    def start(self):
+        """Start the thumbnail thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='thumbnails', daemon=True)
+        self._thread.start()
+        logging.info("Thumbnail worker started")
+
+    def stop(self):
+        """Stop the thumbnail thread and close its connections"""
+        if self._thread:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout=30)
+            logging.info("Thumbnail worker stopped")
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def notify(self):
+        """Process newly added images without waiting for the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                while self.process_batch() == self.batch_size and not self._stop.is_set():
+                    pass
+            except Exception as e:
+                logging.error(f"Error making thumbnails: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def download(self, url: str) -> bytes:
+        with self.client.stream('GET', url) as response:
+            response.raise_for_status()
+            chunks, received = [], 0
+            for chunk in response.iter_bytes():
+                received += len(chunk)
+                if received > self.max_source_bytes:
+                    raise ValueError(f"image is larger than {THUMBNAIL_MAX_SOURCE_MB} MB")
+                chunks.append(chunk)
+        return b''.join(chunks)
+
+    def render(self, image_url: str) -> str:
+        """Download an image and cache its thumbnails, returning its hash"""
+        data = self.download(image_url)
+        digest = hashlib.sha256(data).hexdigest()
+        if self.cache.has(digest, THUMBNAIL_SIZES):
+            THUMBNAILS.labels('cached').inc()
+            return digest
+        with timed('thumbnail'):
+            thumbnails = make_thumbnails(data)
+        self.cache.put(digest, thumbnails)
+        THUMBNAILS.labels('created').inc()
+        return digest
+
+    def _try_render(self, image_url: str) -> Optional[str]:
+        try:
+            return self.render(image_url)
+        except Exception as e:
+            THUMBNAILS.labels('failed').inc()
+            logging.warning(f"Could not make thumbnails of {image_url}: {e}")
+            return None
+
+    def process_batch(self) -> int:
+        """Make thumbnails for one batch of products, returning how many
+        were attempted"""
+        products = self._claim()
+        if not products:
+            return 0
+
+        # Downloaded outside any transaction, so slow image hosts never hold
+        # locks ingest needs. Image sources may be relative to the product
+        # page; products sharing an image download it once
+        sources = {product.id: urljoin(product.url, product.image_url) for product in products}
+        unique = list(dict.fromkeys(sources.values()))
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='thumbnail') as pool:
+            digests = dict(zip(unique, pool.map(self._try_render, unique)))
+
+        made = [product_id for product_id, source in sources.items() if digests[source]]
+        if made:
+            db = self.session_factory()
+            try:
+                db.execute(update(Product), [
+                    {'id': product_id, 'image_hash': digests[sources[product_id]]} for product_id in made
+                ])
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            response_cache.invalidate_products(made)
+        logging.info(f"Made thumbnails for {len(made)} of {len(products)} product images")
+        return len(products)
+
+    def _claim(self) -> list:
+        """Claim a batch of products by stamping image_fetched_at, which
+        keeps other workers off them until the retry window has passed"""
+        db = self.session_factory()
+        try:
+            now = datetime.now(timezone.utc)
+            products = db.execute(
+                select(Product.id, Product.url, Product.image_url)
+                .where(
+                    Product.image_hash == None,
+                    Product.image_url != None,
+                    or_(Product.image_fetched_at == None,
+                        Product.image_fetched_at < now - timedelta(hours=THUMBNAIL_RETRY_HOURS)),
+                )
+                .order_by(Product.image_fetched_at.nullsfirst(), Product.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True, of=Product)
+            ).all()
+            if products:
+                db.execute(update(Product), [
+                    {'id': product.id, 'image_fetched_at': now} for product in products
+                ])
+            db.commit()
+            return products
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+thumbnail_cache = ThumbnailCache()
+thumbnail_worker = ThumbnailWorker(thumbnail_cache)
@@ -0,0 +1,35 @@
+"""Scraper worker: runs price sweeps and alert delivery without the API.
+
+    python -m app.worker
+
+Runs the scraper and scheduler roles in ROLES. Start as many as needed, on
+any hosts sharing the database; they split each sweep between them through
+product leases.
+"""
+import logging
+import signal
+import threading
+from .services.registry import get_price_scheduler, start_roles, stop_services
+from config import ROLES
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stopping.set())
+
+    roles = ROLES - {'api'}
+    if not roles:
+        raise SystemExit("ROLES has no worker roles (scraper, scheduler)")
+    start_roles(roles)
+    logging.info(f"Worker started with roles: {', '.join(sorted(roles))}")
+    if 'scheduler' in roles:
+        # Claim a first batch now instead of waiting for the first tick
+        get_price_scheduler().check_due_prices()
+
+    stopping.wait()
+    logging.info("Worker shutting down...")
+    stop_services()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Time to find the price on a page with the extraction rule registry versus
+the original broad CSS fallbacks, on synthetic long-tail product pages.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_extraction --pages 500 --nodes 3000
+"""
+import argparse
+import random
+import re
+import time
+from scrapy.http import HtmlResponse
+from app.scrapy_spiders.extraction import ExtractionRegistry, load_rules
+from app.scrapy_spiders.throttle import domain_slot
+
+ORIGINAL_SELECTORS = [
+    'span[class*="price"]::text',
+    'div[class*="price"]::text',
+    '*[class*="cost"]::text',
+    '*[data-price]::attr(data-price)',
+]
+
+def page(index, nodes, layout):
+    filler = ''.join(
+        f'<div class="row-{i % 50}"><a href="/p/{i}">Related item {i}</a><span class="meta">{i}</span></div>'
+        for i in range(nodes)
+    )
+    price = f'{random.uniform(10, 999):.2f}'
+    if layout == 'json-ld':
+        head = ('<script type="application/ld+json">{"@type": "Product", "name": "Item %d", '
+                '"offers": {"@type": "Offer", "price": "%s"}}</script>' % (index, price))
+        body = f'<h1>Item {index}</h1>{filler}'
+    else:
+        # Price only reachable through the broadest selector
+        head = ''
+        body = f'<h1>Item {index}</h1>{filler}<p class="product-cost">${price}</p>'
+    html = f'<html><head><title>Item {index}</title>{head}</head><body>{body}</body></html>'
+    return HtmlResponse(url=f'https://shop-{layout}.example/item/{index}', body=html.encode(), encoding='utf-8')
+
+def original(response):
+    """The previous generic path: every selector over the whole DOM, and the
+    price regex compiled on each call"""
+    for selector in ORIGINAL_SELECTORS:
+        price_text = response.css(selector).get()
+        if price_text and re.search(r'[\d,]+\.?\d*', price_text.replace(',', '')):
+            return price_text.strip()
+    return None
+
+def registry_path(registry):
+    def extract(response):
+        rules = registry.for_url(response.url)
+        return rules.price_text(response.selector.root, domain_slot(response.url))
+    return extract
+
+def run(label, fn, responses):
+    start = time.perf_counter()
+    cpu = time.process_time()
+    found = sum(1 for response in responses if fn(response))
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+    print(f"{label:<22} {len(responses):>5} pages  {elapsed * 1000 / len(responses):7.3f} ms/page  "
+          f"cpu {cpu:6.2f}s  prices found {found}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--nodes', type=int, default=3000, help="filler elements per page")
+    args = parser.parse_args()
+
+    for layout in ('json-ld', 'dom'):
+        responses = [page(i, args.nodes, layout) for i in range(args.pages)]
+        # Parse the trees up front so both paths are timed on extraction only
+        for response in responses:
+            response.selector
+        print(f"-- {layout} pages")
+        run('original selectors', original, responses)
+        run('extraction registry', registry_path(ExtractionRegistry(load_rules())), responses)
+
+if __name__ == '__main__':
+    main()
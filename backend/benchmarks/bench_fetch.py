@@ -0,0 +1,96 @@
+"""Pages/sec of the Scrapy spider versus the lightweight fast path, against a
+local fixture server serving product pages with JSON-LD prices.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_fetch --pages 2000 --concurrency 32
+
+Politeness delays are disabled and both paths get the same per-domain
+concurrency, so the difference is the per-page overhead of each fetcher.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+FILLER = ''.join(f'<div class="row"><a href="/p/{i}">Related item {i}</a></div>' for i in range(500))
+
+def fixture_page(index: int) -> bytes:
+    body = (
+        f'<html><head><title>Item {index}</title>'
+        f'<script type="application/ld+json">{{"@type": "Product", "name": "Item {index}", '
+        f'"offers": {{"@type": "Offer", "price": "{index % 500 + 10}.99"}}}}</script>'
+        f'</head><body><h1>Item {index}</h1>{FILLER}</body></html>'
+    ).encode()
+    return (
+        b'HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n'
+        b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body
+    )
+
+async def handle(reader, writer):
+    # Minimal keep-alive HTTP/1.1 server, so the fixture side is never the
+    # bottleneck being measured
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            path = head.split(b' ', 2)[1].decode()
+            writer.write(fixture_page(int(path.rstrip('/').rsplit('/', 1)[-1])))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+def serve(port):
+    async def main():
+        server = await asyncio.start_server(handle, '127.0.0.1', port, backlog=1024)
+        async with server:
+            await server.serve_forever()
+    asyncio.run(main())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--port', type=int, default=8765, help="fixture server port")
+    args = parser.parse_args()
+
+    # Configure before the app reads its settings
+    os.environ['CRAWL_DOMAIN_DELAY'] = '0'
+    os.environ['CRAWL_DOMAIN_CONCURRENCY'] = str(args.concurrency)
+    os.environ['FETCH_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(), 'fetch_cache.sqlite3')
+    sys.modules.pop('config', None)
+
+    from config import DEFAULT_DOMAIN_POLITENESS
+    from app.services.scraper_runner import scraper_service
+
+    # Keep the adaptive throttle from adding its floor delay or capping
+    # concurrency on the Scrapy side
+    DEFAULT_DOMAIN_POLITENESS.update(min_delay=0.0, max_concurrency=args.concurrency)
+
+    # The fixture server runs in its own process so it does not compete with
+    # the crawl engine for the GIL
+    server = multiprocessing.Process(target=serve, args=(args.port,), daemon=True)
+    server.start()
+    time.sleep(0.5)
+    urls = [f"http://127.0.0.1:{args.port}/item/{i}" for i in range(args.pages)]
+
+    scraper_service.start()
+    try:
+        for label, domains in (('scrapy', set()), ('fast path', {'127.0.0.1'})):
+            scraper_service.fast_fetcher.domains = domains
+            start = time.perf_counter()
+            results = scraper_service.submit(urls, force_refresh=True).result()
+            elapsed = time.perf_counter() - start
+            prices = sum(1 for item in results.values() if item.get('price') is not None)
+            print(f"{label:<10} {len(urls):>6} pages  {elapsed:7.2f}s  {len(urls) / elapsed:8.1f} pages/s  "
+                  f"prices {prices}")
+    finally:
+        scraper_service.stop()
+        server.terminate()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Rows/sec of the per-product commit path versus the batched ingestor.
+
+Run from the backend directory against a scratch database (tables are
+dropped and recreated):
+
+    python -m benchmarks.bench_ingest --products 5000
+    python -m benchmarks.bench_ingest --database-url postgresql://user:pw@localhost/bench
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.models.product import Product, PriceHistory
+from app.services.price_ingest import PriceIngestor
+
+def seed(Session, count):
+    db = Session()
+    db.add_all(
+        Product(name=f"Product {i}", url=f"https://shop.example/item/{i}", platform='generic', current_price=100.0)
+        for i in range(count)
+    )
+    db.commit()
+    db.close()
+
+def scraped_items(count):
+    return [
+        {'url': f"https://shop.example/item/{i}", 'price': round(random.uniform(50, 150), 2)}
+        for i in range(count)
+    ]
+
+def per_row(Session, items):
+    """The original path: one lookup, one history row and one commit per scrape"""
+    db = Session()
+    for item in items:
+        product = db.query(Product).filter(Product.url == item['url']).first()
+        product.current_price = item['price']
+        db.add(PriceHistory(product_id=product.id, price=item['price']))
+        db.commit()
+    db.close()
+
+def batched(Session, items, batch_size):
+    ingestor = PriceIngestor(session_factory=Session, batch_size=batch_size)
+    for item in items:
+        if ingestor.add(item):
+            ingestor.flush()
+    ingestor.flush()
+
+def run(label, fn, Session, items, *args):
+    start = time.perf_counter()
+    fn(Session, items, *args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {len(items):>7} rows  {elapsed:8.2f}s  {len(items) / elapsed:10.0f} rows/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL'))
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_ingest.db')}"
+    engine = create_engine(url)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    seed(Session, args.products)
+
+    run('per-row', per_row, Session, scraped_items(args.products))
+    run('batched', batched, Session, scraped_items(args.products), args.batch_size)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Cold import time of the app's entry points, in fresh interpreters.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup --save before.json
+    python -m benchmarks.bench_startup --baseline before.json --tolerance 0.2
+
+Each module is imported --runs times with ``python -X importtime``; the
+median is reported with the slowest imports it pulled in. The run fails when
+a module loads one of HEAVY_MODULES at import time, or with --baseline when
+it got slower than the baseline by more than --tolerance, so cold-start
+regressions can be caught in CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = ['app.main', 'app.worker']
+
+# Loaded only by the services that need them, never by importing an entry point
+HEAVY_MODULES = ['scrapy', 'twisted', 'pandas', 'numpy', 'apscheduler', 'sendgrid', 'PIL']
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_times(module: str):
+    """Microseconds to import ``module`` and its parent packages, the
+    cumulative time of each import they triggered directly, and every
+    module loaded"""
+    script = f"import json, sys, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', script],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        env={**os.environ, 'PYTHONPATH': BACKEND_DIR},
+    )
+    total, direct, nested = 0, {}, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, field = line[len('import time:'):].split('|')
+        name = field.strip()
+        # Imports are listed after the ones they triggered, indented one
+        # level deeper
+        depth = (len(field) - 1 - len(field.lstrip())) // 2
+        if depth == 1:
+            nested[name] = int(cumulative)
+        elif depth == 0:
+            if name == module or module.startswith(name + '.'):
+                total += int(cumulative)
+                direct.update(nested)
+            nested = {}
+    return total, direct, json.loads(result.stdout)
+
+def measure(module: str, runs: int) -> dict:
+    totals, imports, loaded = [], {}, []
+    for _ in range(runs):
+        total, direct, loaded = import_times(module)
+        totals.append(total)
+        for name, cumulative in direct.items():
+            imports.setdefault(name, []).append(cumulative)
+    packages = {name.split('.')[0] for name in loaded}
+    slowest = sorted(imports.items(), key=lambda item: -statistics.median(item[1]))[:10]
+    return {
+        'median_ms': round(statistics.median(totals) / 1000, 1),
+        'min_ms': round(min(totals) / 1000, 1),
+        'modules_loaded': len(loaded),
+        'heavy_modules': [name for name in HEAVY_MODULES if name in packages],
+        'slowest': {name: round(statistics.median(values) / 1000, 1) for name, values in slowest},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', action='append', help=f"module to import, repeatable (default {', '.join(MODULES)})")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown over the baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, failures = {}, []
+    for module in args.module or MODULES:
+        result = results[module] = measure(module, args.runs)
+        print(f"{module:<12} {result['median_ms']:8.1f} ms median  {result['min_ms']:8.1f} ms min  "
+              f"{result['modules_loaded']} modules")
+        for name, ms in result['slowest'].items():
+            print(f"{'':<12} {ms:8.1f} ms  {name}")
+        if result['heavy_modules']:
+            failures.append(f"{module} loads {', '.join(result['heavy_modules'])} at import time")
+        if module in baseline:
+            before = baseline[module]['median_ms']
+            print(f"{'':<12} baseline {before:.1f} ms  ->  {result['median_ms'] / before:.2f}x")
+            if result['median_ms'] > before * (1 + args.tolerance):
+                failures.append(f"{module} imports {result['median_ms']:.0f} ms, baseline {before:.0f} ms")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failures:
+        raise SystemExit('\n'.join(failures))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""End-to-end price sweeps against the fixture server: leasing due products,
+crawling, extraction, batched ingest and lease release, as the scheduler
+runs them.
+
+Run from the backend directory (Linux; each fixture domain is a 127.0.0.x
+address). Save a run on one build and compare another build against it:
+
+    python -m benchmarks.bench_sweep --scenario 500x5 --scenario 2000x20 --save before.json
+    python -m benchmarks.bench_sweep --scenario 500x5 --scenario 2000x20 --baseline before.json
+
+A scenario NxM is N products spread over M domains, rotating through the
+Amazon, eBay and generic fixtures. Every scenario seeds a scratch database
+(sqlite unless --database-url is given; its tables are dropped) and runs
+--sweeps sweeps over it. The report has pages/sec, p50/p99 fetch latency,
+time spent per pipeline stage, CPU, RSS and database rows written per second.
+Latency percentiles are interpolated from the fetch latency histogram, the
+way Prometheus computes them.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from benchmarks.fixture_server import PLATFORMS, domain_hosts, serve
+
+STAGES = ('queue_wait', 'fetch', 'parse', 'db_write')
+
+def parse_scenario(value: str):
+    products, _, domains = value.lower().partition('x')
+    try:
+        return int(products), int(domains)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected PRODUCTSxDOMAINS, e.g. 1000x10, got {value!r}")
+
+def histogram_buckets(histogram) -> dict:
+    """Cumulative bucket counts by upper bound, summed over all labels"""
+    buckets = {}
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            if sample.name.endswith('_bucket'):
+                bound = float(sample.labels['le'])
+                buckets[bound] = buckets.get(bound, 0) + sample.value
+    return buckets
+
+def histogram_sums(histogram, label: str) -> dict:
+    sums = {}
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            if sample.name.endswith('_sum'):
+                key = sample.labels[label]
+                sums[key] = sums.get(key, 0) + sample.value
+    return sums
+
+def quantile(before: dict, after: dict, q: float):
+    """Quantile of the observations between two bucket snapshots"""
+    buckets = sorted((bound, after[bound] - before.get(bound, 0)) for bound in after)
+    if not buckets or not buckets[-1][1]:
+        return None
+    rank = q * buckets[-1][1]
+    lower, below = 0.0, 0
+    for bound, count in buckets:
+        if count >= rank:
+            if math.isinf(bound):
+                return lower
+            return lower + (bound - lower) * (rank - below) / (count - below) if count > below else bound
+        lower, below = bound, count
+    return lower
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return peak_rss_mb()
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def run_scenario(engine, products: int, domains: int, hosts, args) -> dict:
+    from sqlalchemy import func, or_, select, update
+    from app.db.database import Base, SessionLocal
+    from app.models.product import Product, PriceHistory
+    from app.services import metrics
+    from app.services.scheduler import price_scheduler
+    from app.services.url_canonical import canonical_key
+
+    label = f"{products}x{domains}"
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with SessionLocal() as db:
+        rows = []
+        for i in range(products):
+            domain = i % domains
+            url = f"http://{hosts[domain]}:{args.port}/{PLATFORMS[domain % len(PLATFORMS)]}/{label}-{i}"
+            rows.append({'name': url, 'url': url, 'canonical_key': canonical_key(url),
+                         'platform': PLATFORMS[domain % len(PLATFORMS)], 'is_active': True})
+        db.execute(Product.__table__.insert(), rows)
+        db.commit()
+
+    def swept():
+        with SessionLocal() as db:
+            return not db.scalar(select(func.count()).select_from(Product).where(or_(
+                Product.lease_owner != None,
+                Product.next_check_at == None,
+            )))
+
+    fetch_before = histogram_buckets(metrics.FETCH_SECONDS)
+    stages_before = histogram_sums(metrics.STAGE_SECONDS, 'stage')
+    cpu, start = cpu_seconds(), time.perf_counter()
+    for sweep in range(args.sweeps):
+        if sweep:
+            with SessionLocal() as db:
+                db.execute(update(Product).values(next_check_at=None))
+                db.commit()
+        price_scheduler.check_due_prices()
+        deadline = time.perf_counter() + args.timeout
+        while not swept():
+            if time.perf_counter() > deadline:
+                raise SystemExit(f"Scenario {label} did not finish within {args.timeout}s")
+            time.sleep(0.2)
+    elapsed, cpu = time.perf_counter() - start, cpu_seconds() - cpu
+    fetch_after = histogram_buckets(metrics.FETCH_SECONDS)
+    stages_after = histogram_sums(metrics.STAGE_SECONDS, 'stage')
+
+    with SessionLocal() as db:
+        checked = db.scalar(select(func.count()).select_from(Product).where(Product.last_checked_at != None))
+        history_rows = db.scalar(select(func.count()).select_from(PriceHistory))
+
+    # Every sweep updates each checked product; history rows only on changes
+    pages = checked * args.sweeps
+    p50, p99 = quantile(fetch_before, fetch_after, 0.5), quantile(fetch_before, fetch_after, 0.99)
+    return {
+        'products': products,
+        'domains': domains,
+        'sweeps': args.sweeps,
+        'pages': pages,
+        'failed': products - checked,
+        'seconds': round(elapsed, 2),
+        'pages_per_s': round(pages / elapsed, 1),
+        'fetch_p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+        'fetch_p99_ms': round(p99 * 1000, 1) if p99 is not None else None,
+        'stage_seconds': {
+            stage: round(stages_after.get(stage, 0) - stages_before.get(stage, 0), 2) for stage in STAGES
+        },
+        'cpu_s': round(cpu, 2),
+        'cpu_pct': round(cpu / elapsed * 100, 1),
+        'rss_mb': round(rss_mb(), 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'db_rows_per_s': round((pages + history_rows) / elapsed, 1),
+    }
+
+def print_result(label: str, result: dict, baseline: dict = None):
+    print(f"{label:<10} {result['pages']:>6} pages  {result['seconds']:7.2f}s  {result['pages_per_s']:8.1f} pages/s  "
+          f"fetch p50 {result['fetch_p50_ms']} ms p99 {result['fetch_p99_ms']} ms  "
+          f"cpu {result['cpu_pct']:.0f}%  rss {result['rss_mb']:.0f} MB  "
+          f"{result['db_rows_per_s']:.0f} rows/s  failed {result['failed']}")
+    print(f"{'':<10} stage seconds: " + '  '.join(
+        f"{stage} {seconds:.2f}" for stage, seconds in result['stage_seconds'].items()
+    ))
+    if baseline:
+        print(f"{'':<10} baseline {baseline['pages_per_s']:.1f} pages/s  p99 {baseline['fetch_p99_ms']} ms  "
+              f"cpu {baseline['cpu_pct']:.0f}%  rss {baseline['rss_mb']:.0f} MB  ->  "
+              f"{result['pages_per_s'] / baseline['pages_per_s']:.2f}x throughput")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', type=parse_scenario, action='append',
+                        help="PRODUCTSxDOMAINS, repeatable (default 500x5 and 2000x20)")
+    parser.add_argument('--sweeps', type=int, default=2, help="sweeps per scenario; later ones refetch pages")
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="fixture server response time")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument('--change-rate', type=float, default=0.1, help="chance a refetched page has a new price")
+    parser.add_argument('--domain-concurrency', type=int, default=8, help="concurrent requests per domain")
+    parser.add_argument('--fast', action='store_true', help="fetch the fixture domains through the fast path")
+    parser.add_argument('--port', type=int, default=8767, help="fixture server port")
+    parser.add_argument('--timeout', type=float, default=600.0, help="seconds allowed per sweep")
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL'))
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+    scenarios = args.scenario or [(500, 5), (2000, 20)]
+
+    # Configure before the app reads its settings: no politeness delays and
+    # a fresh page fingerprint cache
+    os.environ['CRAWL_DOMAIN_DELAY'] = '0'
+    os.environ['CRAWL_DOMAIN_CONCURRENCY'] = str(args.domain_concurrency)
+    os.environ['FETCH_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(), 'fetch_cache.sqlite3')
+    sys.modules.pop('config', None)
+
+    from sqlalchemy import create_engine
+    from config import DEFAULT_DOMAIN_POLITENESS
+    from app.db.database import Base, SessionLocal
+    from app.scrapy_spiders.extraction import extraction_rules
+    from app.services.scheduler import price_scheduler
+    from app.services.scraper_runner import scraper_service
+
+    DEFAULT_DOMAIN_POLITENESS.update(min_delay=0.0, max_concurrency=args.domain_concurrency)
+    hosts = domain_hosts(max(domains for _, domains in scenarios))
+    # Fixture domains get the extraction rules of the platform they serve
+    for domain, host in enumerate(hosts):
+        extraction_rules.platforms[PLATFORMS[domain % len(PLATFORMS)]].domains.append(host)
+
+    # The fixture server runs in its own process so it does not compete with
+    # the crawl engine for the GIL
+    server = multiprocessing.Process(target=serve, args=(len(hosts), args.port), kwargs=dict(
+        latency_ms=args.latency_ms, throttle_rate=args.throttle_rate, change_rate=args.change_rate,
+    ), daemon=True)
+    server.start()
+    time.sleep(0.5)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    # The scheduler and the ingest pipeline both work through SessionLocal
+    engine = create_engine(args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_sweep.db')}")
+    SessionLocal.configure(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    results = {}
+    scraper_service.start()
+    if args.fast:
+        scraper_service.fast_fetcher.domains = set(hosts)
+    price_scheduler.start()
+    try:
+        for products, domains in scenarios:
+            label = f"{products}x{domains}"
+            results[label] = run_scenario(engine, products, domains, hosts, args)
+            print_result(label, results[label], baseline.get(label))
+    finally:
+        price_scheduler.stop()
+        scraper_service.stop()
+        server.terminate()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
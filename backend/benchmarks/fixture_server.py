@@ -0,0 +1,126 @@
+"""Local HTTP server replaying the product page fixtures in benchmarks/fixtures.
+
+Each fixture is a product page of one platform with {{index}}, {{price}}
+and {{filler}} placeholders; /<platform>/<index> serves that platform's page
+for product <index>. The server listens on 127.0.0.1 .. 127.0.0.<domains>,
+so every address is a separate domain to the crawler (Linux routes all of
+127.0.0.0/8 to loopback).
+
+    python -m benchmarks.fixture_server --domains 5 --latency-ms 50 --throttle-rate 0.02
+
+Pages are answered after a random delay around --latency-ms, and a
+--throttle-rate fraction of requests get 429 Too Many Requests instead.
+Every refetch of a page changes its price with probability --change-rate, so
+repeated sweeps exercise both the unchanged and the repriced write paths.
+"""
+import argparse
+import asyncio
+import os
+import random
+import zlib
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+PLATFORMS = ('amazon', 'ebay', 'generic')
+
+def domain_hosts(domains: int):
+    if not 1 <= domains <= 254:
+        raise ValueError("between 1 and 254 domains are supported")
+    return [f"127.0.0.{i + 1}" for i in range(domains)]
+
+def load_fixtures():
+    fixtures = {}
+    for platform in PLATFORMS:
+        with open(os.path.join(FIXTURES_DIR, f'{platform}.html')) as f:
+            fixtures[platform] = f.read()
+    return fixtures
+
+def filler(nodes: int) -> str:
+    """Related-item markup standing in for the bulk of a real page"""
+    return ''.join(
+        f'<div class="rec-item"><a href="/p/{i}"><img src="/img/{i}.jpg" alt="">'
+        f'<span class="rec-title">Related item {i}</span></a><span class="rec-rating">4.{i % 10}</span></div>'
+        for i in range(nodes)
+    )
+
+def response(status: int, reason: str, body: bytes = b'', headers: dict = None) -> bytes:
+    head = [f"HTTP/1.1 {status} {reason}", f"Content-Length: {len(body)}"]
+    head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ('\r\n'.join(head) + '\r\n\r\n').encode() + body
+
+class FixtureServer:
+    def __init__(self, latency_ms: float = 0.0, throttle_rate: float = 0.0, change_rate: float = 0.1,
+                 filler_nodes: int = 500, retry_after: str = None):
+        self.fixtures = load_fixtures()
+        self.filler = filler(filler_nodes)
+        self.latency = latency_ms / 1000
+        self.throttle_rate = throttle_rate
+        self.change_rate = change_rate
+        self.retry_after = retry_after
+        self.versions = {}
+
+    def price(self, path: str) -> str:
+        # Stable per page until a refetch rolls a change
+        version = self.versions.get(path)
+        if version is None:
+            version = 0
+        elif random.random() < self.change_rate:
+            version += 1
+        self.versions[path] = version
+        return f"{zlib.crc32(f'{path}:{version}'.encode()) % 90000 / 100 + 10:.2f}"
+
+    def page(self, path: str) -> bytes:
+        try:
+            _, platform, index = path.split('/', 2)
+            template = self.fixtures[platform]
+        except (ValueError, KeyError):
+            return response(404, 'Not Found')
+        if random.random() < self.throttle_rate:
+            headers = {'Retry-After': self.retry_after} if self.retry_after else None
+            return response(429, 'Too Many Requests', headers=headers)
+        body = (template.replace('{{filler}}', self.filler)
+                .replace('{{index}}', index).replace('{{price}}', self.price(path)))
+        return response(200, 'OK', body.encode(), {'Content-Type': 'text/html; charset=utf-8'})
+
+    async def handle(self, reader, writer):
+        # Minimal keep-alive HTTP/1.1, so the fixture side is never the
+        # bottleneck being measured
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                path = head.split(b' ', 2)[1].decode().split('?', 1)[0]
+                if self.latency:
+                    await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency)
+                writer.write(self.page(path))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, hosts, port: int):
+        server = await asyncio.start_server(self.handle, hosts, port, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+def serve(domains: int, port: int, **options):
+    """Run the server until the process is stopped, e.g. as a
+    multiprocessing target"""
+    asyncio.run(FixtureServer(**options).serve(domain_hosts(domains), port))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--domains', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument('--retry-after', help="Retry-After header sent with 429 responses")
+    parser.add_argument('--change-rate', type=float, default=0.1, help="chance a refetched page has a new price")
+    parser.add_argument('--filler-nodes', type=int, default=500, help="related-item blocks per page")
+    args = parser.parse_args()
+
+    print(f"Serving {', '.join(PLATFORMS)} fixtures on 127.0.0.1-{args.domains}:{args.port}")
+    serve(args.domains, args.port, latency_ms=args.latency_ms, throttle_rate=args.throttle_rate,
+          change_rate=args.change_rate, filler_nodes=args.filler_nodes, retry_after=args.retry_after)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Requests/sec and latency of the API under concurrent load.
+
+Start the API (``uvicorn app.main:app --workers 1``) and point the load test
+at it. To compare two builds, save a run from each and pass the first as the
+baseline for the second:
+
+    python -m benchmarks.load_test --save before.json          # on the old build
+    python -m benchmarks.load_test --baseline before.json      # on the new build
+
+Each worker loops over the read endpoints the dashboard polls (product list,
+one product and its price history) for the given duration.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import httpx
+
+ENDPOINTS = [
+    "/api/v1/products/?limit={page_size}",
+    "/api/v1/products/{product_id}",
+    "/api/v1/products/{product_id}/price-history?limit=100",
+]
+
+async def worker(client, paths, deadline, latencies, errors):
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def run(args) -> dict:
+    paths = [path.format(product_id=args.product_id, page_size=args.page_size) for path in ENDPOINTS]
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        # Warm up connection pools on both sides
+        await asyncio.gather(*(client.get(path) for path in paths))
+        deadline = time.perf_counter() + args.duration
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, paths, deadline, latencies, errors) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    if not latencies:
+        raise SystemExit(f"No successful requests ({len(errors)} errors)")
+    return {
+        'concurrency': args.concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds")
+    parser.add_argument('--product-id', type=int, default=1)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(f"{result['requests']} requests, {result['errors']} errors at concurrency {result['concurrency']}")
+    print(f"{result['rps']:.1f} req/s  p50 {result['p50_ms']:.1f} ms  p99 {result['p99_ms']:.1f} ms")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"baseline {baseline['rps']:.1f} req/s  p50 {baseline['p50_ms']:.1f} ms  "
+              f"p99 {baseline['p99_ms']:.1f} ms  ->  {result['rps'] / baseline['rps']:.2f}x throughput")
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Crawl politeness defaults for any domain not listed below. Each domain gets
+# its own downloader slot starting from these limits, which the adaptive
+# throttle then grows or shrinks from observed latency and 429/503 rates.
+DEFAULT_DOMAIN_POLITENESS = {
+    'concurrency': int(os.getenv('CRAWL_DOMAIN_CONCURRENCY', '2')),
+    'delay': float(os.getenv('CRAWL_DOMAIN_DELAY', '1.0')),
+    'min_delay': 0.1,
+    'max_delay': 60.0,
+    'max_concurrency': 8,
+    'target_latency': 2.0,
+}
+
+# Per-domain overrides, keyed by domain without the "www." prefix
+DOMAIN_POLITENESS = {
+    'amazon.com': {'concurrency': 4, 'delay': 1.0, 'max_concurrency': 16},
+    'amazon.in': {'concurrency': 4, 'delay': 1.0, 'max_concurrency': 16},
+    'ebay.com': {'concurrency': 8, 'delay': 0.25, 'max_concurrency': 32},
+    'ebay.in': {'concurrency': 4, 'delay': 0.5, 'max_concurrency': 16},
+}
+
+# Extraction rules per platform: the domains it covers and, for each field,
+# CSS selectors tried in order. Structured data (JSON-LD offers, og/itemprop
+# price meta tags) is tried for the price before any selector. Sites that
+# match no platform use the generic rules. EXTRACTION_RULES_PATH may point at
+# a JSON file of additional platforms or overrides in the same shape.
+EXTRACTION_RULES = {
+    'amazon': {
+        'domains': ['amazon.com', 'amazon.in', 'amazon.co.uk', 'amazon.de', 'amazon.ca'],
+        'price': ['.a-price-whole::text'],
+        'name': ['#productTitle::text'],
+        'image_url': ['#landingImage::attr(src)'],
+        'description': ['#feature-bullets ul li span::text', '#feature-bullets ul::text'],
+    },
+    'ebay': {
+        'domains': ['ebay.com', 'ebay.in', 'ebay.co.uk', 'ebay.de'],
+        'price': ['.x-price-primary span::text', '.notranslate::text'],
+        'name': ['h1.x-item-title__mainTitle span::text', 'h1#x-title-label-lbl::text'],
+        'image_url': ['#icImg::attr(src)', '.ux-image-carousel-item img::attr(src)'],
+        'description': ['.u-flL.condText::text'],
+    },
+    'generic': {
+        'domains': [],
+        'price': [
+            'span[class*="price"]::text',
+            'div[class*="price"]::text',
+            '*[class*="cost"]::text',
+            '*[data-price]::attr(data-price)',
+            '*[itemprop="price"]::attr(content)',
+        ],
+        'name': ['h1::text', 'title::text'],
+        'image_url': ['meta[property="og:image"]::attr(content)', 'img::attr(src)'],
+        'description': ['meta[name="description"]::attr(content)'],
+    },
+}
+EXTRACTION_RULES_PATH = os.getenv('EXTRACTION_RULES_PATH')
+
+# Domains fetched with the lightweight asyncio HTTP client instead of the
+# Scrapy middleware stack, for sites whose price is in JSON-LD or meta tags.
+# Pages it cannot extract a price from, or that fail, go through Scrapy.
+FAST_PATH_DOMAINS = [domain.strip() for domain in os.getenv('FAST_PATH_DOMAINS', '').split(',') if domain.strip()]
+FAST_PATH_MAX_CONNECTIONS = int(os.getenv('FAST_PATH_MAX_CONNECTIONS', '100'))
+FAST_PATH_TIMEOUT = float(os.getenv('FAST_PATH_TIMEOUT', '15'))
+
+# Price check scheduling. Every product carries its own next check time,
+# derived from the flat interval scaled by how volatile its price history is,
+# how close it is to its target price and which platform it is on.
+FLAT_CHECK_INTERVAL_MINUTES = int(os.getenv('FLAT_CHECK_INTERVAL_MINUTES', '60'))
+MIN_CHECK_INTERVAL_MINUTES = int(os.getenv('MIN_CHECK_INTERVAL_MINUTES', '15'))
+MAX_CHECK_INTERVAL_MINUTES = int(os.getenv('MAX_CHECK_INTERVAL_MINUTES', str(24 * 60)))
+CHECK_TICK_MINUTES = int(os.getenv('CHECK_TICK_MINUTES', '5'))
+CHECK_BATCH_SIZE = int(os.getenv('CHECK_BATCH_SIZE', '500'))
+VOLATILITY_WINDOW = 50
+PLATFORM_CHECK_WEIGHTS = {
+    'amazon': 1.0,
+    'ebay': 0.75,
+    'generic': 1.5,
+}
+
+# Local cache of HTTP validators (ETag/Last-Modified) and price fingerprints,
+# used to skip re-parsing and re-storing pages whose price has not changed
+FETCH_CACHE_PATH = os.getenv('FETCH_CACHE_PATH', '.scrapy/fetch_cache.sqlite3')
+
+# Scraped prices are buffered and written in batches, flushed when either
+# threshold is reached
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '500'))
+INGEST_FLUSH_SECONDS = float(os.getenv('INGEST_FLUSH_SECONDS', '2.0'))
+
+# Price history is stored as runs of unchanged prices, so years fit in the
+# space hourly rows used to take for a month
+HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', str(3 * 365)))
+
+# Per-product price statistics (min, max, mean, volatility, discount) are
+# rolled forward by ingest and rebuilt nightly from the retained history,
+# this many products per transaction
+STATS_RECOMPUTE_CHUNK = int(os.getenv('STATS_RECOMPUTE_CHUNK', '2000'))
+
+# Price history exports stream rows from a server-side cursor in batches;
+# each running export holds a database connection, so they are capped
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '10000'))
+EXPORT_MAX_CONCURRENT = int(os.getenv('EXPORT_MAX_CONCURRENT', '2'))
+
+# Alert delivery. Alerts are queued in the alert_outbox table and sent in
+# batches by a background worker, retrying failures with exponential backoff
+ALERT_BATCH_SIZE = int(os.getenv('ALERT_BATCH_SIZE', '50'))
+ALERT_POLL_SECONDS = float(os.getenv('ALERT_POLL_SECONDS', '5'))
+ALERT_MAX_ATTEMPTS = int(os.getenv('ALERT_MAX_ATTEMPTS', '6'))
+ALERT_RETRY_BASE_SECONDS = float(os.getenv('ALERT_RETRY_BASE_SECONDS', '30'))
+
+# Database connection pools. The API uses an asyncpg pool and the scheduler,
+# ingest and alert workers a psycopg2 pool; each gets these settings
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+# Cached responses of the product list and detail endpoints. Set REDIS_URL to
+# share the cache between API workers instead of keeping one per process
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '60'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1024'))
+REDIS_URL = os.getenv('REDIS_URL')
+
+# Bulk product imports. Jobs are tracked in the API process for polling
+BULK_IMPORT_MAX_URLS = int(os.getenv('BULK_IMPORT_MAX_URLS', '10000'))
+BULK_IMPORT_JOB_HISTORY = int(os.getenv('BULK_IMPORT_JOB_HISTORY', '100'))
+
+# Roles a process runs, comma-separated: "api" serves HTTP (uvicorn
+# app.main:app), "scraper" runs the crawl engine and alert delivery, and
+# "scheduler" runs price sweeps and cleanup. API-only processes start the
+# crawl engine on first use if a request needs it; `python -m app.worker`
+# runs the scraper and scheduler roles without the API.
+ROLES = {role.strip() for role in os.getenv('ROLES', 'api,scraper,scheduler').split(',') if role.strip()}
+
+# Sweep distribution. Every scheduler process claims batches of due products
+# by leasing their rows (SELECT ... FOR UPDATE SKIP LOCKED), so any number of
+# workers can share a sweep and each product is checked once. Leases are
+# renewed while a batch runs; leases of crashed workers expire and the
+# products are claimed again. WORKER_ID names the lease owner and must be
+# unique per process; it defaults to host and PID.
+WORKER_ID = os.getenv('WORKER_ID', '')
+LEASE_SECONDS = int(os.getenv('LEASE_SECONDS', '300'))
+LEASE_HEARTBEAT_SECONDS = int(os.getenv('LEASE_HEARTBEAT_SECONDS', '60'))
+SWEEP_MAX_IN_FLIGHT = int(os.getenv('SWEEP_MAX_IN_FLIGHT', '5000'))
+
+# Live price events streamed to dashboards from GET /api/v1/events. The
+# memory backend only reaches clients of the process that scraped the price;
+# with several API or scraper worker processes use postgres, which relays
+# events through LISTEN/NOTIFY on EVENTS_CHANNEL.
+EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'memory')
+EVENTS_CHANNEL = os.getenv('EVENTS_CHANNEL', 'price_events')
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', '256'))
+EVENTS_KEEPALIVE_SECONDS = int(os.getenv('EVENTS_KEEPALIVE_SECONDS', '15'))
+
+# Product image thumbnails. The scraper role downloads each product image
+# once, stores WebP thumbnails of it in a content-addressed directory and
+# evicts the least recently served files when the cache grows past
+# THUMBNAIL_CACHE_MAX_MB; evicted thumbnails are rebuilt on request.
+THUMBNAIL_CACHE_PATH = os.getenv('THUMBNAIL_CACHE_PATH', '.thumbnails')
+THUMBNAIL_CACHE_MAX_MB = int(os.getenv('THUMBNAIL_CACHE_MAX_MB', '1024'))
+THUMBNAIL_SIZES = tuple(sorted(int(size) for size in os.getenv('THUMBNAIL_SIZES', '160,320,640').split(',')))
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', '80'))
+THUMBNAIL_MAX_SOURCE_MB = int(os.getenv('THUMBNAIL_MAX_SOURCE_MB', '10'))
+THUMBNAIL_FETCH_TIMEOUT = float(os.getenv('THUMBNAIL_FETCH_TIMEOUT', '20'))
+THUMBNAIL_BATCH_SIZE = int(os.getenv('THUMBNAIL_BATCH_SIZE', '20'))
+THUMBNAIL_CONCURRENCY = int(os.getenv('THUMBNAIL_CONCURRENCY', '4'))
+THUMBNAIL_POLL_SECONDS = float(os.getenv('THUMBNAIL_POLL_SECONDS', '60'))
+THUMBNAIL_RETRY_HOURS = float(os.getenv('THUMBNAIL_RETRY_HOURS', '24'))
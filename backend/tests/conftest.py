@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+import app.models.product  # noqa: F401 - registers the tables
+from app.scrapy_spiders.fetch_cache import fetch_cache
+
+@pytest.fixture
+def Session(tmp_path):
+    """Sessions on a scratch SQLite database with every table created"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+@pytest.fixture(autouse=True)
+def scratch_fetch_cache(tmp_path, monkeypatch):
+    # Ingesting items writes validators to the fetch cache
+    monkeypatch.setattr(fetch_cache, 'path', str(tmp_path / 'fetch_cache.db'))
+    monkeypatch.setattr(fetch_cache, '_conn', None)
+
+@pytest.fixture
+def anyio_backend():
+    # API tests run on the anyio plugin that comes with Starlette
+    return 'asyncio'
@@ -0,0 +1,55 @@
+import pytest
+from app.models.product import Subscription, User
+from app.services.alert_matcher import match_price_drops, trigger_price
+
+def drop(old_price, new_price, product_id=1):
+    return {'product_id': product_id, 'product_name': 'Kettle', 'product_url': 'https://shop.example/item/1',
+            'old_price': old_price, 'new_price': new_price}
+
+@pytest.fixture
+def db(Session):
+    with Session() as db:
+        db.add_all([
+            User(id=1, email='threshold@example.com'),
+            User(id=2, email='percent@example.com'),
+            User(id=3, email='inactive@example.com', is_active=False),
+            User(id=4, email='paused@example.com'),
+            User(id=5, email='other@example.com'),
+        ])
+        db.add_all([
+            Subscription(user_id=1, product_id=1, threshold_price=90.0, trigger_price=90.0),
+            Subscription(user_id=2, product_id=1, percent_drop=20.0, baseline_price=100.0,
+                         trigger_price=trigger_price(None, 20.0, 100.0)),
+            Subscription(user_id=3, product_id=1, threshold_price=90.0, trigger_price=90.0),
+            Subscription(user_id=4, product_id=1, threshold_price=90.0, trigger_price=90.0, is_active=False),
+            Subscription(user_id=5, product_id=2, threshold_price=90.0, trigger_price=90.0),
+        ])
+        db.commit()
+        yield db
+
+def recipients(alerts):
+    return sorted(alert['recipient_email'] for alert in alerts)
+
+def test_trigger_price():
+    assert trigger_price(50.0, 10.0, 100.0) == 50.0
+    assert trigger_price(None, 15.0, 80.0) == 68.0
+    assert trigger_price(None, 15.0, None) is None
+
+def test_drop_to_the_trigger_fires(db):
+    assert recipients(match_price_drops(db, [drop(100.0, 90.0)])) == ['threshold@example.com']
+
+def test_deep_drop_fires_every_crossed_trigger(db):
+    alerts = match_price_drops(db, [drop(100.0, 70.0)])
+    assert recipients(alerts) == ['percent@example.com', 'threshold@example.com']
+    assert alerts[0]['old_price'] == 100.0 and alerts[0]['new_price'] == 70.0
+
+def test_drop_already_below_the_trigger_does_not_fire_again(db):
+    assert match_price_drops(db, [drop(85.0, 82.0)]) == []
+
+def test_drops_of_several_products_in_one_query(db):
+    alerts = match_price_drops(db, [drop(100.0, 89.0), drop(95.0, 90.0, product_id=2)])
+    assert recipients(alerts) == ['other@example.com', 'threshold@example.com']
+    assert {alert['product_id'] for alert in alerts} == {1, 2}
+
+def test_no_drops():
+    assert match_price_drops(None, []) == []
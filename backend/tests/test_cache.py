@@ -0,0 +1,108 @@
+import httpx
+import pytest
+from app.services.cache import MemoryBackend, ResponseCache, etag_matches, make_etag
+
+@pytest.fixture
+def cache():
+    return ResponseCache(MemoryBackend(max_entries=3, ttl=60))
+
+def test_etag_matches():
+    etag = make_etag(b'[]')
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag(b'{}'), etag)
+
+def test_get_returns_what_was_set(cache):
+    key = cache.product_key(1)
+    stored = cache.set(key, b'{"id": 1}', next_cursor='abc')
+    assert cache.get(key) == stored
+    assert stored.etag == make_etag(b'{"id": 1}')
+    assert stored.next_cursor == 'abc'
+
+def test_invalidation_drops_the_product_and_every_list_page(cache):
+    page_key = cache.list_key(0, 100, None)
+    cache.set(cache.product_key(1), b'{"id": 1}')
+    cache.set(cache.product_key(2), b'{"id": 2}')
+    cache.set(page_key, b'[]')
+    cache.invalidate_products([1])
+    assert cache.get(cache.product_key(1)) is None
+    assert cache.get(cache.product_key(2)) is not None
+    assert cache.list_key(0, 100, None) != page_key
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for product_id in range(3):
+        cache.set(cache.product_key(product_id), b'{}')
+    cache.get(cache.product_key(0))
+    cache.set(cache.product_key(3), b'{}')
+    assert cache.get(cache.product_key(1)) is None
+    assert cache.get(cache.product_key(0)) is not None
+
+def test_expired_entries_are_misses():
+    cache = ResponseCache(MemoryBackend(max_entries=10, ttl=-1))
+    cache.set('key', b'{}')
+    assert cache.get('key') is None
+
+def test_backend_errors_are_misses(cache, monkeypatch):
+    def unavailable(*args):
+        raise ConnectionError('cache is down')
+    monkeypatch.setattr(cache.backend, 'get', unavailable)
+    monkeypatch.setattr(cache.backend, 'set', unavailable)
+    assert cache.set('key', b'{}').body == b'{}'
+    assert cache.get('key') is None
+
+@pytest.fixture
+async def client(tmp_path, monkeypatch):
+    pytest.importorskip('aiosqlite')
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from app.db.database import Base, get_async_db
+    from app.main import app
+    from app.models.product import Product
+    import app.routes.tracker as tracker
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'api.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    async with Session() as db:
+        db.add(Product(id=1, name='Kettle', url='https://shop.example/item/1', platform='generic',
+                       current_price=20.0, target_price=15.0))
+        await db.commit()
+
+    async def get_db():
+        async with Session() as db:
+            yield db
+
+    monkeypatch.setattr(tracker, 'response_cache', ResponseCache(MemoryBackend(max_entries=100, ttl=60)))
+    app.dependency_overrides[get_async_db] = get_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        yield client
+    app.dependency_overrides.pop(get_async_db)
+    await engine.dispose()
+
+@pytest.mark.anyio
+async def test_product_etag_changes_when_the_product_does(client):
+    first = await client.get('/api/v1/products/1')
+    assert first.status_code == 200
+    etag = first.headers['etag']
+
+    not_modified = await client.get('/api/v1/products/1', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['etag'] == etag
+
+    assert (await client.put('/api/v1/products/1', json={'target_price': 12.0})).status_code == 200
+    changed = await client.get('/api/v1/products/1', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+    assert changed.json()['target_price'] == 12.0
+
+@pytest.mark.anyio
+async def test_list_etag_changes_when_a_product_does(client):
+    etag = (await client.get('/api/v1/products/')).headers['etag']
+    assert (await client.get('/api/v1/products/', headers={'If-None-Match': etag})).status_code == 304
+
+    assert (await client.put('/api/v1/products/1', json={'name': 'Electric kettle'})).status_code == 200
+    changed = await client.get('/api/v1/products/', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.json()[0]['name'] == 'Electric kettle'
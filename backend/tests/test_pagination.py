@@ -0,0 +1,17 @@
+from datetime import datetime, timezone
+import pytest
+from app.db.pagination import decode_cursor, encode_cursor
+
+def test_cursor_round_trip():
+    moment = datetime(2026, 3, 1, 12, 30, tzinfo=timezone.utc)
+    cursor = encode_cursor(moment, 42)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == [moment.isoformat(), 42]
+
+def test_cursor_keeps_numbers_and_missing_keys():
+    assert decode_cursor(encode_cursor('current_price', 19.99, None, 7)) == ['current_price', 19.99, None, 7]
+
+@pytest.mark.parametrize('cursor', ['not a cursor', '%%%', encode_cursor('x')[:-2] + '!!'])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
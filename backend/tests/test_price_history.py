@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from app.services.price_history import aggregate_runs, expand_runs
+
+START = datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+def run(run_id, price, started, last_seen):
+    return SimpleNamespace(id=run_id, product_id=1, price=price,
+                           timestamp=START + started, last_seen_at=START + last_seen)
+
+# Newest first, as the history endpoint reads them
+RUNS = [
+    run(2, 9.0, timedelta(hours=2), timedelta(hours=4, minutes=30)),
+    run(1, 10.0, timedelta(0), timedelta(hours=2)),
+]
+
+def test_expand_repeats_each_run_until_the_next_change():
+    points = expand_runs(RUNS, timedelta(hours=1))
+    assert [(point['price'], point['timestamp'] - START) for point in points] == [
+        (9.0, timedelta(hours=4)),
+        (9.0, timedelta(hours=3)),
+        (9.0, timedelta(hours=2)),
+        (10.0, timedelta(hours=1)),
+        (10.0, timedelta(0)),
+    ]
+    assert [point['id'] for point in points] == [2, 2, 2, 1, 1]
+
+def test_expand_stops_at_until_but_keeps_run_starts():
+    points = expand_runs(RUNS, timedelta(hours=1), until=START + timedelta(hours=2))
+    assert [point['timestamp'] - START for point in points] == [
+        timedelta(hours=2), timedelta(hours=1), timedelta(0),
+    ]
+
+def test_expand_limit():
+    points = expand_runs(RUNS, timedelta(hours=1), limit=4)
+    assert len(points) == 4
+    assert points[-1]['timestamp'] == START + timedelta(hours=1)
+
+def test_expand_accepts_naive_timestamps():
+    naive = [SimpleNamespace(id=1, product_id=1, price=5.0, timestamp=datetime(2026, 1, 5),
+                             last_seen_at=datetime(2026, 1, 5, 2))]
+    assert len(expand_runs(naive, timedelta(hours=1), until=START + timedelta(hours=1))) == 1
+
+def test_aggregate_weights_the_average_by_time_held():
+    runs = [run(1, 10.0, timedelta(0), timedelta(0)), run(2, 8.0, timedelta(hours=6), timedelta(0))]
+    [day] = aggregate_runs(runs, START, START + timedelta(days=1), bucket='day')
+    assert day['timestamp'] == START
+    assert (day['open'], day['high'], day['low'], day['close']) == (10.0, 10.0, 8.0, 8.0)
+    assert day['avg'] == pytest.approx(8.5)
+
+def test_aggregate_opens_with_the_price_in_force_at_start():
+    runs = [run(1, 12.0, timedelta(days=-1), timedelta(0)), run(2, 6.0, timedelta(hours=12), timedelta(0))]
+    [day] = aggregate_runs(runs, START, START + timedelta(days=1), bucket='day')
+    assert day['open'] == 12.0
+    assert day['close'] == 6.0
+    assert day['avg'] == pytest.approx(9.0)
+
+def test_aggregate_into_equal_points():
+    runs = [run(1, 10.0, timedelta(0), timedelta(0)), run(2, 8.0, timedelta(hours=6), timedelta(0))]
+    first, second = aggregate_runs(runs, START, START + timedelta(days=1), points=2)
+    assert second['timestamp'] - first['timestamp'] == timedelta(hours=12)
+    assert first['avg'] == pytest.approx(9.0)
+    assert (second['open'], second['close'], second['avg']) == (8.0, 8.0, 8.0)
+
+def test_aggregate_calendar_buckets_start_on_the_boundary():
+    runs = [run(1, 10.0, timedelta(hours=3, minutes=20), timedelta(0))]
+    buckets = aggregate_runs(runs, None, START + timedelta(hours=6), bucket='hour')
+    assert buckets[0]['timestamp'] == START + timedelta(hours=3)
+    assert len(buckets) == 3
+
+def test_aggregate_without_runs():
+    assert aggregate_runs([], START, START + timedelta(days=1)) == []
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import select
+from app.models.product import AlertOutbox, PriceHistory, Product, Subscription, User
+from app.services.price_history import as_utc
+from app.services.price_ingest import PriceIngestor
+
+URL = 'https://shop.example/item/1'
+SEEN = datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+@pytest.fixture
+def ingestor(Session):
+    with Session() as db:
+        db.add(Product(id=1, name='Kettle', url=URL, canonical_key='shop.example/item/1',
+                       platform='generic', current_price=20.0))
+        db.add(PriceHistory(id=1, product_id=1, price=20.0, timestamp=SEEN, last_seen_at=SEEN))
+        db.commit()
+    return PriceIngestor(session_factory=Session)
+
+def runs(Session):
+    with Session() as db:
+        return [(run.price, as_utc(run.timestamp), as_utc(run.last_seen_at)) for run in db.scalars(
+            select(PriceHistory).order_by(PriceHistory.timestamp)
+        )]
+
+def test_same_price_extends_the_latest_run(ingestor, Session):
+    assert ingestor.write_batch([{'url': URL, 'price': 20.0}]) == 0
+    [(price, started, last_seen)] = runs(Session)
+    assert (price, started) == (20.0, SEEN)
+    assert last_seen > SEEN
+
+def test_unchanged_page_extends_the_latest_run(ingestor, Session):
+    ingestor.write_batch([{'url': URL, 'unchanged': True}])
+    [(_, _, last_seen)] = runs(Session)
+    assert last_seen > SEEN
+
+def test_changed_price_starts_a_new_run(ingestor, Session):
+    assert ingestor.write_batch([{'url': URL, 'price': 18.0}]) == 1
+    assert [price for price, _, _ in runs(Session)] == [20.0, 18.0]
+    # Back to the old price is a change again, not the old run
+    assert ingestor.write_batch([{'url': URL, 'price': 20.0}]) == 1
+    assert [price for price, _, _ in runs(Session)] == [20.0, 18.0, 20.0]
+    with Session() as db:
+        assert db.get(Product, 1).current_price == 20.0
+
+def test_page_without_price_does_not_confirm_the_run(ingestor, Session):
+    assert ingestor.write_batch([{'url': URL, 'price': None}]) == 0
+    assert runs(Session) == [(20.0, SEEN, SEEN)]
+    with Session() as db:
+        assert db.get(Product, 1).current_price == 20.0
+
+def test_later_items_for_a_url_win(ingestor, Session):
+    assert ingestor.write_batch([{'url': URL, 'price': 15.0}, {'url': URL, 'price': 20.0}]) == 0
+    assert len(runs(Session)) == 1
+
+def test_url_variants_reach_the_product_by_canonical_key(ingestor, Session):
+    assert ingestor.write_batch([{'url': 'https://www.shop.example/item/1/?utm_source=feed', 'price': 17.5}]) == 1
+    assert runs(Session)[-1][0] == 17.5
+
+def test_flush_writes_buffered_items(ingestor, Session):
+    assert not ingestor.add({'url': URL, 'price': 19.0})
+    assert ingestor.flush() == 1
+    assert ingestor.flush() == 0
+    assert runs(Session)[-1][0] == 19.0
+
+def test_price_drop_queues_alerts_for_crossed_subscriptions(ingestor, Session):
+    with Session() as db:
+        db.add(User(id=1, email='buyer@example.com'))
+        db.add(Subscription(user_id=1, product_id=1, threshold_price=19.0, trigger_price=19.0))
+        db.commit()
+    ingestor.write_batch([{'url': URL, 'price': 18.0}])
+    with Session() as db:
+        [alert] = db.scalars(select(AlertOutbox)).all()
+        assert alert.recipient_email == 'buyer@example.com'
@@ -0,0 +1,37 @@
+import pytest
+from app.services.url_canonical import canonical_key
+
+@pytest.mark.parametrize('url', [
+    'https://www.amazon.com/dp/B08N5WRWNW',
+    'https://www.amazon.com/Some-Product-Name/dp/B08N5WRWNW/ref=sr_1_1?keywords=x&tag=aff-20',
+    'https://smile.amazon.com/gp/product/b08n5wrwnw',
+    'http://amazon.com/gp/aw/d/B08N5WRWNW?th=1',
+])
+def test_amazon_urls_share_the_asin_key(url):
+    assert canonical_key(url) == 'amazon.com/dp/B08N5WRWNW'
+
+def test_amazon_marketplaces_are_kept_apart():
+    assert canonical_key('https://www.amazon.co.uk/dp/B08N5WRWNW') == 'amazon.co.uk/dp/B08N5WRWNW'
+
+@pytest.mark.parametrize('url', [
+    'https://www.ebay.com/itm/123456789012',
+    'https://www.ebay.com/itm/some-item-title/123456789012?mkcid=1&mkevt=1',
+    'https://cgi.ebay.com/ws/eBayISAPI.dll?ViewItem&item=123456789012',
+])
+def test_ebay_urls_share_the_item_key(url):
+    assert canonical_key(url) == 'ebay.com/itm/123456789012'
+
+def test_other_urls_are_normalized():
+    assert canonical_key(
+        'https://WWW.Shop.example/item/42/?utm_source=news&color=red&size=m&fbclid=abc#reviews'
+    ) == 'shop.example/item/42?color=red&size=m'
+
+def test_query_parameters_are_sorted():
+    assert canonical_key('https://shop.example/p?b=2&a=1') == canonical_key('https://shop.example/p?a=1&b=2')
+
+def test_non_default_ports_are_kept():
+    assert canonical_key('http://shop.example:8080/p') == 'shop.example:8080/p'
+    assert canonical_key('https://shop.example:443/p') == 'shop.example/p'
+
+def test_amazon_url_without_asin_falls_back_to_normalizing():
+    assert canonical_key('https://www.amazon.com/s?k=headphones&ref=nb_sb') == 'amazon.com/s?k=headphones'
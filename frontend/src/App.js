@@ -5,19 +5,26 @@ import 'react-toastify/dist/ReactToastify.css';
 import UploadForm from './components/UploadForm';
 import ProductCard from './components/ProductCard';
 
+const PAGE_SIZE = 60;
+
 function App() {
   const [products, setProducts] = useState([]);
   const [loading, setLoading] = useState(true);
   const [showUploadForm, setShowUploadForm] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
 
   useEffect(() => {
     fetchProducts();
   }, []);
 
-  const fetchProducts = async () => {
+  // Pages of card fields only; the API returns the next page's cursor in a header
+  const fetchProducts = async (cursor = null) => {
     try {
-      const response = await axios.get('http://localhost:8000/api/v1/products/');
-      setProducts(response.data);
+      const response = await axios.get('http://localhost:8000/api/v1/products/', {
+        params: { fields: 'summary', limit: PAGE_SIZE, ...(cursor && { cursor }) }
+      });
+      setProducts(cursor ? [...products, ...response.data] : response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       toast.error('Failed to fetch products');
     } finally {
@@ -92,16 +99,28 @@ function App() {
 
         {/* Products Grid */}
         {products.length > 0 ? (
-          <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
-            {products.map((product) => (
-              <ProductCard
-                key={product.id}
-                product={product}
-                onProductUpdate={handleProductUpdate}
-                onProductDelete={handleProductDelete}
-              />
-            ))}
-          </div>
+          <>
+            <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
+              {products.map((product) => (
+                <ProductCard
+                  key={product.id}
+                  product={product}
+                  onProductUpdate={handleProductUpdate}
+                  onProductDelete={handleProductDelete}
+                />
+              ))}
+            </div>
+            {nextCursor && (
+              <div className="text-center mt-8">
+                <button
+                  onClick={() => fetchProducts(nextCursor)}
+                  className="bg-white text-blue-600 border border-blue-600 px-6 py-2 rounded-md hover:bg-blue-50 transition duration-200"
+                >
+                  Load more
+                </button>
+              </div>
+            )}
+          </>
         ) : (
           <div className="text-center py-12">
             <div className="text-gray-400 mb-4">
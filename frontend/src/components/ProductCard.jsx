@@ -2,6 +2,9 @@ import React, { useState } from 'react';
 import axios from 'axios';
 import { toast } from 'react-toastify';
 
+// Served from the backend's thumbnail cache rather than the retailer's CDN
+const THUMBNAIL_BASE = 'http://localhost:8000/api/v1/thumbnails';
+
 const ProductCard = ({ product, onProductUpdate, onProductDelete }) => {
   const [isUpdating, setIsUpdating] = useState(false);
   const [showPriceHistory, setShowPriceHistory] = useState(false);
@@ -77,10 +80,20 @@ const ProductCard = ({ product, onProductUpdate, onProductDelete }) => {
 
   return (
     <div className="bg-white rounded-lg shadow-md overflow-hidden">
-      {product.image_url && (
+      {product.image_hash ? (
+        <img 
+          src={`${THUMBNAIL_BASE}/${product.image_hash}/320.webp`}
+          srcSet={[160, 320, 640].map(size => `${THUMBNAIL_BASE}/${product.image_hash}/${size}.webp ${size}w`).join(', ')}
+          sizes="(min-width: 768px) 320px, 100vw"
+          alt={product.name}
+          loading="lazy"
+          className="w-full h-48 object-cover"
+        />
+      ) : product.image_url && (
         <img 
           src={product.image_url} 
           alt={product.name}
+          loading="lazy"
           className="w-full h-48 object-cover"
         />
       )}